@@ -205,7 +205,7 @@ class N8NAPIResearcher:
                 categories = {}
                 total_nodes = len(nodes_list)
                 
-                for node in nodes_list[:50]:  # Берем первые 50 для анализа
+                for node in nodes_list:
                     if isinstance(node, dict):
                         node_name = node.get('name', 'unknown')
                         node_category = node_name.split('.')[0] if '.' in node_name else 'other'
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+⚡ N8N Async Production Client
+Асинхронный клиент n8n API с теми же операциями, что и N8NProductionClient:
+один пул соединений на event loop и ограничение одновременных запросов
+"""
+
+import os
+import sys
+import random
+import asyncio
+from typing import AsyncIterator, Dict, Generator, List, Optional, Sequence
+
+import httpx2
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_http_transport import N8NHTTPTransport, IDEMPOTENT_METHODS, RETRY_STATUS_CODES, get_shared_transport
+from n8n_production_client import (
+    N8NAPIError, WORKFLOW_SUMMARY_FIELDS, WorkflowRequest, add_to_summary, bulk_activation_summary,
+    bulk_update_summary, set_active_steps, summarize_workflows, update_workflow_steps, workflow_query_params
+)
+
+class AsyncN8NProductionClient:
+    """Асинхронный клиент для n8n API (используйте как async context manager)"""
+    
+    def __init__(self, api_key: str, base_url: str = "http://localhost:5678",
+                 max_concurrency: int = 50, transport: Optional[N8NHTTPTransport] = None):
+        """
+        Инициализация клиента
+        
+        Args:
+            api_key: API ключ n8n
+            base_url: Адрес n8n
+            max_concurrency: Максимум одновременных запросов к n8n
+            transport: Настройки пула, таймаутов и повторов (по умолчанию - общие для процесса)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency должен быть >= 1")
+        
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.transport = transport or get_shared_transport()
+        
+        # Клиент и семафор создаются при первом запросе - внутри работающего event loop
+        self._client: Optional[httpx2.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        
+        # Есть ли на сервере POST /workflows/{id}/activate (None - еще не известно)
+        self.supports_activation_endpoints: Optional[bool] = None
+    
+    async def __aenter__(self) -> 'AsyncN8NProductionClient':
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+    
+    async def aclose(self) -> None:
+        """Закрытие пула соединений"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+    
+    def _get_client(self) -> httpx2.AsyncClient:
+        """Пул соединений клиента (размер не меньше допустимой параллельности)"""
+        if self._client is None:
+            pool_size = max(self.transport.pool_maxsize, self.max_concurrency)
+            self._client = httpx2.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    'X-N8N-API-KEY': self.api_key,
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json'
+                },
+                timeout=httpx2.Timeout(self.transport.read_timeout, connect=self.transport.connect_timeout),
+                # Повтор подключения безопасен для любого метода - запрос еще не отправлен
+                transport=httpx2.AsyncHTTPTransport(
+                    limits=httpx2.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                    retries=self.transport.max_retries
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+    
+    async def _request(self, method: str, path: str, **kwargs) -> httpx2.Response:
+        """
+        Запрос с ограничением параллельности
+        
+        Идемпотентные методы повторяются при временных статусах и ошибках чтения
+        с экспоненциальной задержкой, POST - никогда (повтор создал бы дубликат).
+        """
+        client = self._get_client()
+        retries = self.transport.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        
+        while True:
+            async with self._semaphore:
+                try:
+                    response = await client.request(method, path, **kwargs)
+                except httpx2.TransportError:
+                    if attempt >= retries:
+                        raise
+                    response = None
+            
+            if response is not None and (response.status_code not in RETRY_STATUS_CODES or attempt >= retries):
+                return response
+            
+            retry_after = response.headers.get('retry-after', '') if response is not None else ''
+            if retry_after.isdigit():
+                delay = float(retry_after)
+            else:
+                # Full jitter разводит повторы одновременных запросов во времени
+                delay = random.uniform(0, self.transport.backoff_factor * (2 ** attempt))
+            
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def create_workflow(self, workflow_data: Dict) -> Dict:
+        """Создание workflow в n8n"""
+        try:
+            response = await self._request('POST', '/api/v1/workflows', json=workflow_data)
+            
+            if response.status_code in [200, 201]:
+                created_workflow = response.json()
+                return {
+                    "status": "success",
+                    "workflow": created_workflow,
+                    "id": created_workflow.get('id'),
+                    "name": created_workflow.get('name'),
+                    "url": f"{self.base_url}/workflow/{created_workflow.get('id')}",
+                    "message": "Workflow создан успешно!"
+                }
+            else:
+                return {
+                    "status": "error",
+                    "status_code": response.status_code,
+                    "message": f"Ошибка {response.status_code}",
+                    "response": response.text
+                }
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка создания workflow: {str(e)}"
+            }
+    
+    async def get_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Получение списка workflow (все страницы)"""
+        try:
+            workflows = [workflow async for workflow in self.iter_workflows(filters=filters)]
+            return {
+                "status": "success",
+                "count": len(workflows),
+                "workflows": workflows
+            }
+        
+        except N8NAPIError as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка {e.status_code}: {e.response}"
+            }
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка: {str(e)}"
+            }
+    
+    async def get_workflow(self, workflow_id: str) -> Dict:
+        """Получение workflow по ID"""
+        try:
+            response = await self._request('GET', f'/api/v1/workflows/{workflow_id}')
+            
+            if response.status_code == 200:
+                return {
+                    "status": "success",
+                    "workflow": response.json()
+                }
+            else:
+                return {
+                    "status": "error",
+                    "status_code": response.status_code,
+                    "message": f"Workflow не найден: {response.status_code}",
+                    "response": response.text
+                }
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка получения workflow: {str(e)}"
+            }
+    
+    async def update_workflow(self, workflow_id: str, workflow_data: Dict, current: Optional[Dict] = None) -> Dict:
+        """Обновление workflow только при структурных изменениях (как N8NProductionClient.update_workflow)"""
+        try:
+            return await self._run_steps(update_workflow_steps(self, workflow_id, workflow_data, current))
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка обновления workflow: {str(e)}"
+            }
+    
+    async def update_workflows(self, updates: Dict[str, Dict], current: Optional[Dict[str, Dict]] = None) -> Dict:
+        """Обновление списка workflow (параллельность ограничена max_concurrency клиента)"""
+        current = current or {}
+        results = await asyncio.gather(*(
+            self.update_workflow(workflow_id, workflow_data, current.get(workflow_id))
+            for workflow_id, workflow_data in updates.items()
+        ))
+        return bulk_update_summary(dict(zip(updates, results)))
+    
+    async def iter_workflows(self, limit: int = 100, filters: Optional[Dict] = None,
+                             fields: Optional[Sequence[str]] = None) -> AsyncIterator[Dict]:
+        """
+        Постраничный обход workflow по nextCursor (параметры как у N8NProductionClient.iter_workflows,
+        fields отбираются на клиенте - на сервере отбрасывается только pinData)
+        
+        Raises:
+            N8NAPIError: если n8n ответил ошибкой
+        """
+        params = workflow_query_params(limit, filters, exclude_pinned_data=fields is not None)
+        
+        while True:
+            response = await self._request('GET', '/api/v1/workflows', params=params)
+            if response.status_code != 200:
+                raise N8NAPIError(
+                    f"Ошибка получения workflow: {response.status_code}", response.status_code, response.text
+                )
+            
+            page = response.json()
+            for workflow in page.get('data', []):
+                yield {key: workflow[key] for key in fields if key in workflow} if fields is not None else workflow
+            
+            cursor = page.get('nextCursor')
+            if not cursor:
+                return
+            params['cursor'] = cursor
+    
+    async def count_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Количество workflow (всего, активных, архивных, по тегам) без хранения полного списка в памяти"""
+        try:
+            summary = summarize_workflows()
+            async for workflow in self.iter_workflows(limit=250, filters=filters, fields=WORKFLOW_SUMMARY_FIELDS):
+                add_to_summary(summary, workflow)
+            return summary
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка: {str(e)}"
+            }
+    
+    async def activate_workflow(self, workflow_id: str) -> Dict:
+        """Активация workflow"""
+        return await self._set_active(workflow_id, True)
+    
+    async def deactivate_workflow(self, workflow_id: str) -> Dict:
+        """Деактивация workflow"""
+        return await self._set_active(workflow_id, False)
+    
+    async def activate_workflows(self, workflow_ids: List[str]) -> Dict:
+        """Активация списка workflow (параллельность ограничена max_concurrency клиента)"""
+        return await self._bulk_set_active(workflow_ids, True)
+    
+    async def deactivate_workflows(self, workflow_ids: List[str]) -> Dict:
+        """Деактивация списка workflow (параллельность ограничена max_concurrency клиента)"""
+        return await self._bulk_set_active(workflow_ids, False)
+    
+    async def _set_active(self, workflow_id: str, active: bool) -> Dict:
+        """Смена статуса через activate/deactivate endpoint, для старых серверов - GET и PUT (set_active_steps)"""
+        try:
+            return await self._run_steps(set_active_steps(self, workflow_id, active))
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка {'активации' if active else 'деактивации'}: {str(e)}"
+            }
+    
+    async def _run_steps(self, steps: Generator[WorkflowRequest, object, Dict]) -> Dict:
+        """Выполнение запросов шагов (update_workflow_steps, set_active_steps) через _request"""
+        try:
+            method, path, body = next(steps)
+            while True:
+                kwargs = {'json': body} if body is not None else {}
+                response = await self._request(method, path, **kwargs)
+                method, path, body = steps.send(response)
+        except StopIteration as done:
+            return done.value
+    
+    async def _bulk_set_active(self, workflow_ids: List[str], active: bool) -> Dict:
+        """Параллельная смена статуса списка workflow"""
+        results = await asyncio.gather(*(self._set_active(workflow_id, active) for workflow_id in workflow_ids))
+        return bulk_activation_summary(dict(zip(workflow_ids, results)), active)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+📦 N8N Bulk Transfer
+Источники и приемники workflow для пакетного импорта/экспорта (JSONL или каталог
+с файлами *.json) и файл контрольной точки для продолжения после сбоя
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Поля, которые принимает POST /api/v1/workflows (остальные поля экспорта n8n отклоняет)
+IMPORT_FIELDS = ('name', 'nodes', 'connections', 'settings', 'staticData')
+
+def importable_workflow(workflow: Dict) -> Dict:
+    """Workflow без полей, назначаемых n8n (id, active, даты, теги, версии)"""
+    data = {key: workflow[key] for key in IMPORT_FIELDS if key in workflow}
+    data.setdefault('settings', {})
+    return data
+
+def source_key(workflow: Dict, occurrences: Dict[str, int]) -> str:
+    """
+    Ключ строки JSONL для контрольной точки: id исходного workflow или хэш содержимого
+    
+    Номер строки не подходит - после правки файла (вставка, сортировка) он указывает
+    на другой workflow. Одинаковые workflow без id различаются порядковым номером повтора.
+    """
+    if workflow.get('id'):
+        base = f"id:{workflow['id']}"
+    else:
+        content = json.dumps(importable_workflow(workflow), sort_keys=True, ensure_ascii=False, default=str)
+        base = f"sha256:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+    
+    occurrences[base] = occurrences.get(base, 0) + 1
+    return base if occurrences[base] == 1 else f"{base}#{occurrences[base]}"
+
+def iter_workflow_source(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Поток workflow из JSONL файла (workflow на строку) или каталога с файлами *.json
+    
+    Yields:
+        (ключ, workflow) - ключ однозначно определяет элемент для контрольной точки
+        (имя файла или source_key строки JSONL)
+    
+    Raises:
+        ValueError: невалидный JSON (с указанием файла или строки)
+    """
+    if os.path.isdir(path):
+        for file_name in sorted(os.listdir(path)):
+            if not file_name.endswith('.json'):
+                continue
+            with open(os.path.join(path, file_name), 'r', encoding='utf-8') as f:
+                try:
+                    workflow = json.load(f)
+                except ValueError as e:
+                    raise ValueError(f"{file_name}: {str(e)}") from e
+            yield file_name, workflow
+        return
+    
+    occurrences: Dict[str, int] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                workflow = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"строка {line_number}: {str(e)}") from e
+            if not isinstance(workflow, dict):
+                raise ValueError(f"строка {line_number}: ожидался объект workflow")
+            yield source_key(workflow, occurrences), workflow
+
+class N8NWorkflowSink:
+    """Запись экспортируемых workflow в JSONL файл или каталог (файл на workflow)"""
+    
+    def __init__(self, path: str, resume_offset: int = 0):
+        """
+        Args:
+            path: Файл .jsonl или каталог (создается при необходимости)
+            resume_offset: Размер JSONL на последней контрольной точке - все, что дописано
+                после нее (строка, не попавшая в контрольную точку при сбое), отбрасывается
+        """
+        self.path = path
+        self.is_directory = not path.endswith('.jsonl')
+        self._lock = threading.Lock()
+        
+        if self.is_directory:
+            os.makedirs(path, exist_ok=True)
+            self._file = None
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, 'ab')
+            self._file.truncate(min(resume_offset, os.path.getsize(path)))
+    
+    def write(self, workflow: Dict) -> Optional[int]:
+        """
+        Запись одного workflow
+        
+        Returns:
+            Размер JSONL файла после записи (для контрольной точки), для каталога - None
+        """
+        if self.is_directory:
+            file_path = os.path.join(self.path, f"{workflow.get('id')}.json")
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(workflow, f, ensure_ascii=False, indent=2)
+            return None
+        
+        with self._lock:
+            self._file.write((json.dumps(workflow, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._file.flush()
+            return self._file.tell()
+    
+    def close(self) -> None:
+        """Закрытие файла JSONL"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class N8NTransferCheckpoint:
+    """
+    Контрольная точка пакетной операции: журнал обработанных ключей (JSONL, только дозапись),
+    переживает аварийное завершение процесса
+    """
+    
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Файл контрольной точки (если существует - загружаются выполненные ключи)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: Set[str] = set()
+        # Наибольшее смещение в приемнике, подтвержденное контрольной точкой (экспорт в JSONL)
+        self.offset = 0
+        
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                data = f.read()
+                # Строка, оборванная при сбое, отрезается - иначе следующая запись склеится с ней
+                complete = data.rfind(b'\n') + 1
+                if complete < len(data):
+                    f.truncate(complete)
+            
+            for line in data[:complete].decode('utf-8', errors='replace').splitlines():
+                try:
+                    record = json.loads(line)
+                    self.done.add(record['key'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.offset = max(self.offset, record.get('offset') or 0)
+        
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+    
+    def mark(self, key: str, **details) -> None:
+        """Отметка выполненного элемента"""
+        with self._lock:
+            self.done.add(key)
+            self._file.write(json.dumps({"key": key, **details}, ensure_ascii=False) + '\n')
+            self._file.flush()
+    
+    def close(self) -> None:
+        """Закрытие журнала"""
+        self._file.close()
+
+def transfer_summary(action: str, processed: int, skipped: int, failed: List[Dict], started: float) -> Dict:
+    """Итог пакетной операции с пропускной способностью (workflow в секунду)"""
+    seconds = time.monotonic() - started
+    
+    return {
+        "status": "success" if not failed else "error",
+        "message": f"{action}: {processed}, пропущено (уже выполнено): {skipped}, ошибок: {len(failed)}",
+        "processed": processed,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "workflows_per_second": round(processed / seconds, 2) if seconds > 0 else 0.0
+    }
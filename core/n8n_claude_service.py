@@ -7,63 +7,317 @@ AI-сервис для генерации n8n workflow на основе опи
 
 import os
 import json
-from typing import Dict, List, Optional, Any
+import time
+import threading
+from typing import Dict, List, Optional, Any, Iterator, Tuple
 import anthropic
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from n8n_knowledge_base import N8NKnowledgeBase
+from n8n_knowledge_base import get_shared_knowledge_base
+from n8n_response_cache import N8NResponseCache, make_request_key
+from n8n_node_catalog import N8NNodeCatalog
+from n8n_node_retriever import N8NNodeRetriever, split_identifier
+from n8n_prompt_builder import N8NPromptBuilder
+from n8n_stream_parser import IncrementalWorkflowParser, StreamStructureError
+from n8n_json_extractor import extract_json_object, JSONExtractionError
+from n8n_workflow_repair import N8NWorkflowRepairer
+from n8n_request_scheduler import N8NRequestScheduler, get_shared_scheduler
+from n8n_single_flight import N8NSingleFlight, get_shared_single_flight
+from n8n_model_router import N8NModelRouter
+
+# Версия шаблона промпта - меняйте при любом изменении _create_n8n_prompt,
+# чтобы не получать из кэша ответы на старый промпт
+PROMPT_TEMPLATE_VERSION = "4"
 
 class N8NClaudeService:
     """Claude AI сервис для генерации n8n workflow"""
     
-    def __init__(self):
-        self.client = anthropic.Anthropic(
-            api_key=os.getenv('CLAUDE_API_KEY', 'your_claude_api_key_here')
+    def __init__(self, use_cache: bool = True, response_cache: Optional[N8NResponseCache] = None,
+                 node_catalog: Optional[N8NNodeCatalog] = None, retrieval_top_k: int = 8,
+                 max_prompt_tokens: int = 600, client: Any = None, max_repair_attempts: int = 3,
+                 request_scheduler: Optional[N8NRequestScheduler] = None,
+                 single_flight: Optional[N8NSingleFlight] = None,
+                 model_router: Optional[N8NModelRouter] = None):
+        """
+        Инициализация сервиса
+        
+        Args:
+            use_cache: Использовать персистентный кэш ответов
+            response_cache: Готовый экземпляр кэша (по умолчанию создается в .cache/)
+            node_catalog: Полный каталог node types n8n (по умолчанию - синхронизированный ранее, если есть)
+            retrieval_top_k: Сколько наиболее релевантных nodes передавать в промпт
+            max_prompt_tokens: Бюджет входных токенов на запрос (без кэшируемого префикса)
+            client: Клиент Anthropic API (например, N8NFakeAnthropicClient для офлайн тестов)
+            max_repair_attempts: Максимум точечных исправлений на workflow (0 - без исправлений)
+            request_scheduler: Планировщик лимитов и повторов (по умолчанию - общий для процесса)
+            single_flight: Объединитель одинаковых одновременных запросов (по умолчанию - общий для процесса)
+            model_router: Выбор модели и лимита токенов по сложности (по умолчанию - маршруты DEFAULT_ROUTES)
+        """
+        # Повторы выполняет планировщик, встроенные повторы SDK отключены
+        self.client = client or anthropic.Anthropic(
+            api_key=os.getenv('CLAUDE_API_KEY', 'your_claude_api_key_here'),
+            max_retries=0
+        )
+        self.request_scheduler = request_scheduler or get_shared_scheduler()
+        self.knowledge_base = get_shared_knowledge_base()
+        
+        # Модель генерации выбирается на каждый запрос, исправления выполняет стандартная модель
+        self.model_router = model_router or N8NModelRouter(self.knowledge_base)
+        self.model = self.model_router.routes['standard']['model']
+        self.node_catalog = node_catalog or N8NNodeCatalog.open_existing()
+        self.node_retriever = N8NNodeRetriever.from_knowledge_base(self.knowledge_base, self.node_catalog)
+        self.retrieval_top_k = retrieval_top_k
+        self.prompt_builder = N8NPromptBuilder(
+            self.knowledge_base, self.node_retriever, self.node_catalog, max_input_tokens=max_prompt_tokens
         )
-        self.model = "claude-sonnet-4-20250514"
-        self.knowledge_base = N8NKnowledgeBase()
         
+        # Точечные исправления ошибок разбора и валидации вместо повторной генерации
+        self.workflow_repairer = None
+        if max_repair_attempts > 0:
+            self.workflow_repairer = N8NWorkflowRepairer(
+                self.client, self.model, self._is_known_node_type, self._suggest_node_types,
+                max_attempts=max_repair_attempts, request_scheduler=self.request_scheduler
+            )
+        
+        self.response_cache = None
+        if use_cache:
+            self.response_cache = response_cache or N8NResponseCache()
+        
+        # Одновременные одинаковые запросы (Streamlit, пакеты) делят один вызов API
+        self.single_flight = single_flight or get_shared_single_flight()
+        
+        # Суммарный расход токенов по всем запросам (с учетом prompt caching)
+        self._usage_lock = threading.Lock()
+        self._usage_totals = {
+            "requests": 0,
+            "repair_requests": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0
+        }
+    
     def generate_workflow(self, description: str, params: Dict = None) -> Dict:
         """Генерация n8n workflow из описания"""
         
         if params is None:
             params = {}
         
-        # Создаем контекст для Claude
-        context = self._create_context(description, params)
+        # Повторные запросы отдаем из кэша без обращения к API
+        cache_key, cached_result = self._lookup_cache(description, params)
+        if cached_result is not None:
+            return cached_result
+        
+        # Такой же запрос уже выполняется - ждем его результат вместо второго вызова
+        request_key = cache_key or self._request_key(description, params)
+        result, shared = self.single_flight.do(
+            request_key, lambda: self._generate(description, params, cache_key)
+        )
+        if shared:
+            result['coalesced'] = True
+        
+        return result
+    
+    def _generate(self, description: str, params: Dict, cache_key: Optional[str]) -> Dict:
+        """Генерация через Claude API (без кэша и объединения запросов)"""
         
-        # Генерируем промпт
-        prompt = self._create_n8n_prompt(description, context)
+        # Создаем контекст и промпт для Claude
+        prompt_result = self._create_n8n_prompt(description, self._create_context(description, params))
+        route = self.model_router.route(description, params)
+        started = time.monotonic()
+        response = None
         
         try:
-            # Запрос к Claude
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4000,
-                messages=[{"role": "user", "content": prompt}]
+            while True:
+                # Запрос к Claude: статический префикс кэшируется на стороне API
+                request = self._request_kwargs(prompt_result, route)
+                response = self.request_scheduler.call(
+                    self.client.messages.create, estimated_tokens=self._estimated_request_tokens(request, prompt_result),
+                    **request
+                )
+                
+                # Ответ обрезан лимитом быстрого маршрута - один повтор на стандартном
+                escalated_route = self.model_router.escalate(route, response)
+                if escalated_route is None:
+                    break
+                self.model_router.record(
+                    route, time.monotonic() - started, {"status": "error", "message": "Ответ обрезан"}, response
+                )
+                route, started = escalated_route, time.monotonic()
+            
+            result = self._finish_generation(
+                description, params, response.content[0].text, prompt_result['metrics'], response, cache_key, route
+            )
+        
+        except Exception as e:
+            result = {
+                "status": "error",
+                "message": f"Ошибка генерации workflow: {str(e)}",
+                "description": description,
+                "route": route
+            }
+        
+        self.model_router.record(route, time.monotonic() - started, result, response)
+        return result
+    
+    def stream_workflow(self, description: str, params: Dict = None) -> Iterator[Dict]:
+        """
+        Потоковая генерация workflow с валидацией nodes по мере их получения
+        
+        Генератор событий:
+            {"event": "node", "index", "node", "replaced"} - node получен и провалидирован
+            {"event": "progress", "characters"} - получен очередной фрагмент ответа
+            {"event": "result", "result"} - итог в формате generate_workflow (всегда последнее событие)
+        
+        Поток закрывается сразу после закрытия корневого объекта JSON, а при неисправимой
+        структуре - не дожидаясь конца генерации. В отличие от generate_workflow обрезанный
+        ответ не повторяется на стандартном маршруте: nodes уже отданы потребителю.
+        """
+        if params is None:
+            params = {}
+        
+        cache_key, cached_result = self._lookup_cache(description, params)
+        if cached_result is not None:
+            yield {"event": "result", "result": cached_result}
+            return
+        
+        prompt_result = self._create_n8n_prompt(description, self._create_context(description, params))
+        route = self.model_router.route(description, params)
+        parser = IncrementalWorkflowParser()
+        started = time.monotonic()
+        response = None
+        
+        try:
+            # Повторяется только открытие потока - до получения первых токенов
+            request = self._request_kwargs(prompt_result, route)
+            estimated_tokens = self._estimated_request_tokens(request, prompt_result)
+            stream = self.request_scheduler.call(
+                lambda: self.client.messages.stream(**request).__enter__(), estimated_tokens=estimated_tokens
             )
             
-            # Парсим ответ
-            workflow_json = self._parse_claude_response(response.content[0].text)
+            with stream:
+                for chunk in stream.text_stream:
+                    for node in parser.feed(chunk):
+                        index = parser.nodes_seen - 1
+                        validated_node = self._validate_node(dict(node), index)
+                        yield {
+                            "event": "node",
+                            "index": index,
+                            "node": validated_node,
+                            "replaced": validated_node['type'] != node.get('type')
+                        }
+                    
+                    yield {"event": "progress", "characters": parser.position}
+                    
+                    # Текст после закрытия JSON не нужен - не ждем его генерации
+                    if parser.complete:
+                        break
+                
+                response = stream.current_message_snapshot
             
-            # Валидируем workflow
-            validated_workflow = self._validate_workflow(workflow_json)
+            usage = getattr(response, 'usage', None)
+            if usage is not None:
+                self.request_scheduler.record_usage(
+                    estimated_tokens, (usage.input_tokens or 0) + (usage.output_tokens or 0)
+                )
             
-            return {
-                "status": "success",
-                "workflow": validated_workflow,
+            result = self._finish_generation(
+                description, params, parser.text, prompt_result['metrics'], response, cache_key, route
+            )
+        
+        except StreamStructureError as e:
+            result = {
+                "status": "error",
+                "message": f"Генерация прервана: {str(e)}",
                 "description": description,
-                "params": params,
-                "claude_response": response.content[0].text[:500] + "..." if len(response.content[0].text) > 500 else response.content[0].text
+                "aborted": True,
+                "characters": parser.position,
+                "route": route
             }
-            
+        
         except Exception as e:
-            return {
+            result = {
                 "status": "error",
                 "message": f"Ошибка генерации workflow: {str(e)}",
-                "description": description
+                "description": description,
+                "route": route
             }
+        
+        self.model_router.record(route, time.monotonic() - started, result, response)
+        yield {"event": "result", "result": result}
+    
+    def _request_key(self, description: str, params: Dict) -> str:
+        """Ключ запроса: нормализованное описание, параметры, модель маршрута и версии промпта и базы знаний"""
+        return make_request_key(
+            description, params, self.model_router.route(description, params)['model'],
+            PROMPT_TEMPLATE_VERSION, self.knowledge_base.version
+        )
+    
+    def _lookup_cache(self, description: str, params: Dict) -> Tuple[Optional[str], Optional[Dict]]:
+        """Ключ запроса в кэше ответов и найденный результат (если есть)"""
+        if self.response_cache is None:
+            return None, None
+        
+        cache_key = self._request_key(description, params)
+        cached_result = self.response_cache.get(cache_key)
+        if cached_result is not None:
+            cached_result['cached'] = True
+        
+        return cache_key, cached_result
+    
+    def _request_kwargs(self, prompt_result: Dict, route: Dict) -> Dict:
+        """Параметры запроса к Messages API: модель и лимит маршрута, префикс промпта помечен для кэширования"""
+        return {
+            "model": route['model'],
+            "max_tokens": route['max_tokens'],
+            "system": [{
+                "type": "text",
+                "text": prompt_result['system'],
+                "cache_control": {"type": "ephemeral"}
+            }],
+            "messages": [{"role": "user", "content": prompt_result['prompt']}]
+        }
+    
+    @staticmethod
+    def _estimated_request_tokens(request: Dict, prompt_result: Dict) -> int:
+        """Оценка токенов запроса для бюджета TPM (вход + максимум выхода, уточняется по usage)"""
+        return prompt_result['metrics']['estimated_tokens'] + request['max_tokens']
+    
+    def _finish_generation(self, description: str, params: Dict, response_text: str,
+                           prompt_metrics: Dict, response: Any, cache_key: Optional[str], route: Dict) -> Dict:
+        """Разбор и валидация ответа, формирование результата и запись в кэш"""
+        
+        # Парсим ответ
+        repair_log = []
+        extraction = self._parse_claude_response(response_text, repair_log)
+        workflow = extraction.pop('value')
+        
+        # Исправляем nodes и connections с ошибками отдельными короткими запросами
+        if self.workflow_repairer is not None:
+            workflow = self.workflow_repairer.repair_workflow(workflow, repair_log)
+        self._record_repair_usage(repair_log)
+        
+        # Валидируем workflow
+        validated_workflow = self._validate_workflow(workflow)
+        
+        result = {
+            "status": "success",
+            "workflow": validated_workflow,
+            "description": description,
+            "params": params,
+            "claude_response": response_text[:500] + "..." if len(response_text) > 500 else response_text,
+            "prompt_metrics": self._with_usage(prompt_metrics, response),
+            "json_extraction": extraction,
+            "repairs": repair_log,
+            "route": route
+        }
+        
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        
+        result['cached'] = False
+        return result
     
     def _create_context(self, description: str, params: Dict) -> Dict:
         """Создание контекста для генерации"""
@@ -81,162 +335,117 @@ class N8NClaudeService:
             "complexity": complexity,
             "suggested_pattern": suggested_pattern,
             "node_categories": node_categories,
-            "available_nodes": list(self.knowledge_base.nodes.keys()),
+            "available_nodes": self._select_relevant_nodes(description, suggested_pattern),
             "workflow_patterns": self.knowledge_base.workflow_patterns
         }
     
+    def _select_relevant_nodes(self, description: str, suggested_pattern: Optional[Dict]) -> List[str]:
+        """Отбор наиболее релевантных описанию nodes для промпта"""
+        
+        selected = [node for node, _ in self.node_retriever.search(description, self.retrieval_top_k)]
+        
+        # Nodes рекомендованного паттерна всегда доступны модели
+        if suggested_pattern:
+            selected += [node for node in suggested_pattern['nodes'] if node not in selected]
+        
+        # Если совпадений мало - дополняем базовыми nodes из базы знаний
+        for node in self.knowledge_base.nodes:
+            if len(selected) >= self.retrieval_top_k:
+                break
+            if node not in selected:
+                selected.append(node)
+        
+        return selected
+    
     def _analyze_required_nodes(self, description: str) -> List[str]:
         """Анализ необходимых типов nodes на основе описания"""
-        description_lower = description.lower()
+        groups = self.knowledge_base.match_keyword_groups(description)
         required_categories = []
         
         # Триггеры
-        if any(word in description_lower for word in ['webhook', 'получать', 'принимать', 'запрос']):
+        if groups & {'webhook', 'request'}:
             required_categories.append('webhook')
         
-        if any(word in description_lower for word in ['каждый', 'периодически', 'час', 'день', 'расписание']):
+        if groups & {'schedule', 'schedule_calendar'}:
             required_categories.append('schedule')
         
         # HTTP запросы
-        if any(word in description_lower for word in ['api', 'запрос', 'данные', 'получить']):
+        if groups & {'api_data', 'request', 'fetch'}:
             required_categories.append('http')
         
         # Google сервисы
-        if any(word in description_lower for word in ['google', 'sheets', 'таблица', 'gmail', 'email']):
+        if 'google' in groups:
             required_categories.append('google')
         
         # Коммуникации
-        if any(word in description_lower for word in ['slack', 'уведомление', 'сообщение']):
+        if 'communication' in groups:
             required_categories.append('communication')
         
         # Обработка данных
-        if any(word in description_lower for word in ['обработать', 'изменить', 'добавить', 'условие']):
+        if 'processing' in groups:
             required_categories.append('processing')
         
         return required_categories
     
-    def _create_n8n_prompt(self, description: str, context: Dict) -> str:
-        """Создание промпта для Claude специально для n8n"""
-        
-        suggested_pattern = context.get('suggested_pattern')
-        pattern_info = ""
-        if suggested_pattern:
-            pattern_info = f"""
-Рекомендуемый паттерн workflow: {suggested_pattern['description']}
-Nodes в паттерне: {suggested_pattern['nodes']}
-Connections: {suggested_pattern['connections']}
-"""
-        
-        available_nodes_info = "\n".join([
-            f"- {node}: {self.knowledge_base.nodes[node]['display_name']} - {self.knowledge_base.nodes[node]['description']}"
-            for node in context['available_nodes'][:10]  # Показываем первые 10
-        ])
-        
-        prompt = f"""
-Ты эксперт по n8n - платформе автоматизации workflow. Создай РАБОЧИЙ n8n workflow на основе описания бизнес-процесса.
-
-ОПИСАНИЕ ПРОЦЕССА:
-{description}
-
-КОНТЕКСТ:
-- Сложность: {context['complexity']}
-- Требуемые категории nodes: {context['node_categories']}
-{pattern_info}
-
-ДОСТУПНЫЕ N8N NODES (используй ТОЛЬКО эти):
-{available_nodes_info}
-
-ОБЯЗАТЕЛЬНЫЕ ТРЕБОВАНИЯ:
-1. Используй ТОЛЬКО реальные n8n node types из списка выше
-2. Создай корректную структуру n8n workflow JSON
-3. Укажи правильные connections между nodes
-4. Добавь реалистичные параметры для каждого node
-5. Включи position координаты для визуального отображения
-6. НЕ используй вымышленные или несуществующие nodes
-
-СТРУКТУРА WORKFLOW:
-```json
-{{
-  "name": "Название workflow",
-  "active": false,
-  "nodes": [
-    {{
-      "id": "1",
-      "name": "Node Name",
-      "type": "n8n-nodes-base.nodetype",
-      "typeVersion": 1,
-      "position": [100, 200],
-      "parameters": {{
-        // реальные параметры node
-      }}
-    }}
-  ],
-  "connections": {{
-    "Node Name": {{
-      "main": [[{{
-        "node": "Next Node Name",
-        "type": "main",
-        "index": 0
-      }}]]
-    }}
-  }},
-  "settings": {{}},
-  "staticData": {{}}
-}}
-```
-
-ВАЖНО:
-- Каждый node должен иметь уникальный id
-- Connections используют имена nodes, не id
-- Position должны быть логично расположены (100px между nodes)
-- Parameters должны соответствовать реальным параметрам n8n nodes
-
-Создай workflow который ТОЧНО БУДЕТ РАБОТАТЬ в n8n!
-"""
-        
-        return prompt
+    def _create_n8n_prompt(self, description: str, context: Dict) -> Dict:
+        """Создание промпта для Claude специально для n8n (префикс, текст запроса и метрики размера)"""
+        return self.prompt_builder.build(description, context)
     
-    def _parse_claude_response(self, response_text: str) -> Dict:
-        """Парсинг ответа Claude для извлечения JSON workflow"""
-        
-        # Ищем JSON блок в ответе
-        start_markers = ['```json', '```', '{']
-        end_markers = ['```', '}']
-        
-        # Находим начало JSON
-        start_pos = -1
-        for marker in start_markers:
-            pos = response_text.find(marker)
-            if pos != -1:
-                start_pos = pos + len(marker)
-                break
-        
-        if start_pos == -1:
-            # Если нет маркеров, ищем первую открывающую скобку
-            start_pos = response_text.find('{')
-        
-        # Находим конец JSON
-        end_pos = len(response_text)
-        if '```' in response_text[start_pos:]:
-            end_pos = response_text.find('```', start_pos)
-        else:
-            # Ищем последнюю закрывающую скобку
-            end_pos = response_text.rfind('}') + 1
-        
-        if start_pos == -1 or end_pos == -1:
-            raise ValueError("Не удалось найти JSON в ответе Claude")
-        
-        json_text = response_text[start_pos:end_pos].strip()
+    def _with_usage(self, prompt_metrics: Dict, response: Any) -> Dict:
+        """Добавление фактического расхода токенов из ответа API к метрикам промпта"""
+        metrics = dict(prompt_metrics)
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return metrics
+        
+        for field in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+            metrics[field] = getattr(usage, field, None)
+        
+        with self._usage_lock:
+            self._usage_totals['requests'] += 1
+            for field in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+                self._usage_totals[field] += metrics[field] or 0
+        
+        return metrics
+    
+    def _record_repair_usage(self, repair_log: List[Dict]) -> None:
+        """Учет токенов точечных исправлений в суммарной статистике"""
+        with self._usage_lock:
+            for entry in repair_log:
+                self._usage_totals['repair_requests'] += 1
+                self._usage_totals['input_tokens'] += entry.get('input_tokens') or 0
+                self._usage_totals['output_tokens'] += entry.get('output_tokens') or 0
+    
+    def get_usage_stats(self) -> Dict:
+        """Суммарный расход токенов и доля входных токенов, прочитанных из кэша промпта"""
+        with self._usage_lock:
+            totals = dict(self._usage_totals)
+        
+        total_input = totals['input_tokens'] + totals['cache_creation_input_tokens'] + totals['cache_read_input_tokens']
+        totals['prompt_cache_hit_rate'] = round(totals['cache_read_input_tokens'] / total_input, 3) if total_input else 0.0
+        totals['scheduler'] = self.request_scheduler.stats()
+        totals['single_flight'] = self.single_flight.stats()
+        totals['routes'] = self.model_router.stats()
+        
+        return totals
+    
+    def _parse_claude_response(self, response_text: str, repair_log: Optional[List[Dict]] = None) -> Dict:
+        """
+        Парсинг ответа Claude для извлечения JSON workflow
         
-        # Очищаем от возможных артефактов
-        if json_text.startswith('json\n'):
-            json_text = json_text[5:]
+        Args:
+            response_text: Ответ Claude
+            repair_log: Журнал исправлений (если передан, сломанные фрагменты JSON исправляются через модель)
         
+        Returns:
+            Dict с workflow (value), смещениями использованного фрагмента и примененными исправлениями
+        """
         try:
-            workflow_json = json.loads(json_text)
-            return workflow_json
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Невалидный JSON от Claude: {str(e)}\nJSON: {json_text[:200]}...")
+            if self.workflow_repairer is not None and repair_log is not None:
+                return self.workflow_repairer.parse(response_text, repair_log)
+            return extract_json_object(response_text, required_keys=('nodes',))
+        except JSONExtractionError as e:
+            raise ValueError(f"Невалидный ответ Claude: {str(e)}")
     
     def _validate_workflow(self, workflow: Dict) -> Dict:
         """Валидация сгенерированного workflow"""
@@ -283,14 +492,26 @@ Connections: {suggested_pattern['connections']}
             "parameters": node.get('parameters', {})
         }
         
-        # Проверяем что node type существует в базе знаний
-        if validated_node['type'] not in self.knowledge_base.nodes:
+        # Проверяем что node type существует в базе знаний или в каталоге n8n
+        if not self._is_known_node_type(validated_node['type']):
             # Заменяем на существующий node
             validated_node['type'] = 'n8n-nodes-base.set'
             validated_node['name'] = f"Set {index + 1}"
         
         return validated_node
     
+    def _suggest_node_types(self, node: Dict) -> List[str]:
+        """Существующие node types, подходящие по имени и типу node с ошибкой"""
+        query = f"{node.get('name', '')} {split_identifier(str(node.get('type', '')))}"
+        suggested = [node_type for node_type, _ in self.node_retriever.search(query, 6)]
+        return suggested or list(self.knowledge_base.nodes)
+    
+    def _is_known_node_type(self, node_type: str) -> bool:
+        """Проверка node type по базе знаний и синхронизированному каталогу"""
+        if node_type in self.knowledge_base.nodes:
+            return True
+        return self.node_catalog is not None and self.node_catalog.has_node_type(node_type)
+    
     def _validate_connections(self, connections: Dict, node_names: List[str]) -> Dict:
         """Валидация connections между nodes"""
         
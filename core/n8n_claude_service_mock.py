@@ -5,13 +5,17 @@ Mock версия для тестирования без Claude API
 """
 
 import json
-from n8n_knowledge_base import N8NKnowledgeBase
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from n8n_knowledge_base import get_shared_knowledge_base
+from n8n_prompt_builder import estimate_tokens
 
 class N8NClaudeServiceMock:
     """Mock версия Claude Service для тестирования"""
     
     def __init__(self):
-        self.knowledge_base = N8NKnowledgeBase()
+        self.knowledge_base = get_shared_knowledge_base()
     
     def generate_workflow(self, description: str, params: dict = None) -> dict:
         """Mock генерация workflow"""
@@ -30,12 +34,22 @@ class N8NClaudeServiceMock:
             "claude_response": "Mock response - workflow generated successfully"
         }
     
+    def stream_workflow(self, description: str, params: dict = None):
+        """Mock потоковой генерации: события nodes и итоговый результат"""
+        result = self.generate_workflow(description, params)
+        
+        for index, node in enumerate(result['workflow']['nodes']):
+            yield {"event": "node", "index": index, "node": node, "replaced": False}
+        
+        yield {"event": "result", "result": result}
+    
     def _create_mock_workflow(self, description: str, params: dict) -> dict:
         """Создание mock workflow на основе паттернов"""
         
         description_lower = description.lower()
         
-        # Определяем тип workflow
+        # Определяем тип workflow (подстроки, а не группы базы знаний: ответы mock -
+        # фиксированные данные тестов и не должны меняться вместе с ключевыми словами)
         if any(word in description_lower for word in ['webhook', 'получать']) and any(word in description_lower for word in ['slack', 'уведомление']):
             return self._create_webhook_to_slack_workflow(description)
         
@@ -222,6 +236,125 @@ class N8NClaudeServiceMock:
             "staticData": {}
         }
 
+class _FakeMessages:
+    """Эмуляция ресурса client.messages"""
+    
+    def __init__(self, owner: 'N8NFakeAnthropicClient'):
+        self._owner = owner
+    
+    def create(self, **kwargs):
+        return self._owner._create_message(**kwargs)
+    
+    def stream(self, **kwargs) -> '_FakeMessageStream':
+        return _FakeMessageStream(self._owner._create_message(**kwargs), self._owner.chunk_size)
+
+class _FakeMessageStream:
+    """Эмуляция MessageStream: текст ответа отдается фрагментами"""
+    
+    def __init__(self, message, chunk_size: int):
+        self.current_message_snapshot = message
+        self._text = message.content[0].text
+        self._chunk_size = chunk_size
+        self.chunks_sent = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    @property
+    def text_stream(self):
+        for start in range(0, len(self._text), self._chunk_size):
+            self.chunks_sent += 1
+            yield self._text[start:start + self._chunk_size]
+    
+    def get_final_message(self):
+        return self.current_message_snapshot
+
+class N8NFakeAnthropicClient:
+    """
+    Офлайн замена anthropic.Anthropic для N8NClaudeService
+    
+    Отвечает mock workflow (или заранее заданными ответами) и эмулирует
+    usage с prompt caching: первый запрос с новым system префиксом записывает
+    его в кэш, последующие - читают из кэша. Ответ длиннее max_tokens обрезается
+    со stop_reason='max_tokens'.
+    """
+    
+    def __init__(self, responses: Optional[List[str]] = None, chunk_size: int = 40):
+        """
+        Args:
+            responses: Тексты ответов по порядку (по умолчанию - mock workflow по описанию)
+            chunk_size: Размер фрагмента текста в потоковом режиме (messages.stream)
+        """
+        self.messages = _FakeMessages(self)
+        self.chunk_size = chunk_size
+        self.requests: List[Dict] = []
+        self._responses = list(responses or [])
+        self._cached_prefixes = set()
+        self._lock = threading.Lock()
+        self._mock_service = N8NClaudeServiceMock()
+    
+    def _create_message(self, **kwargs):
+        """Ответ на messages.create"""
+        system_text = self._system_text(kwargs.get('system'))
+        prompt = "".join(
+            message['content'] for message in kwargs.get('messages', [])
+            if isinstance(message.get('content'), str)
+        )
+        
+        with self._lock:
+            self.requests.append(kwargs)
+            
+            if system_text and system_text in self._cached_prefixes:
+                cache_creation, cache_read = 0, estimate_tokens(system_text)
+            elif system_text:
+                self._cached_prefixes.add(system_text)
+                cache_creation, cache_read = estimate_tokens(system_text), 0
+            else:
+                cache_creation, cache_read = 0, 0
+            
+            text = self._responses.pop(0) if self._responses else None
+        
+        if text is None:
+            workflow = self._mock_service._create_mock_workflow(self._extract_description(prompt), {})
+            text = f"```json\n{json.dumps(workflow, ensure_ascii=False, indent=2)}\n```"
+        
+        # Ответ длиннее max_tokens обрезается, как у настоящего API
+        stop_reason = "end_turn"
+        output_tokens = estimate_tokens(text)
+        max_tokens = kwargs.get('max_tokens')
+        if max_tokens and output_tokens > max_tokens:
+            text = text[:len(text) * max_tokens // output_tokens]
+            output_tokens, stop_reason = max_tokens, "max_tokens"
+        
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(
+                input_tokens=estimate_tokens(prompt),
+                output_tokens=output_tokens,
+                cache_creation_input_tokens=cache_creation,
+                cache_read_input_tokens=cache_read
+            ),
+            stop_reason=stop_reason
+        )
+    
+    @staticmethod
+    def _system_text(system) -> str:
+        """Текст system (строка или список блоков)"""
+        if isinstance(system, list):
+            return "".join(block.get('text', '') for block in system if isinstance(block, dict))
+        return system or ""
+    
+    @staticmethod
+    def _extract_description(prompt: str) -> str:
+        """Описание процесса из текста запроса"""
+        marker = "ОПИСАНИЕ ПРОЦЕССА:\n"
+        if marker not in prompt:
+            return prompt
+        return prompt.split(marker, 1)[1].split("\n\n", 1)[0]
+
 def test_mock_service():
     """Тестирование Mock сервиса"""
     
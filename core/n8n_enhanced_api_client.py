@@ -6,21 +6,29 @@
 
 import requests
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Iterator, Sequence
 import os
+import sys
 from datetime import datetime
 import urllib.parse
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_http_transport import N8NHTTPTransport, get_shared_transport
+from n8n_production_client import (
+    N8NAPIError, WORKFLOW_SUMMARY_FIELDS, iter_workflow_pages, summarize_workflows
+)
+
 class N8NAPIClient:
     """Улучшенный клиент для работы с n8n API"""
     
-    def __init__(self, base_url: str = "http://localhost:5678"):
+    def __init__(self, base_url: str = "http://localhost:5678", transport: Optional[N8NHTTPTransport] = None):
         self.base_url = base_url.rstrip('/')
         self.api_base = f"{self.base_url}/api/v1"  # Public API endpoint
         self.rest_base = f"{self.base_url}/rest"   # Internal REST endpoint
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Пул соединений, таймауты и повторы - общие для всех клиентов процесса
+        self.transport = transport or get_shared_transport()
+        self.session = self.transport.create_session({
             'Content-Type': 'application/json',
             'Accept': 'application/json',
             'User-Agent': 'N8N-Agent/1.0'
@@ -123,27 +131,25 @@ class N8NAPIClient:
                 "message": f"Ошибка проверки: {str(e)}"
             }
     
-    def get_workflows(self) -> Dict:
-        """Получение списка workflow"""
+    def get_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Получение списка workflow (все страницы)"""
         if not self.authenticated:
             return {"status": "error", "message": "Не аутентифицирован"}
         
         try:
-            endpoint = f"{self.api_base}/workflows" if self.auth_method == "api_key" else f"{self.rest_base}/workflows"
-            response = self.session.get(endpoint)
-            
-            if response.status_code == 200:
-                return {
-                    "status": "success",
-                    "workflows": response.json(),
-                    "count": len(response.json().get('data', []))
-                }
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Ошибка получения workflow: {response.status_code}",
-                    "response": response.text
-                }
+            workflows = list(self.iter_workflows(filters=filters))
+            return {
+                "status": "success",
+                "workflows": {"data": workflows},
+                "count": len(workflows)
+            }
+        
+        except N8NAPIError as e:
+            return {
+                "status": "error",
+                "message": str(e),
+                "response": e.response
+            }
                 
         except Exception as e:
             return {
@@ -151,6 +157,30 @@ class N8NAPIClient:
                 "message": f"Ошибка: {str(e)}"
             }
     
+    def iter_workflows(self, limit: int = 100, filters: Optional[Dict] = None,
+                       fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """
+        Постраничный обход workflow по nextCursor (параметры как у N8NProductionClient.iter_workflows)
+        
+        Raises:
+            N8NAPIError: если не аутентифицирован или n8n ответил ошибкой
+        """
+        if not self.authenticated:
+            raise N8NAPIError("Не аутентифицирован")
+        
+        endpoint = f"{self.api_base}/workflows" if self.auth_method == "api_key" else f"{self.rest_base}/workflows"
+        return iter_workflow_pages(self.session, endpoint, limit, filters, fields)
+    
+    def count_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Количество workflow (всего, активных, архивных, по тегам) без загрузки полного списка"""
+        try:
+            return summarize_workflows(self.iter_workflows(limit=250, filters=filters, fields=WORKFLOW_SUMMARY_FIELDS))
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка: {str(e)}"
+            }
+    
     def create_workflow(self, workflow_data: Dict) -> Dict:
         """Создание workflow"""
         if not self.authenticated:
@@ -241,18 +271,32 @@ class N8NAPIClient:
                 "message": f"Ошибка выполнения: {str(e)}"
             }
     
-    def get_node_types(self) -> Dict:
-        """Получение доступных типов nodes"""
+    def get_node_types(self, etag: Optional[str] = None) -> Dict:
+        """
+        Получение доступных типов nodes
+        
+        Args:
+            etag: ETag предыдущего ответа - если каталог не изменился, вернется status "not_modified"
+        """
         try:
+            headers = {'If-None-Match': etag} if etag else {}
+            
             # Этот endpoint обычно доступен без аутентификации
-            response = self.session.get(f"{self.rest_base}/node-types")
+            response = self.session.get(f"{self.rest_base}/node-types", headers=headers)
+            
+            if response.status_code == 304:
+                return {
+                    "status": "not_modified",
+                    "etag": etag
+                }
             
             if response.status_code == 200:
                 node_types = response.json()
                 return {
                     "status": "success",
                     "node_types": node_types,
-                    "count": len(node_types) if isinstance(node_types, list) else len(node_types.get('data', []))
+                    "count": len(node_types) if isinstance(node_types, list) else len(node_types.get('data', [])),
+                    "etag": response.headers.get('ETag')
                 }
             else:
                 return {
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+🔌 N8N HTTP Transport
+Общий транспорт для клиентов n8n API: пул keep-alive соединений,
+таймауты подключения/чтения и повторы только идемпотентных запросов
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Методы, которые безопасно повторять: POST (создание workflow) не повторяется,
+# иначе таймаут чтения после успешной записи создаст дубликат
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# Временные ответы n8n и прокси перед ним
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+class _TimeoutSession(requests.Session):
+    """Session с таймаутом по умолчанию (requests без таймаута ждет ответа бесконечно)"""
+    
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+    
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+class N8NHTTPTransport:
+    """Настройки соединений и общий пул для всех сессий клиентов n8n"""
+    
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 100,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 max_retries: int = 3, backoff_factor: float = 0.5, pool_block: bool = True):
+        """
+        Инициализация транспорта
+        
+        Args:
+            pool_connections: Количество хостов, для которых хранятся пулы
+            pool_maxsize: Максимум keep-alive соединений к одному хосту
+            connect_timeout: Таймаут подключения (секунды)
+            read_timeout: Таймаут ожидания ответа (секунды)
+            max_retries: Максимум повторов идемпотентного запроса
+            backoff_factor: Базовая задержка экспоненциального backoff (секунды)
+            pool_block: Ждать свободное соединение вместо открытия лишних сокетов сверх pool_maxsize
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_block = pool_block
+        
+        # Ошибки подключения повторяются для любого метода (запрос не был отправлен),
+        # ошибки чтения и временные статусы - только для идемпотентных методов
+        self.retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            allowed_methods=IDEMPOTENT_METHODS,
+            status_forcelist=RETRY_STATUS_CODES,
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        
+        # Один адаптер на все сессии: соединения переиспользуются между клиентами
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=self.retry,
+            pool_block=pool_block
+        )
+    
+    @property
+    def timeout(self):
+        """Таймаут запроса в формате requests: (подключение, чтение)"""
+        return (self.connect_timeout, self.read_timeout)
+    
+    def create_session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        """
+        Новая сессия клиента поверх общего пула соединений
+        
+        Args:
+            headers: Заголовки сессии (например, X-N8N-API-KEY)
+        
+        Returns:
+            requests.Session с таймаутами и повторами транспорта
+        """
+        session = _TimeoutSession(self.timeout)
+        session.mount('http://', self.adapter)
+        session.mount('https://', self.adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        if headers:
+            session.headers.update(headers)
+        return session
+    
+    def close(self) -> None:
+        """Закрытие всех соединений пула"""
+        self.adapter.close()
+
+_shared_transport: Optional[N8NHTTPTransport] = None
+_shared_transport_lock = threading.Lock()
+
+def get_shared_transport() -> N8NHTTPTransport:
+    """
+    Общий транспорт процесса (настройки из N8N_HTTP_POOL_SIZE, N8N_HTTP_CONNECT_TIMEOUT,
+    N8N_HTTP_READ_TIMEOUT, N8N_HTTP_MAX_RETRIES)
+    """
+    global _shared_transport
+    
+    if _shared_transport is None:
+        with _shared_transport_lock:
+            if _shared_transport is None:
+                _shared_transport = N8NHTTPTransport(
+                    pool_maxsize=int(os.getenv('N8N_HTTP_POOL_SIZE', '100')),
+                    connect_timeout=float(os.getenv('N8N_HTTP_CONNECT_TIMEOUT', '5')),
+                    read_timeout=float(os.getenv('N8N_HTTP_READ_TIMEOUT', '30')),
+                    max_retries=int(os.getenv('N8N_HTTP_MAX_RETRIES', '3'))
+                )
+    
+    return _shared_transport
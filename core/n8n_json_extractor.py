@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+🧩 N8N JSON Extractor
+Извлечение JSON workflow из ответа модели за один проход
+с восстановлением типичных ошибок (висячие запятые, комментарии, обрыв ответа)
+"""
+
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CLOSING_BRACKETS = {'}': '{', ']': '['}
+OPENING_TO_CLOSING = {'{': '}', '[': ']'}
+
+class JSONExtractionError(ValueError):
+    """В ответе не найден подходящий JSON объект"""
+
+# Символы значений верхнего уровня вне строк: числа и литералы true/false/null
+ROOT_VALUE_CHARS = frozenset('+-.0123456789eEtrufalsn')
+
+def root_level_step(char: str, expect_value: bool) -> Optional[bool]:
+    """
+    Проверка символа на верхнем уровне объекта (вне строк, кроме кавычек и закрывающих скобок)
+    
+    Вложенные объекты и литералы допустимы только как значение после ":", слова
+    вне строк невозможны. Так "{" в тексте ответа отбрасывается сразу, даже если
+    настоящий JSON начинается внутри него.
+    
+    Returns:
+        Новое состояние (ожидается ли значение) или None, если это не JSON
+    """
+    if char in ' \t\r\n':
+        return expect_value
+    if char == ':':
+        return True
+    if char == ',':
+        return False
+    if char in '{[' or char in ROOT_VALUE_CHARS:
+        return expect_value or None
+    return None
+
+def scan_object(text: str, start: int) -> Optional[Tuple[int, str]]:
+    """
+    Сканирование одного JSON объекта, начинающегося с "{" в позиции start
+    
+    Учитываются строки и экранирование, комментарии // и /* */ пропускаются.
+    Объект отбрасывается при несовпадении скобок, обратных кавычках (начало code fence)
+    или нарушении структуры верхнего уровня (root_level_step).
+    
+    Returns:
+        (end, closers) - closers дополняет оборванный в конце ответа объект
+        (пустая у завершенных), или None, если это не JSON
+    """
+    stack: List[str] = ['{']
+    in_string = False
+    escape = False
+    expect_value = False
+    length = len(text)
+    i = start + 1
+    
+    while i < length:
+        char = text[i]
+        
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            i += 1
+            continue
+        
+        if char == '"':
+            in_string = True
+        
+        elif char == '/' and text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = length if newline == -1 else newline
+            continue
+        
+        elif char == '/' and text.startswith('/*', i):
+            comment_end = text.find('*/', i + 2)
+            i = length if comment_end == -1 else comment_end + 2
+            continue
+        
+        elif char in '}]':
+            if stack[-1] != CLOSING_BRACKETS[char]:
+                return None
+            stack.pop()
+            if not stack:
+                return i + 1, ''
+        
+        elif len(stack) == 1:
+            expect_value = root_level_step(char, expect_value)
+            if expect_value is None:
+                return None
+            if char in '{[':
+                stack.append(char)
+        
+        elif char in '{[':
+            stack.append(char)
+        
+        elif char == '`':
+            # Обратные кавычки вне строк в JSON невозможны - это был текст, а не объект
+            return None
+        
+        i += 1
+    
+    closers = ('"' if in_string else '') + "".join(OPENING_TO_CLOSING[b] for b in reversed(stack))
+    return length, closers
+
+def scan_candidates(text: str) -> List[Tuple[int, int, str]]:
+    """
+    Поиск JSON объектов верхнего уровня
+    
+    Если "{" оказался текстом (см. scan_object), поиск продолжается
+    со следующей "{" после него - в том числе внутри отброшенного фрагмента.
+    
+    Returns:
+        Список (start, end, closers) непересекающихся кандидатов
+    """
+    candidates = []
+    start = text.find('{')
+    
+    while start != -1:
+        scanned = scan_object(text, start)
+        if scanned is None:
+            start = text.find('{', start + 1)
+            continue
+        
+        end, closers = scanned
+        candidates.append((start, end, closers))
+        start = text.find('{', end)
+    
+    return candidates
+
+def object_spans(text: str, start: int, end: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Границы (start, end) объектов в text[start:end] в порядке открывающих "{"
+    (end = None у незакрытых в конце текста)
+    
+    Строки и комментарии пропускаются, поэтому порядок совпадает с обходом
+    разобранного значения в глубину (iter_dicts).
+    """
+    spans: List[List[Optional[int]]] = []
+    open_objects: List[int] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    i = start
+    
+    while i < end:
+        char = text[i]
+        
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif text.startswith('//', i):
+            newline = text.find('\n', i, end)
+            i = end if newline == -1 else newline
+            continue
+        elif text.startswith('/*', i):
+            comment_end = text.find('*/', i + 2, end)
+            i = end if comment_end == -1 else comment_end + 2
+            continue
+        elif char in '{[':
+            stack.append(char)
+            if char == '{':
+                open_objects.append(len(spans))
+                spans.append([i, None])
+        elif char in '}]' and stack:
+            if stack.pop() == '{':
+                spans[open_objects.pop()][1] = i + 1
+        
+        i += 1
+    
+    return [(span_start, span_end) for span_start, span_end in spans]
+
+def iter_dicts(value):
+    """Объекты разобранного JSON в порядке обхода в глубину (как их "{" в тексте)"""
+    if isinstance(value, dict):
+        yield value
+        for item in value.values():
+            yield from iter_dicts(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_dicts(item)
+
+def strip_comments(text: str) -> str:
+    """Удаление комментариев // и /* */ вне строк"""
+    result = []
+    in_string = False
+    escape = False
+    length = len(text)
+    i = 0
+    
+    while i < length:
+        char = text[i]
+        
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = length if newline == -1 else newline
+            continue
+        elif text.startswith('/*', i):
+            comment_end = text.find('*/', i + 2)
+            i = length if comment_end == -1 else comment_end + 2
+            continue
+        
+        result.append(char)
+        i += 1
+    
+    return "".join(result)
+
+def strip_trailing_commas(text: str) -> str:
+    """Удаление запятых перед закрывающей скобкой вне строк"""
+    result = []
+    in_string = False
+    escape = False
+    length = len(text)
+    
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ',':
+            j = i + 1
+            while j < length and text[j] in ' \t\r\n':
+                j += 1
+            if j < length and text[j] in '}]':
+                continue
+        
+        result.append(char)
+    
+    return "".join(result)
+
+def repair_json(text: str, closers: str = '') -> Tuple[str, List[str]]:
+    """
+    Восстановление JSON: комментарии, висячие запятые, незакрытые скобки
+    
+    Returns:
+        (исправленный текст, список примененных исправлений)
+    """
+    repairs = []
+    
+    repaired = strip_comments(text)
+    if repaired != text:
+        repairs.append("comments")
+    
+    without_commas = strip_trailing_commas(repaired)
+    if without_commas != repaired:
+        repairs.append("trailing_commas")
+    
+    if closers:
+        # Висячая запятая в месте обрыва тоже мешает закрыть объект
+        # (если обрыв внутри строки - это текст строки, его не трогаем)
+        if not closers.startswith('"'):
+            without_commas = without_commas.rstrip().rstrip(',')
+        without_commas += closers
+        repairs.append("truncated")
+    
+    return without_commas, repairs
+
+def _parse_candidate(text: str, closers: str) -> Tuple[Optional[Dict], List[str]]:
+    """Разбор кандидата как есть, а при ошибке - после восстановления"""
+    if not closers:
+        try:
+            value = json.loads(text)
+            return (value if isinstance(value, dict) else None), []
+        except json.JSONDecodeError:
+            pass
+    
+    repaired, repairs = repair_json(text, closers)
+    try:
+        value = json.loads(repaired)
+    except json.JSONDecodeError:
+        return None, repairs
+    
+    return (value if isinstance(value, dict) else None), repairs
+
+def _nested_with_keys(text: str, start: int, end: int, value: Dict,
+                      required_keys: Sequence[str]) -> Optional[Tuple[Dict, int, int]]:
+    """
+    Внешний закрытый объект с required_keys внутри разобранного кандидата (например,
+    {"workflow": {...}}) - по разобранному значению, без повторного сканирования текста
+    
+    Returns:
+        (объект, start, end) или None
+    """
+    dicts = list(iter_dicts(value))
+    spans = object_spans(text, start, end)
+    if len(dicts) != len(spans):
+        # Повторяющиеся ключи: json.loads оставил не все объекты, сопоставить нельзя
+        return None
+    
+    for nested, (nested_start, nested_end) in zip(dicts[1:], spans[1:]):
+        if nested_end is not None and all(key in nested for key in required_keys):
+            return nested, nested_start, nested_end
+    return None
+
+def extract_json_object(text: str, required_keys: Sequence[str] = ('nodes',)) -> Dict:
+    """
+    Извлечение наибольшего валидного JSON объекта из ответа модели
+    
+    Предпочитаются объекты, содержащие все required_keys. Разобранный кандидат без
+    required_keys не сканируется заново: вложенный объект с ними (обертка
+    {"workflow": {...}}) ищется в уже разобранном значении, и поиск продолжается после
+    кандидата. Повторно сканируется только фрагмент, отброшенный как текст (или не
+    разобравшийся): "{" в тексте перед JSON не мешает найти сам workflow. Такой фрагмент
+    обрывается на первом символе вне грамматики верхнего уровня, поэтому повторное
+    сканирование ограничено вложенными в него объектами - O(n * d), где d - глубина
+    вложенности внутри отброшенных фрагментов (для обычного текста - O(n)).
+    
+    Returns:
+        Dict с объектом (value), смещениями в символах (start, end) и байтах UTF-8
+        (byte_start, byte_end) и списком исправлений (repairs)
+    
+    Raises:
+        JSONExtractionError: если в ответе нет ни одного валидного объекта
+    """
+    best = None
+    best_rank = None
+    
+    start = text.find('{')
+    
+    while start != -1:
+        scanned = scan_object(text, start)
+        value = None
+        if scanned is not None:
+            end, closers = scanned
+            value, repairs = _parse_candidate(text[start:end], closers)
+        
+        if value is None:
+            # Не JSON или не разобрался - пробуем следующую "{" (в том числе внутри фрагмента)
+            start = text.find('{', start + 1)
+            continue
+        
+        candidates = [(value, start, end, not closers)]
+        if not all(key in value for key in required_keys):
+            nested = _nested_with_keys(text, start, end, value, required_keys)
+            if nested is not None:
+                candidates.append((*nested, True))
+        
+        for candidate, candidate_start, candidate_end, complete in candidates:
+            has_keys = all(key in candidate for key in required_keys)
+            rank = (has_keys, complete, candidate_end - candidate_start)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = (candidate, candidate_start, candidate_end, repairs), rank
+        
+        start = text.find('{', end)
+    
+    if best is None:
+        raise JSONExtractionError(f"Не удалось найти JSON в ответе: {text[:200]}...")
+    
+    value, start, end, repairs = best
+    byte_start = len(text[:start].encode('utf-8'))
+    
+    return {
+        "value": value,
+        "start": start,
+        "end": end,
+        "byte_start": byte_start,
+        "byte_end": byte_start + len(text[start:end].encode('utf-8')),
+        "repairs": repairs
+    }
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+🔎 N8N Keyword Matcher
+Многошаблонный поиск ключевых слов в описаниях (Aho-Corasick по основам слов)
+с легким стеммингом для русского и английского
+"""
+
+import re
+from typing import Dict, List, Set
+
+TOKEN_PATTERN = re.compile(r"[a-zа-яё0-9]+")
+
+# Окончания упорядочены от длинных к коротким - отрезается самое длинное подходящее
+RU_SUFFIXES = sorted([
+    'иями', 'ениям', 'ением', 'ения', 'ение', 'ении', 'ений', 'ться', 'тся',
+    'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ать', 'ять', 'ить', 'еть', 'уть', 'ешь', 'ишь',
+    'ые', 'ый', 'ая', 'ое', 'ой', 'ий', 'ие', 'ия', 'ию', 'ью', 'ов', 'ев', 'ом', 'ем', 'ам',
+    'ах', 'ях', 'ых', 'их', 'ую', 'юю', 'ет', 'ит', 'ут', 'ют', 'ат', 'ят', 'им',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й'
+], key=len, reverse=True)
+
+EN_SUFFIXES = ['ing', 'ed', 'es', 's']
+
+# Минимальная длина основы после отсечения окончания
+MIN_STEM_LENGTH = 3
+
+# Префикс ключевого слова, которое должно совпасть со словоформой точно (без стемминга):
+# "=получать" не совпадает с "получить", хотя основа у них общая
+EXACT_PREFIX = '='
+
+def stem(word: str) -> str:
+    """Легкий стемминг: отсечение типичного окончания (русский или английский)"""
+    word = word.lower().replace('ё', 'е')
+    suffixes = RU_SUFFIXES if re.search('[а-я]', word) else EN_SUFFIXES
+    
+    for suffix in suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    
+    return word
+
+def tokenize(text: str, stemmed: bool = True) -> List[str]:
+    """Разбиение текста на основы слов (или словоформы при stemmed=False)"""
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    return [stem(token) for token in tokens] if stemmed else [token.replace('ё', 'е') for token in tokens]
+
+class KeywordMatcher:
+    """Автомат Aho-Corasick над последовательностями основ слов"""
+    
+    def __init__(self, stemmed: bool = True):
+        """
+        Args:
+            stemmed: Сравнивать основы слов (False - словоформы целиком)
+        """
+        self.stemmed = stemmed
+        
+        # Переходы, суффиксные ссылки и выходы по состояниям автомата
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        self._built = True
+    
+    def add(self, phrase: str, label: str) -> None:
+        """Добавление ключевого слова или фразы с меткой"""
+        tokens = tokenize(phrase, self.stemmed)
+        if not tokens:
+            return
+        
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[state][token] = next_state
+            state = next_state
+        
+        self._output[state].add(label)
+        self._built = False
+    
+    def build(self) -> None:
+        """Построение суффиксных ссылок (обход в ширину)"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+        
+        self._built = True
+    
+    def match_tokens(self, tokens: List[str]) -> Set[str]:
+        """Метки всех ключевых фраз, встречающихся в последовательности основ"""
+        if not self._built:
+            self.build()
+        
+        labels = set()
+        state = 0
+        
+        for token in tokens:
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            
+            if self._output[state]:
+                labels |= self._output[state]
+        
+        return labels
+    
+    def match(self, text: str) -> Set[str]:
+        """Метки всех ключевых фраз, встречающихся в тексте"""
+        return self.match_tokens(tokenize(text, self.stemmed))
+
+class KeywordGroupMatcher:
+    """Группы ключевых слов: совпадение по основам и точные словоформы (EXACT_PREFIX)"""
+    
+    def __init__(self):
+        self.stemmed = KeywordMatcher()
+        self.exact = KeywordMatcher(stemmed=False)
+    
+    def add(self, keyword: str, group: str) -> None:
+        """Добавление ключевого слова группы"""
+        if keyword.startswith(EXACT_PREFIX):
+            self.exact.add(keyword[len(EXACT_PREFIX):], group)
+        else:
+            self.stemmed.add(keyword, group)
+    
+    def build(self) -> None:
+        """Построение обоих автоматов"""
+        self.stemmed.build()
+        self.exact.build()
+    
+    def match(self, text: str) -> Set[str]:
+        """Группы, ключевые слова которых встречаются в тексте"""
+        return self.stemmed.match(text) | self.exact.match(text)
+
+class InvertedIndex:
+    """Инвертированный индекс: основа слова -> документы (с сохранением порядка документов)"""
+    
+    def __init__(self):
+        self._postings: Dict[str, Set[str]] = {}
+        self._order: Dict[str, int] = {}
+    
+    def add(self, doc_id: str, text: str) -> None:
+        """Индексация текста документа"""
+        self._order.setdefault(doc_id, len(self._order))
+        for token in tokenize(text):
+            self._postings.setdefault(token, set()).add(doc_id)
+    
+    def search(self, phrases: List[str]) -> List[str]:
+        """Документы, содержащие все основы хотя бы одной из фраз"""
+        matched: Set[str] = set()
+        
+        for phrase in phrases:
+            tokens = tokenize(phrase)
+            if not tokens:
+                continue
+            
+            docs = None
+            for token in tokens:
+                postings = self._postings.get(token, set())
+                docs = postings if docs is None else docs & postings
+                if not docs:
+                    break
+            
+            matched |= docs or set()
+        
+        return sorted(matched, key=self._order.__getitem__)
+
+def build_matcher(keyword_groups: Dict[str, List[str]]) -> KeywordGroupMatcher:
+    """Построение автоматов по группам ключевых слов {группа: [слова]}"""
+    matcher = KeywordGroupMatcher()
+    for group, keywords in keyword_groups.items():
+        for keyword in keywords:
+            matcher.add(keyword, group)
+    matcher.build()
+    return matcher
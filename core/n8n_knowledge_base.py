@@ -2,240 +2,136 @@
 """
 📚 N8N Knowledge Base
 База знаний n8n nodes для генерации workflow
+
+Источник истины - config/n8n_nodes.yaml. При первой загрузке YAML компилируется
+в бинарный снапшот в каталоге кэша; последующие запуски читают снапшот, пока
+YAML не изменился (проверка по mtime/размеру, затем по sha256).
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
+import os
+import sys
+import copy
 import yaml
 import json
+import pickle
+import hashlib
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_response_cache import DEFAULT_CACHE_DIR
+from n8n_keyword_matcher import InvertedIndex, build_matcher
+
+# Файл определений nodes и паттернов
+DEFAULT_CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'n8n_nodes.yaml'
+)
+
+# Версия формата снапшота - меняйте при изменении структуры сохраняемых данных
+SNAPSHOT_FORMAT_VERSION = 2
 
 class N8NKnowledgeBase:
     """База знаний n8n nodes и их возможностей"""
     
-    def __init__(self):
-        self.nodes = self._initialize_nodes()
+    def __init__(self, config_path: str = None, snapshot_dir: str = None):
+        """
+        Инициализация базы знаний
+        
+        Args:
+            config_path: Путь к YAML с определениями (по умолчанию config/n8n_nodes.yaml)
+            snapshot_dir: Каталог для бинарного снапшота (None - каталог кэша по умолчанию)
+        """
+        self.config_path = config_path or DEFAULT_CONFIG_PATH
+        self.snapshot_path = os.path.join(snapshot_dir or DEFAULT_CACHE_DIR, 'kb_snapshot.pickle')
+        self.loaded_from = None
+        
+        definitions = self._load_definitions()
+        self.nodes = definitions['nodes']
+        self.workflow_patterns = definitions['workflow_patterns']
+        self.keyword_groups = definitions['keyword_groups']
+        self.version = definitions['version']
         self.categories = self._categorize_nodes()
-        self.workflow_patterns = self._initialize_patterns()
+        
+        # Индексы для поиска по описаниям строятся один раз при загрузке
+        self.keyword_matcher = build_matcher(self.keyword_groups)
+        self.use_case_index = InvertedIndex()
+        for node_name, node_info in self.nodes.items():
+            self.use_case_index.add(node_name, ' '.join(node_info.get('use_cases', [])))
     
-    def _initialize_nodes(self) -> Dict[str, Dict]:
-        """Инициализация базы знаний nodes"""
-        return {
-            # === TRIGGER NODES ===
-            "n8n-nodes-base.webhook": {
-                "category": "trigger",
-                "display_name": "Webhook",
-                "description": "Получение HTTP запросов для запуска workflow",
-                "parameters": {
-                    "httpMethod": {"type": "options", "options": ["GET", "POST", "PUT", "DELETE", "PATCH"]},
-                    "path": {"type": "string", "description": "URL path для webhook"},
-                    "authentication": {"type": "options", "options": ["none", "basicAuth", "headerAuth"]}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Получение данных от внешних систем",
-                    "Интеграция с третьими сторонами",
-                    "Автоматический запуск при событиях"
-                ],
-                "example_config": {
-                    "httpMethod": "POST",
-                    "path": "webhook-data",
-                    "authentication": "none"
-                }
-            },
-            
-            "n8n-nodes-base.schedule": {
-                "category": "trigger", 
-                "display_name": "Schedule Trigger",
-                "description": "Запуск workflow по расписанию",
-                "parameters": {
-                    "rule": {"type": "options", "options": ["interval", "cron"]},
-                    "interval": {"type": "number", "description": "Интервал в минутах"},
-                    "cronExpression": {"type": "string", "description": "Cron выражение"}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Регулярная обработка данных",
-                    "Периодические отчеты",
-                    "Автоматическая синхронизация"
-                ]
-            },
-            
-            # === HTTP NODES ===
-            "n8n-nodes-base.httpRequest": {
-                "category": "regular",
-                "display_name": "HTTP Request",
-                "description": "Выполнение HTTP запросов к API",
-                "parameters": {
-                    "url": {"type": "string", "required": True},
-                    "method": {"type": "options", "options": ["GET", "POST", "PUT", "DELETE", "PATCH"]},
-                    "headers": {"type": "fixedCollection", "description": "HTTP заголовки"},
-                    "body": {"type": "json", "description": "Тело запроса"},
-                    "authentication": {"type": "options", "options": ["none", "basicAuth", "oAuth2", "apiKey"]}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Интеграция с REST API",
-                    "Получение данных от сервисов",
-                    "Отправка данных в системы"
-                ],
-                "example_config": {
-                    "url": "https://api.example.com/data",
-                    "method": "GET",
-                    "headers": {"Content-Type": "application/json"}
-                }
-            },
-            
-            # === GOOGLE SERVICES ===
-            "n8n-nodes-base.googleSheets": {
-                "category": "regular",
-                "display_name": "Google Sheets",
-                "description": "Работа с Google Таблицами",
-                "parameters": {
-                    "operation": {"type": "options", "options": ["append", "read", "update", "clear"]},
-                    "sheetId": {"type": "string", "required": True},
-                    "range": {"type": "string", "description": "Диапазон ячеек (A1:C10)"},
-                    "values": {"type": "array", "description": "Данные для записи"}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Сохранение данных в таблицы",
-                    "Чтение конфигураций",
-                    "Создание отчетов"
-                ],
-                "connection_required": "googleSheetsOAuth2Api"
-            },
-            
-            "n8n-nodes-base.gmail": {
-                "category": "regular",
-                "display_name": "Gmail",
-                "description": "Отправка и получение email через Gmail",
-                "parameters": {
-                    "operation": {"type": "options", "options": ["send", "get", "getAll"]},
-                    "to": {"type": "string", "description": "Email получателя"},
-                    "subject": {"type": "string", "description": "Тема письма"},
-                    "message": {"type": "string", "description": "Текст сообщения"},
-                    "attachments": {"type": "fixedCollection", "description": "Вложения"}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Отправка уведомлений",
-                    "Автоматические отчеты",
-                    "Обработка входящей почты"
-                ],
-                "connection_required": "gmailOAuth2"
-            },
-            
-            # === COMMUNICATION ===
-            "n8n-nodes-base.slack": {
-                "category": "regular",
-                "display_name": "Slack",
-                "description": "Интеграция со Slack",
-                "parameters": {
-                    "operation": {"type": "options", "options": ["postMessage", "update", "get"]},
-                    "channel": {"type": "string", "description": "Канал Slack"},
-                    "text": {"type": "string", "description": "Текст сообщения"},
-                    "username": {"type": "string", "description": "Имя бота"},
-                    "attachments": {"type": "fixedCollection", "description": "Вложения"}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Уведомления команды",
-                    "Алерты системы",
-                    "Интерактивные боты"
-                ],
-                "connection_required": "slackApi"
-            },
-            
-            # === DATA PROCESSING ===
-            "n8n-nodes-base.set": {
-                "category": "regular",
-                "display_name": "Set",
-                "description": "Установка и модификация данных",
-                "parameters": {
-                    "values": {"type": "fixedCollection", "description": "Поля для установки"},
-                    "options": {"type": "collection", "description": "Дополнительные опции"}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Трансформация данных",
-                    "Добавление полей",
-                    "Изменение структуры"
-                ],
-                "example_config": {
-                    "values": {
-                        "string": [
-                            {"name": "processed_at", "value": "{{ $now }}"},
-                            {"name": "status", "value": "completed"}
-                        ]
-                    }
-                }
-            },
-            
-            "n8n-nodes-base.if": {
-                "category": "regular",
-                "display_name": "IF",
-                "description": "Условная логика",
-                "parameters": {
-                    "conditions": {"type": "fixedCollection", "description": "Условия для проверки"},
-                    "combineOperation": {"type": "options", "options": ["any", "all"]}
-                },
-                "outputs": ["main", "fallback"],
-                "use_cases": [
-                    "Условная обработка",
-                    "Фильтрация данных", 
-                    "Ветвление логики"
-                ]
-            },
-            
-            "n8n-nodes-base.switch": {
-                "category": "regular",
-                "display_name": "Switch",
-                "description": "Множественное ветвление",
-                "parameters": {
-                    "mode": {"type": "options", "options": ["expression", "rules"]},
-                    "value": {"type": "string", "description": "Значение для сравнения"},
-                    "rules": {"type": "fixedCollection", "description": "Правила ветвления"}
-                },
-                "outputs": ["main", "fallback"],
-                "use_cases": [
-                    "Маршрутизация данных",
-                    "Множественные условия",
-                    "Обработка разных типов"
-                ]
-            },
-            
-            # === UTILITIES ===
-            "n8n-nodes-base.merge": {
-                "category": "regular",
-                "display_name": "Merge",
-                "description": "Объединение данных из разных источников",
-                "parameters": {
-                    "mode": {"type": "options", "options": ["append", "merge", "multiplex"]},
-                    "joinMode": {"type": "options", "options": ["inner", "left", "outer"]}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Объединение данных",
-                    "Синхронизация потоков",
-                    "Агрегация результатов"
-                ]
-            },
-            
-            "n8n-nodes-base.wait": {
-                "category": "regular", 
-                "display_name": "Wait",
-                "description": "Пауза в выполнении workflow",
-                "parameters": {
-                    "amount": {"type": "number", "description": "Время ожидания"},
-                    "unit": {"type": "options", "options": ["seconds", "minutes", "hours", "days"]}
-                },
-                "outputs": ["main"],
-                "use_cases": [
-                    "Задержка обработки",
-                    "Ожидание внешних событий",
-                    "Throttling запросов"
-                ]
-            }
+    def _load_definitions(self) -> Dict:
+        """Загрузка определений из снапшота или YAML (с пересборкой снапшота)"""
+        
+        if not os.path.exists(self.config_path):
+            raise FileNotFoundError(f"Не найден файл базы знаний: {self.config_path}")
+        
+        stat = os.stat(self.config_path)
+        snapshot = self._read_snapshot()
+        
+        if snapshot is not None and snapshot['source_mtime_ns'] == stat.st_mtime_ns \
+                and snapshot['source_size'] == stat.st_size:
+            self.loaded_from = 'snapshot'
+            return snapshot
+        
+        with open(self.config_path, 'rb') as f:
+            raw = f.read()
+        source_sha256 = hashlib.sha256(raw).hexdigest()
+        
+        # Файл "тронули", но содержимое прежнее - обновляем только метаданные
+        if snapshot is not None and snapshot['source_sha256'] == source_sha256:
+            snapshot['source_mtime_ns'] = stat.st_mtime_ns
+            snapshot['source_size'] = stat.st_size
+            self._write_snapshot(snapshot)
+            self.loaded_from = 'snapshot'
+            return snapshot
+        
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        data = yaml.load(raw.decode('utf-8'), Loader=loader) or {}
+        
+        nodes = data.get('nodes') or {}
+        workflow_patterns = data.get('workflow_patterns') or {}
+        keyword_groups = data.get('keyword_groups') or {}
+        
+        snapshot = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "source_path": os.path.abspath(self.config_path),
+            "source_mtime_ns": stat.st_mtime_ns,
+            "source_size": stat.st_size,
+            "source_sha256": source_sha256,
+            "nodes": nodes,
+            "workflow_patterns": workflow_patterns,
+            "keyword_groups": keyword_groups,
+            "version": self._compute_version(nodes, workflow_patterns, keyword_groups)
         }
+        self._write_snapshot(snapshot)
+        self.loaded_from = 'yaml'
+        
+        return snapshot
+    
+    def _read_snapshot(self) -> Optional[Dict]:
+        """Чтение снапшота (None если отсутствует, поврежден или от другого источника)"""
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return None
+        
+        if not isinstance(snapshot, dict) \
+                or snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION \
+                or snapshot.get('source_path') != os.path.abspath(self.config_path):
+            return None
+        
+        return snapshot
+    
+    def _write_snapshot(self, snapshot: Dict) -> None:
+        """Атомарная запись снапшота (ошибки записи не мешают работе)"""
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            pass
     
     def _categorize_nodes(self) -> Dict[str, List[str]]:
         """Категоризация nodes"""
@@ -249,45 +145,14 @@ class N8NKnowledgeBase:
         
         return categories
     
-    def _initialize_patterns(self) -> Dict[str, Dict]:
-        """Инициализация паттернов workflow"""
-        return {
-            "webhook_to_action": {
-                "description": "Получение webhook и выполнение действия",
-                "nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.set"],
-                "connections": [{"from": 0, "to": 1}],
-                "use_case": "Простая обработка входящих данных"
-            },
-            
-            "scheduled_data_sync": {
-                "description": "Периодическая синхронизация данных",
-                "nodes": ["n8n-nodes-base.schedule", "n8n-nodes-base.httpRequest", "n8n-nodes-base.googleSheets"],
-                "connections": [{"from": 0, "to": 1}, {"from": 1, "to": 2}],
-                "use_case": "Регулярное получение и сохранение данных"
-            },
-            
-            "conditional_notification": {
-                "description": "Условные уведомления",
-                "nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.if", "n8n-nodes-base.slack", "n8n-nodes-base.gmail"],
-                "connections": [
-                    {"from": 0, "to": 1},
-                    {"from": 1, "to": 2, "output": "main"},
-                    {"from": 1, "to": 3, "output": "fallback"}
-                ],
-                "use_case": "Разные уведомления в зависимости от условий"
-            },
-            
-            "api_to_multiple_destinations": {
-                "description": "Получение данных и отправка в несколько мест",
-                "nodes": ["n8n-nodes-base.httpRequest", "n8n-nodes-base.set", "n8n-nodes-base.googleSheets", "n8n-nodes-base.slack"],
-                "connections": [
-                    {"from": 0, "to": 1},
-                    {"from": 1, "to": 2},
-                    {"from": 1, "to": 3}
-                ],
-                "use_case": "Распределение данных по системам"
-            }
-        }
+    @staticmethod
+    def _compute_version(nodes: Dict, workflow_patterns: Dict, keyword_groups: Dict) -> str:
+        """Версия базы знаний - хэш содержимого nodes, паттернов и ключевых слов"""
+        content = json.dumps(
+            {"nodes": nodes, "workflow_patterns": workflow_patterns, "keyword_groups": keyword_groups},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
     
     def get_node_info(self, node_name: str) -> Optional[Dict]:
         """Получение информации о node"""
@@ -297,34 +162,29 @@ class N8NKnowledgeBase:
         """Получение nodes по категории"""
         return self.categories.get(category, [])
     
+    def match_keyword_groups(self, description: str) -> Set[str]:
+        """Группы ключевых слов (keyword_groups), найденные в описании за один проход"""
+        return self.keyword_matcher.match(description)
+    
     def find_nodes_by_use_case(self, use_case_keywords: List[str]) -> List[str]:
         """Поиск nodes по ключевым словам use case"""
-        matching_nodes = []
-        
-        for node_name, node_info in self.nodes.items():
-            use_cases = node_info.get('use_cases', [])
-            use_cases_text = ' '.join(use_cases).lower()
-            
-            if any(keyword.lower() in use_cases_text for keyword in use_case_keywords):
-                matching_nodes.append(node_name)
-        
-        return matching_nodes
+        return self.use_case_index.search(use_case_keywords)
     
     def suggest_workflow_pattern(self, description: str) -> Optional[Dict]:
         """Предложение паттерна workflow на основе описания"""
-        description_lower = description.lower()
+        groups = self.match_keyword_groups(description)
         
         # Простая эвристика для выбора паттерна
-        if any(word in description_lower for word in ['webhook', 'получать', 'принимать']):
-            if any(word in description_lower for word in ['если', 'условие', 'когда']):
+        if 'webhook' in groups:
+            if 'condition' in groups:
                 return self.workflow_patterns.get('conditional_notification')
             else:
                 return self.workflow_patterns.get('webhook_to_action')
         
-        elif any(word in description_lower for word in ['каждый', 'периодически', 'регулярно', 'час']):
+        elif groups & {'schedule', 'schedule_regular'}:
             return self.workflow_patterns.get('scheduled_data_sync')
         
-        elif any(word in description_lower for word in ['api', 'данные']) and any(word in description_lower for word in ['несколько', 'разные']):
+        elif 'api_data' in groups and 'multiple' in groups:
             return self.workflow_patterns.get('api_to_multiple_destinations')
         
         return None
@@ -345,8 +205,9 @@ class N8NKnowledgeBase:
         }
         
         # Добавляем example_config если есть
+        # (глубокая копия: вложенные параметры не должны менять общую базу знаний)
         if 'example_config' in node_info:
-            config['parameters'].update(node_info['example_config'])
+            config['parameters'].update(copy.deepcopy(node_info['example_config']))
         
         # Переопределяем custom параметрами
         if custom_params:
@@ -359,11 +220,41 @@ class N8NKnowledgeBase:
         export_data = {
             "nodes": self.nodes,
             "categories": self.categories,
-            "workflow_patterns": self.workflow_patterns
+            "workflow_patterns": self.workflow_patterns,
+            "keyword_groups": self.keyword_groups
         }
         
         with open(file_path, 'w', encoding='utf-8') as f:
-            yaml.dump(export_data, f, default_flow_style=False, allow_unicode=True)
+            yaml.dump(export_data, f, default_flow_style=False, allow_unicode=True, sort_keys=False)
+
+# Общий экземпляр базы знаний на процесс. Экземпляр считается неизменяемым:
+# перезагрузка создает новый объект и атомарно подменяет ссылку, поэтому
+# потребители, получившие старый экземпляр, продолжают видеть согласованные данные.
+_shared_knowledge_base: Optional[N8NKnowledgeBase] = None
+_shared_lock = threading.Lock()
+
+def get_shared_knowledge_base() -> N8NKnowledgeBase:
+    """Получение общей базы знаний (создается лениво при первом обращении)"""
+    global _shared_knowledge_base
+    
+    knowledge_base = _shared_knowledge_base
+    if knowledge_base is None:
+        with _shared_lock:
+            if _shared_knowledge_base is None:
+                _shared_knowledge_base = N8NKnowledgeBase()
+            knowledge_base = _shared_knowledge_base
+    
+    return knowledge_base
+
+def reload_shared_knowledge_base() -> N8NKnowledgeBase:
+    """Перезагрузка общей базы знаний (новые вызовы get_shared_knowledge_base получат новый экземпляр)"""
+    global _shared_knowledge_base
+    
+    knowledge_base = N8NKnowledgeBase()
+    with _shared_lock:
+        _shared_knowledge_base = knowledge_base
+    
+    return knowledge_base
 
 # Пример использования
 if __name__ == "__main__":
@@ -375,10 +266,8 @@ if __name__ == "__main__":
     print(f"📂 Категории: {list(kb.categories.keys())}")
     print(f"🎯 Паттерны: {len(kb.workflow_patterns)}")
     
-    # Экспортируем в YAML
-    yaml_path = "/Users/hdv_1987/Desktop/Projects/N8N-Agent/config/n8n_nodes.yaml"
-    kb.export_to_yaml(yaml_path)
-    print(f"💾 База знаний экспортирована: {yaml_path}")
+    print(f"⚡ Загружена из: {kb.loaded_from} ({kb.config_path})")
+    print(f"💾 Снапшот: {kb.snapshot_path}")
     
     # Примеры использования
     print("\n🔍 ПРИМЕРЫ ПОИСКА:")
@@ -7,31 +7,48 @@
 import os
 import sys
 import json
-from typing import Dict, List, Optional
+import asyncio
+from collections import defaultdict
+from typing import Dict, List, Optional, AsyncIterator, Union, Callable
 from datetime import datetime
 
 # Добавляем путь для импорта наших модулей
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from n8n_knowledge_base import N8NKnowledgeBase
+from n8n_knowledge_base import get_shared_knowledge_base
 from n8n_claude_service import N8NClaudeService
 from n8n_claude_service_mock import N8NClaudeServiceMock
 from n8n_production_client import N8NProductionClient
+from n8n_async_client import AsyncN8NProductionClient
+from n8n_similarity_cache import N8NSimilarityCache
+from n8n_template_engine import N8NTemplateEngine
+from n8n_workflow_mirror import N8NWorkflowMirror, workflow_content_hash
+
+# Как часто индекс хэшей workflow обновляется из n8n перед созданием (секунды)
+DEDUP_SYNC_MAX_AGE = 300
+
+# Сколько найденных в зеркале дубликатов проверять в n8n (остальные оказались устаревшими)
+DEDUP_MAX_CANDIDATES = 3
 
 class N8NMainService:
     """Главный сервис N8N-Agent для создания workflow"""
     
-    def __init__(self, use_mock_claude: bool = False):
+    def __init__(self, use_mock_claude: bool = False, use_similarity_cache: Optional[bool] = None,
+                 use_templates: bool = True, deduplicate: bool = True):
         """
         Инициализация главного сервиса
         
         Args:
             use_mock_claude: Использовать mock версию Claude (для тестирования без API ключа)
+            use_similarity_cache: Переиспользовать workflow для похожих описаний
+                (по умолчанию - только с реальным Claude)
+            use_templates: Собирать типовые workflow по паттернам без обращения к Claude
+            deduplicate: Не создавать повторно workflow, уже существующий в n8n с тем же содержимым
         """
         self.use_mock_claude = use_mock_claude
         
         # Инициализируем компоненты
-        self.knowledge_base = N8NKnowledgeBase()
+        self.knowledge_base = get_shared_knowledge_base()
         
         # Claude Service (реальный или mock)
         if use_mock_claude:
@@ -41,19 +58,33 @@ class N8NMainService:
             self.claude_service = N8NClaudeService()
             print("🧠 Используется реальный Claude API")
         
+        # Кэш workflow по похожим описаниям (перефразированные запросы не идут в Claude)
+        if use_similarity_cache is None:
+            use_similarity_cache = not use_mock_claude
+        self.similarity_cache = N8NSimilarityCache() if use_similarity_cache else None
+        
+        # Шаблоны для уверенно распознанных типовых описаний (Claude - только для остальных)
+        self.template_engine = N8NTemplateEngine(self.knowledge_base) if use_templates else None
+        
         # N8N Production Client
         self.n8n_api_key = os.getenv('N8N_API_KEY') or "your_n8n_api_key_here"
         self.n8n_client = N8NProductionClient(self.n8n_api_key)
         
+        # Локальное зеркало n8n с индексом по хэшу содержимого: повторный запуск после сбоя
+        # находит уже созданный workflow вместо создания дубликата
+        self.workflow_mirror = N8NWorkflowMirror(self.n8n_client.base_url) if deduplicate else None
+        
         print("✅ N8N Main Service инициализирован")
     
-    def create_workflow_from_description(self, description: str, params: Dict = None) -> Dict:
+    def create_workflow_from_description(self, description: str, params: Dict = None,
+                                         stream: bool = False) -> Dict:
         """
         Создание workflow от описания до готового n8n workflow
         
         Args:
             description: Текстовое описание бизнес-процесса
             params: Дополнительные параметры (сложность, типы nodes и т.д.)
+            stream: Потоковая генерация с выводом nodes по мере их получения
         
         Returns:
             Dict с результатом создания workflow
@@ -70,7 +101,7 @@ class N8NMainService:
             # ЭТАП 1: Анализ описания и генерация workflow
             print("\n1️⃣ Генерация workflow через Claude AI...")
             
-            claude_result = self.claude_service.generate_workflow(description, params)
+            claude_result = self._generate_workflow(description, params, stream=stream)
             
             if claude_result['status'] != 'success':
                 return {
@@ -80,37 +111,70 @@ class N8NMainService:
                 }
             
             workflow_data = claude_result['workflow']
+            template = claude_result.get('template')
+            if template:
+                print(f"📐 Собран по шаблону {template['pattern']} (уверенность {template['confidence']})")
+                if template['missing_slots']:
+                    print(f"⚠️ Заполните вручную: {', '.join(template['missing_slots'])}")
+            similar_to = claude_result.get('similar_to')
+            if similar_to:
+                print(f"♻️ Использован workflow похожего описания (близость {similar_to['similarity']}): "
+                      f"{similar_to['description']}")
             print(f"✅ Workflow сгенерирован: {workflow_data['name']}")
             print(f"🔧 Nodes: {len(workflow_data['nodes'])}")
             print(f"🔗 Connections: {len(workflow_data['connections'])}")
             
+            route = claude_result.get('route')
+            if route:
+                print(f"🧭 Модель: {route['model']} (маршрут {route['name']}, ~{route['estimated_nodes']} nodes, "
+                      f"лимит {route['max_tokens']} токенов)")
+            
+            prompt_metrics = claude_result.get('prompt_metrics')
+            if prompt_metrics:
+                print(f"📏 Промпт: ~{prompt_metrics['request_tokens']} токенов запроса + "
+                      f"~{prompt_metrics['static_tokens']} в кэшируемом префиксе "
+                      f"(бюджет {prompt_metrics['budget']}, nodes: {prompt_metrics['nodes_included']})")
+                if prompt_metrics.get('cache_read_input_tokens'):
+                    print(f"♻️ Из кэша промпта: {prompt_metrics['cache_read_input_tokens']} токенов")
+            
             # ЭТАП 2: Создание workflow в n8n
             print("\n2️⃣ Создание workflow в n8n...")
             
-            n8n_result = self.n8n_client.create_workflow(workflow_data)
+            self._refresh_mirror()
+            duplicate = self._find_duplicate(workflow_content_hash(workflow_data), params)
             
-            if n8n_result['status'] != 'success':
-                return {
-                    "status": "error", 
-                    "stage": "n8n_creation",
-                    "message": f"Ошибка создания в n8n: {n8n_result['message']}",
-                    "generated_workflow": workflow_data
-                }
+            if duplicate:
+                n8n_result = self._duplicate_result(duplicate)
+                print(f"♻️ Workflow с таким содержимым уже есть в n8n - повторно не создается")
+            else:
+                n8n_result = self.n8n_client.create_workflow(workflow_data)
+                
+                if n8n_result['status'] != 'success':
+                    return {
+                        "status": "error", 
+                        "stage": "n8n_creation",
+                        "message": f"Ошибка создания в n8n: {n8n_result['message']}",
+                        "generated_workflow": workflow_data
+                    }
+                
+                self._remember_workflow(n8n_result['workflow'])
+                print(f"✅ Workflow создан в n8n!")
             
             workflow_id = n8n_result['id']
             workflow_url = n8n_result['url']
+            already_active = bool(duplicate and duplicate['active'])
             
-            print(f"✅ Workflow создан в n8n!")
             print(f"🆔 ID: {workflow_id}")
             print(f"🔗 URL: {workflow_url}")
             
             # ЭТАП 3: Попытка активации (опционально)
             activation_result = None
-            if params.get('auto_activate', False):
+            if params.get('auto_activate', False) and not already_active:
                 print("\n3️⃣ Активация workflow...")
                 activation_result = self.n8n_client.activate_workflow(workflow_id)
                 
                 if activation_result['status'] == 'success':
+                    self._remember_workflow(activation_result['workflow'])
                     print("✅ Workflow активирован!")
                 else:
                     print(f"⚠️ Проблема с активацией: {activation_result['message']}")
@@ -126,8 +190,9 @@ class N8NMainService:
                     "url": workflow_url,
                     "nodes_count": len(workflow_data['nodes']),
                     "connections_count": len(workflow_data['connections']),
-                    "active": activation_result['status'] == 'success' if activation_result else False
+                    "active": already_active or bool(activation_result and activation_result['status'] == 'success')
                 },
+                "duplicate": bool(duplicate),
                 "generated_data": workflow_data,
                 "claude_response": claude_result.get('claude_response', ''),
                 "n8n_response": n8n_result,
@@ -137,7 +202,7 @@ class N8NMainService:
             # Сохраняем результат
             self._save_result(final_result)
             
-            print(f"\n🎉 WORKFLOW УСПЕШНО СОЗДАН!")
+            print(f"\n🎉 WORKFLOW {'УЖЕ СУЩЕСТВУЕТ' if duplicate else 'УСПЕШНО СОЗДАН'}!")
             print(f"📋 Детали сохранены в results/")
             
             return final_result
@@ -153,6 +218,299 @@ class N8NMainService:
             print(f"\n❌ ОШИБКА: {str(e)}")
             return error_result
     
+    def _refresh_mirror(self) -> None:
+        """Инкрементальное обновление зеркала из n8n (не чаще раза в DEDUP_SYNC_MAX_AGE секунд)"""
+        if self.workflow_mirror is not None:
+            sync_result = self.workflow_mirror.sync_from_client(self.n8n_client, max_age=DEDUP_SYNC_MAX_AGE)
+            if sync_result['status'] != 'success':
+                print(f"⚠️ Зеркало workflow не обновлено ({sync_result['message']}) - дубликаты проверяются в n8n")
+    
+    def _find_duplicate(self, content_hash: str, params: Dict) -> Optional[Dict]:
+        """
+        Workflow n8n с тем же содержимым или None
+        
+        Кандидат находится по индексу хэшей зеркала и подтверждается GET запросом:
+        зеркало может отставать от n8n (workflow удален, архивирован или изменен).
+        """
+        if self.workflow_mirror is None or params.get('allow_duplicates', False):
+            return None
+        
+        for _ in range(DEDUP_MAX_CANDIDATES):
+            candidate = self.workflow_mirror.find_by_hash(content_hash)
+            if candidate is None:
+                return None
+            
+            found = self._confirm_duplicate(candidate, content_hash, self.n8n_client.get_workflow(candidate['id']))
+            if found is not False:
+                return found
+        
+        return None
+    
+    async def _find_duplicate_async(self, content_hash: str, params: Dict,
+                                    n8n_client: AsyncN8NProductionClient) -> Optional[Dict]:
+        """_find_duplicate с проверкой кандидата через асинхронный клиент пакета"""
+        if self.workflow_mirror is None or params.get('allow_duplicates', False):
+            return None
+        
+        for _ in range(DEDUP_MAX_CANDIDATES):
+            candidate = self.workflow_mirror.find_by_hash(content_hash)
+            if candidate is None:
+                return None
+            
+            found = self._confirm_duplicate(candidate, content_hash, await n8n_client.get_workflow(candidate['id']))
+            if found is not False:
+                return found
+        
+        return None
+    
+    def _confirm_duplicate(self, candidate: Dict, content_hash: str, get_result: Dict) -> Union[Dict, None, bool]:
+        """
+        Проверка кандидата из зеркала по ответу GET /workflows/{id}
+        
+        Returns:
+            Dict подтвержденного дубликата; False - кандидат устарел (зеркало исправлено,
+            можно искать следующий); None - n8n не ответил, workflow создается
+            (пропуск создания без подтверждения небезопасен)
+        """
+        if get_result['status'] != 'success':
+            if get_result.get('status_code') == 404:
+                self.workflow_mirror.remove(candidate['id'])
+                return False
+            return None
+        
+        workflow = get_result['workflow']
+        self.workflow_mirror.upsert(workflow)
+        
+        if workflow.get('isArchived') or workflow_content_hash(workflow) != content_hash:
+            return False
+        
+        return {"id": str(workflow['id']), "name": workflow.get('name'), "active": bool(workflow.get('active'))}
+    
+    def _duplicate_result(self, duplicate: Dict) -> Dict:
+        """Результат создания для уже существующего workflow"""
+        return {
+            "status": "success",
+            "id": duplicate['id'],
+            "name": duplicate['name'],
+            "url": f"{self.n8n_client.base_url}/workflow/{duplicate['id']}",
+            "duplicate": True,
+            "message": "Workflow с таким содержимым уже существует"
+        }
+    
+    def _remember_workflow(self, workflow: Dict) -> None:
+        """Запись созданного или измененного workflow в зеркало (сразу доступен для поиска дубликатов)"""
+        if self.workflow_mirror is not None and workflow.get('id'):
+            self.workflow_mirror.upsert(workflow)
+    
+    def _generate_workflow(self, description: str, params: Dict, stream: bool = False) -> Dict:
+        """Генерация workflow: шаблон, затем поиск похожего описания, затем Claude"""
+        
+        if self.template_engine is not None:
+            template_result = self.template_engine.generate(description, params)
+            if template_result is not None:
+                return template_result
+        
+        # Группы ключевых слов (nodes) должны совпадать: "в Slack" и "в Gmail" не взаимозаменяемы
+        groups = self.knowledge_base.match_keyword_groups(description)
+        
+        if self.similarity_cache is not None:
+            similar = self.similarity_cache.lookup(description, params, self.knowledge_base.version, groups)
+            if similar is not None:
+                return {
+                    "status": "success",
+                    "workflow": similar['workflow'],
+                    "description": description,
+                    "params": params,
+                    "similar_to": {
+                        "description": similar['description'],
+                        "similarity": similar['similarity']
+                    },
+                    "cached": True
+                }
+        
+        if stream:
+            claude_result = self._generate_streaming(description, params)
+        else:
+            claude_result = self.claude_service.generate_workflow(description, params)
+        
+        if self.similarity_cache is not None and claude_result['status'] == 'success' \
+                and not claude_result.get('cached'):
+            self.similarity_cache.add(description, params, self.knowledge_base.version,
+                                      claude_result['workflow'], groups)
+        
+        return claude_result
+    
+    def _generate_streaming(self, description: str, params: Dict,
+                            on_event: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """
+        Потоковая генерация с выводом прогресса
+        
+        Args:
+            description: Текстовое описание бизнес-процесса
+            params: Дополнительные параметры
+            on_event: Обработчик событий потока (например, для обновления UI)
+        
+        Returns:
+            Dict с результатом генерации (как у generate_workflow)
+        """
+        result = None
+        
+        for event in self.claude_service.stream_workflow(description, params):
+            if on_event is not None:
+                on_event(event)
+            
+            if event['event'] == 'node':
+                node = event['node']
+                mark = " ⚠️ заменен" if event['replaced'] else ""
+                print(f"   🔹 Node {event['index'] + 1}: {node['name']} ({node['type']}){mark}")
+            elif event['event'] == 'result':
+                result = event['result']
+        
+        return result
+    
+    async def create_workflows_batch(self, descriptions: List[Union[str, Dict]], params: Dict = None,
+                                     max_concurrency: int = 5) -> AsyncIterator[Dict]:
+        """
+        Пакетное создание workflow с ограничением параллельности
+        
+        Генерация через Claude и создание в n8n для разных описаний выполняются
+        конкурентно, результаты отдаются по мере готовности (не в исходном порядке).
+        
+        Args:
+            descriptions: Список описаний - строки или dict с ключами description/params
+            params: Параметры по умолчанию для всех элементов
+            max_concurrency: Максимум одновременно обрабатываемых описаний
+        
+        Yields:
+            Dict с результатом для каждого элемента (поле index - позиция во входном списке)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency должен быть >= 1")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        # Асинхронный клиент привязан к event loop пакета: запросы к n8n не занимают потоки
+        n8n_client = AsyncN8NProductionClient(self.n8n_api_key, self.n8n_client.base_url)
+        
+        # Одинаковые workflow внутри пакета создаются по очереди: второй найдет первый в зеркале
+        hash_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        await asyncio.to_thread(self._refresh_mirror)
+        
+        async def process(index: int, item: Union[str, Dict]) -> Dict:
+            if isinstance(item, dict):
+                description = item.get('description', '')
+                item_params = {**(params or {}), **item.get('params', {})}
+            else:
+                description = item
+                item_params = dict(params or {})
+            
+            async with semaphore:
+                try:
+                    result = await self._create_batch_item(description, item_params, n8n_client, hash_locks)
+                except Exception as e:
+                    result = {
+                        "status": "error",
+                        "stage": "unexpected_error",
+                        "message": f"Неожиданная ошибка: {str(e)}"
+                    }
+            
+            result['index'] = index
+            result['description'] = description
+            result['timestamp'] = datetime.now().isoformat()
+            return result
+        
+        tasks = [asyncio.ensure_future(process(i, item)) for i, item in enumerate(descriptions)]
+        
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Если потребитель прервал итерацию - не оставляем висящих задач
+            for task in tasks:
+                task.cancel()
+            await n8n_client.aclose()
+    
+    async def _create_batch_item(self, description: str, params: Dict,
+                                 n8n_client: AsyncN8NProductionClient,
+                                 hash_locks: Dict[str, asyncio.Lock]) -> Dict:
+        """Создание одного workflow пакета (генерация Claude - в пуле потоков, n8n - асинхронно)"""
+        
+        claude_result = await asyncio.to_thread(self._generate_workflow, description, params)
+        
+        if claude_result['status'] != 'success':
+            return {
+                "status": "error",
+                "stage": "claude_generation",
+                "message": f"Ошибка генерации Claude: {claude_result['message']}"
+            }
+        
+        workflow_data = claude_result['workflow']
+        content_hash = workflow_content_hash(workflow_data)
+        
+        async with hash_locks[content_hash]:
+            duplicate = await self._find_duplicate_async(content_hash, params, n8n_client)
+            
+            if duplicate:
+                n8n_result = self._duplicate_result(duplicate)
+            else:
+                n8n_result = await n8n_client.create_workflow(workflow_data)
+                
+                if n8n_result['status'] != 'success':
+                    return {
+                        "status": "error",
+                        "stage": "n8n_creation",
+                        "message": f"Ошибка создания в n8n: {n8n_result['message']}",
+                        "generated_workflow": workflow_data
+                    }
+                
+                self._remember_workflow(n8n_result['workflow'])
+        
+        already_active = bool(duplicate and duplicate['active'])
+        
+        activation_result = None
+        if params.get('auto_activate', False) and not already_active:
+            activation_result = await n8n_client.activate_workflow(n8n_result['id'])
+            if activation_result['status'] == 'success':
+                self._remember_workflow(activation_result['workflow'])
+        
+        return {
+            "status": "success",
+            "workflow": {
+                "id": n8n_result['id'],
+                "name": workflow_data['name'],
+                "url": n8n_result['url'],
+                "nodes_count": len(workflow_data['nodes']),
+                "connections_count": len(workflow_data['connections']),
+                "active": already_active or bool(activation_result and activation_result['status'] == 'success')
+            },
+            "duplicate": bool(duplicate),
+            "generated_data": workflow_data,
+            "activation_result": activation_result
+        }
+    
+    def run_workflows_batch(self, descriptions: List[Union[str, Dict]], params: Dict = None,
+                            max_concurrency: int = 5) -> List[Dict]:
+        """Синхронная обертка над create_workflows_batch (результаты в исходном порядке)"""
+        
+        async def collect() -> List[Dict]:
+            results = []
+            async for result in self.create_workflows_batch(descriptions, params, max_concurrency):
+                status_icon = "✅" if result['status'] == 'success' else "❌"
+                print(f"{status_icon} [{len(results) + 1}/{len(descriptions)}] {result['description'][:60]}")
+                results.append(result)
+            return sorted(results, key=lambda r: r['index'])
+        
+        results = asyncio.run(collect())
+        
+        scheduler = getattr(self.claude_service, 'request_scheduler', None)
+        if scheduler is not None:
+            stats = scheduler.stats()
+            print(f"⏱️ Claude API: запросов {stats['requests']}, повторов {stats['retries']}, "
+                  f"429: {stats['rate_limited']}, макс. очередь {stats['max_queue_depth']}, "
+                  f"ожидание лимитов {stats['wait_seconds']}с")
+        
+        return results
+    
     def _save_result(self, result: Dict) -> None:
         """Сохранение результата создания workflow"""
         
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+🧭 N8N Model Router
+Выбор модели и лимита выходных токенов по оценке размера workflow,
+статистика задержки и качества по каждому маршруту
+"""
+
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+# Маршруты от дешевого к дорогому: модель (переопределяется переменной окружения)
+# и границы лимита выходных токенов
+DEFAULT_ROUTES = {
+    "fast": {
+        "model": os.getenv('CLAUDE_MODEL_FAST', 'claude-3-5-haiku-20241022'),
+        "min_tokens": 1000,
+        "max_tokens": 2000
+    },
+    "standard": {
+        "model": os.getenv('CLAUDE_MODEL_STANDARD', 'claude-sonnet-4-20250514'),
+        "min_tokens": 2000,
+        "max_tokens": 4000
+    },
+    "complex": {
+        "model": os.getenv('CLAUDE_MODEL_COMPLEX', 'claude-opus-4-20250514'),
+        "min_tokens": 4000,
+        "max_tokens": 8000
+    }
+}
+
+# Маршрут для одного повтора, если ответ обрезан лимитом max_tokens (быстрый маршрут
+# ограничен 2000 токенов, а метка "Простая" может отправить в него до standard_max_nodes nodes)
+ESCALATION_ROUTES = {"fast": "standard"}
+
+# Примерный размер JSON одного node в ответе (токены) и запас на имя, connections и settings
+TOKENS_PER_NODE = 300
+BASE_OUTPUT_TOKENS = 600
+
+# Переходы между шагами процесса: каждый обычно добавляет node
+STEP_PATTERN = re.compile(r',|;|\bи\b|\bзатем\b|\bпотом\b|\bпосле\b|\bдалее\b|->|→')
+BRANCH_PATTERN = re.compile(r'\bесли\b|\bиначе\b|\bв противном случае\b')
+
+class N8NModelRouter:
+    """Маршрутизация запросов генерации по оценке сложности"""
+    
+    def __init__(self, knowledge_base, routes: Optional[Dict[str, Dict]] = None,
+                 fast_max_nodes: int = 3, standard_max_nodes: int = 7):
+        """
+        Инициализация маршрутизатора
+        
+        Args:
+            knowledge_base: База знаний n8n (группы ключевых слов описания)
+            routes: Маршруты fast/standard/complex (по умолчанию DEFAULT_ROUTES)
+            fast_max_nodes: Максимальная оценка nodes для быстрой модели
+            standard_max_nodes: Максимальная оценка nodes для стандартной модели
+        """
+        self.knowledge_base = knowledge_base
+        self.routes = routes or DEFAULT_ROUTES
+        self.fast_max_nodes = fast_max_nodes
+        self.standard_max_nodes = standard_max_nodes
+        
+        self._lock = threading.Lock()
+        self._stats = {
+            name: {
+                "requests": 0,
+                "success": 0,
+                "errors": 0,
+                "repaired": 0,
+                "truncated": 0,
+                "latency_seconds": 0.0,
+                "max_latency_seconds": 0.0,
+                "output_tokens": 0
+            }
+            for name in self.routes
+        }
+    
+    def estimate_nodes(self, description: str) -> int:
+        """Оценка количества nodes: триггер, сервисы из описания, шаги и ветки условий"""
+        text = description.lower()
+        groups = self.knowledge_base.match_keyword_groups(description)
+        
+        steps = len(STEP_PATTERN.findall(text))
+        branches = len(BRANCH_PATTERN.findall(text))
+        
+        return max(2, 1 + len(groups), 1 + steps) + 2 * branches
+    
+    def route(self, description: str, params: Optional[Dict] = None) -> Dict:
+        """
+        Выбор маршрута для запроса
+        
+        Явная сложность из params ("Простая"/"Средняя"/"Сложная") сдвигает
+        выбор, но простое описание не отправляется в дорогую модель только из-за метки,
+        а сложное - не урезается до быстрой.
+        
+        Returns:
+            Dict с name, model, max_tokens и estimated_nodes
+        """
+        complexity = (params or {}).get('complexity')
+        estimated_nodes = self.estimate_nodes(description)
+        
+        if complexity == 'Сложная':
+            name = 'complex' if estimated_nodes > self.fast_max_nodes else 'standard'
+        elif complexity == 'Простая' and estimated_nodes <= self.standard_max_nodes:
+            name = 'fast'
+        elif estimated_nodes <= self.fast_max_nodes:
+            name = 'fast'
+        elif estimated_nodes <= self.standard_max_nodes:
+            name = 'standard'
+        else:
+            name = 'complex'
+        
+        route = self.routes[name]
+        max_tokens = BASE_OUTPUT_TOKENS + TOKENS_PER_NODE * estimated_nodes
+        
+        return {
+            "name": name,
+            "model": route['model'],
+            "max_tokens": min(max(max_tokens, route['min_tokens']), route['max_tokens']),
+            "estimated_nodes": estimated_nodes
+        }
+    
+    def escalate(self, route: Dict, response) -> Optional[Dict]:
+        """
+        Маршрут для повтора обрезанного ответа (stop_reason == 'max_tokens')
+        
+        Повтор один: со стандартного маршрута дальше не переходим - лимит
+        complex дороже, чем ответ с исправлениями.
+        
+        Returns:
+            Dict маршрута (с escalated_from) или None, если повтор не нужен
+        """
+        name = ESCALATION_ROUTES.get(route['name'])
+        if name is None or getattr(response, 'stop_reason', None) != 'max_tokens':
+            return None
+        
+        return {
+            "name": name,
+            "model": self.routes[name]['model'],
+            "max_tokens": self.routes[name]['max_tokens'],
+            "estimated_nodes": route['estimated_nodes'],
+            "escalated_from": route['name']
+        }
+    
+    def record(self, route: Dict, latency: float, result: Dict, response=None) -> None:
+        """Учет задержки и качества результата маршрута"""
+        usage = getattr(response, 'usage', None)
+        
+        with self._lock:
+            stats = self._stats[route['name']]
+            stats['requests'] += 1
+            stats['latency_seconds'] += latency
+            stats['max_latency_seconds'] = max(stats['max_latency_seconds'], latency)
+            stats['output_tokens'] += getattr(usage, 'output_tokens', 0) or 0
+            
+            if result.get('status') == 'success':
+                stats['success'] += 1
+            else:
+                stats['errors'] += 1
+            if result.get('repairs'):
+                stats['repaired'] += 1
+            if getattr(response, 'stop_reason', None) == 'max_tokens':
+                stats['truncated'] += 1
+    
+    def stats(self) -> Dict:
+        """Статистика по маршрутам: средняя задержка, доля успехов, исправлений и обрезанных ответов"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        
+        for name, stats in snapshot.items():
+            requests = stats['requests']
+            stats['model'] = self.routes[name]['model']
+            stats['avg_latency_seconds'] = round(stats.pop('latency_seconds') / requests, 3) if requests else 0.0
+            stats['max_latency_seconds'] = round(stats['max_latency_seconds'], 3)
+            stats['success_rate'] = round(stats['success'] / requests, 3) if requests else 0.0
+            stats['repair_rate'] = round(stats['repaired'] / requests, 3) if requests else 0.0
+            stats['avg_output_tokens'] = round(stats['output_tokens'] / requests) if requests else 0
+        
+        return snapshot
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+🗂️ N8N Node Catalog
+Локальный индексированный каталог всех node types n8n (SQLite)
+с инкрементальным обновлением по хэшу содержимого
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, List, Optional, Any
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_response_cache import DEFAULT_CACHE_DIR
+
+class N8NNodeCatalog:
+    """Каталог node types n8n с параметрами, версиями и credentials"""
+    
+    def __init__(self, db_path: str = None):
+        """
+        Инициализация каталога
+        
+        Args:
+            db_path: Путь к файлу SQLite (по умолчанию .cache/node_catalog.sqlite)
+        """
+        self.db_path = db_path or os.path.join(DEFAULT_CACHE_DIR, 'node_catalog.sqlite')
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS node_types (
+                name TEXT NOT NULL,
+                version TEXT NOT NULL,
+                display_name TEXT,
+                description TEXT,
+                groups TEXT,
+                content_hash TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (name, version)
+            );
+            CREATE INDEX IF NOT EXISTS idx_node_types_display_name ON node_types(display_name);
+            
+            CREATE TABLE IF NOT EXISTS node_credentials (
+                name TEXT NOT NULL,
+                version TEXT NOT NULL,
+                credential TEXT NOT NULL,
+                required INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_node_credentials_node ON node_credentials(name, version);
+            CREATE INDEX IF NOT EXISTS idx_node_credentials_credential ON node_credentials(credential);
+            
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+    
+    @classmethod
+    def open_existing(cls, db_path: str = None) -> Optional['N8NNodeCatalog']:
+        """Открытие ранее синхронизированного каталога (None если его еще нет)"""
+        path = db_path or os.path.join(DEFAULT_CACHE_DIR, 'node_catalog.sqlite')
+        if not os.path.exists(path):
+            return None
+        
+        catalog = cls(path)
+        return catalog if catalog.count() > 0 else None
+    
+    @staticmethod
+    def extract_node_types(payload: Any) -> List[Dict]:
+        """Извлечение списка node types из ответа /rest/node-types или дампа"""
+        if isinstance(payload, dict):
+            payload = payload.get('data', payload.get('node_types', []))
+            # Ответ N8NAPIClient.get_node_types вкладывает исходный ответ еще раз
+            if isinstance(payload, dict):
+                payload = payload.get('data', [])
+        
+        if not isinstance(payload, list):
+            return []
+        
+        return [node for node in payload if isinstance(node, dict) and node.get('name')]
+    
+    @staticmethod
+    def _version_key(node_type: Dict) -> str:
+        """Ключ версии node (у versioned nodes version - список)"""
+        version = node_type.get('version', 1)
+        if isinstance(version, list):
+            return ",".join(str(v) for v in version)
+        return str(version)
+    
+    @staticmethod
+    def _version_number(version_key: str) -> float:
+        """Наибольшая версия из ключа версии (ключ - TEXT, "10" < "2" при сравнении строк)"""
+        numbers = []
+        for part in version_key.split(','):
+            try:
+                numbers.append(float(part))
+            except ValueError:
+                continue
+        return max(numbers, default=0.0)
+    
+    @staticmethod
+    def _content_hash(node_type: Dict) -> str:
+        """Стабильный хэш содержимого node type"""
+        content = json.dumps(node_type, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    def sync(self, node_types: List[Dict], source: str = "unknown", prune: bool = True) -> Dict:
+        """
+        Инкрементальная синхронизация каталога
+        
+        Записываются только node types с изменившимся хэшем содержимого.
+        
+        Args:
+            node_types: Полный список node types
+            source: Откуда получен каталог (для метаданных)
+            prune: Удалять node types, отсутствующие в новом списке
+        
+        Returns:
+            Dict со статистикой синхронизации
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        
+        with self._lock:
+            existing = {
+                (name, version): content_hash
+                for name, version, content_hash in self._conn.execute(
+                    "SELECT name, version, content_hash FROM node_types"
+                )
+            }
+            
+            seen = set()
+            
+            for node_type in node_types:
+                key = (node_type['name'], self._version_key(node_type))
+                if key in seen:
+                    continue
+                seen.add(key)
+                
+                content_hash = self._content_hash(node_type)
+                previous_hash = existing.get(key)
+                
+                if previous_hash == content_hash:
+                    stats["unchanged"] += 1
+                    continue
+                
+                self._upsert(key, node_type, content_hash)
+                stats["added" if previous_hash is None else "updated"] += 1
+            
+            if prune:
+                for key in existing.keys() - seen:
+                    self._conn.execute("DELETE FROM node_types WHERE name = ? AND version = ?", key)
+                    self._conn.execute("DELETE FROM node_credentials WHERE name = ? AND version = ?", key)
+                    stats["removed"] += 1
+            
+            self._set_meta('last_sync', datetime.now().isoformat())
+            self._set_meta('source', source)
+            self._conn.commit()
+        
+        return {
+            "status": "success",
+            "total": len(seen),
+            **stats
+        }
+    
+    def _upsert(self, key: tuple, node_type: Dict, content_hash: str) -> None:
+        """Запись node type и его credentials"""
+        group = node_type.get('group', [])
+        
+        self._conn.execute(
+            "INSERT OR REPLACE INTO node_types (name, version, display_name, description, groups, content_hash, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                key[0], key[1],
+                node_type.get('displayName', ''),
+                node_type.get('description', ''),
+                ",".join(group) if isinstance(group, list) else str(group),
+                content_hash,
+                json.dumps(node_type, ensure_ascii=False)
+            )
+        )
+        
+        self._conn.execute("DELETE FROM node_credentials WHERE name = ? AND version = ?", key)
+        for credential in node_type.get('credentials') or []:
+            if isinstance(credential, dict) and credential.get('name'):
+                self._conn.execute(
+                    "INSERT INTO node_credentials (name, version, credential, required) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], credential['name'], int(bool(credential.get('required'))))
+                )
+    
+    def sync_from_file(self, file_path: str, prune: bool = True) -> Dict:
+        """Синхронизация из сохраненного дампа /rest/node-types (JSON)"""
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка чтения дампа: {str(e)}"
+            }
+        
+        node_types = self.extract_node_types(payload)
+        if not node_types:
+            return {
+                "status": "error",
+                "message": "В дампе не найдено node types"
+            }
+        
+        sync_result = self.sync(node_types, source=f"file:{file_path}", prune=prune)
+        
+        # ETag описывал каталог сервера - после дампа sync_from_client должен скачать каталог заново
+        with self._lock:
+            self._set_meta('etag', None)
+            self._conn.commit()
+        
+        return sync_result
+    
+    def sync_from_client(self, client, prune: bool = True) -> Dict:
+        """
+        Синхронизация с работающим n8n через N8NAPIClient
+        
+        Повторная синхронизация передает сохраненный ETag, и если каталог
+        на сервере не менялся, он не скачивается заново.
+        """
+        result = client.get_node_types(etag=self.get_meta('etag'))
+        
+        if result['status'] == 'not_modified':
+            return {
+                "status": "success",
+                "message": "Каталог не изменился",
+                "total": self.count(),
+                "added": 0, "updated": 0, "unchanged": self.count(), "removed": 0
+            }
+        
+        if result['status'] != 'success':
+            return result
+        
+        node_types = self.extract_node_types(result['node_types'])
+        if not node_types:
+            return {
+                "status": "error",
+                "message": "n8n вернул пустой каталог node types"
+            }
+        
+        sync_result = self.sync(node_types, source=f"n8n:{client.base_url}", prune=prune)
+        
+        with self._lock:
+            self._set_meta('etag', result.get('etag'))
+            self._conn.commit()
+        
+        return sync_result
+    
+    def has_node_type(self, name: str) -> bool:
+        """Проверка наличия node type в каталоге"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM node_types WHERE name = ? LIMIT 1", (name,)).fetchone()
+        return row is not None
+    
+    def get_node_type(self, name: str, version: str = None) -> Optional[Dict]:
+        """Получение полного описания node type (по умолчанию - наибольшая версия)"""
+        with self._lock:
+            if version is not None:
+                row = self._conn.execute(
+                    "SELECT data FROM node_types WHERE name = ? AND version = ?", (name, str(version))
+                ).fetchone()
+            else:
+                rows = self._conn.execute(
+                    "SELECT version, data FROM node_types WHERE name = ?", (name,)
+                ).fetchall()
+                row = max(rows, key=lambda r: self._version_number(r[0]))[1:] if rows else None
+        return json.loads(row[0]) if row else None
+    
+    def get_credentials(self, name: str) -> List[Dict]:
+        """Credentials, которые использует node type"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT credential, required FROM node_credentials WHERE name = ?", (name,)
+            ).fetchall()
+        return [{"name": credential, "required": bool(required)} for credential, required in rows]
+    
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Поиск node types по имени, отображаемому имени и описанию"""
+        pattern = f"%{query.lower()}%"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT name, display_name, description FROM node_types "
+                "WHERE lower(name) LIKE ? OR lower(display_name) LIKE ? OR lower(description) LIKE ? "
+                "ORDER BY name LIMIT ?",
+                (pattern, pattern, pattern, limit)
+            ).fetchall()
+        return [
+            {"name": name, "display_name": display_name, "description": description}
+            for name, display_name, description in rows
+        ]
+    
+    def iter_documents(self):
+        """Краткие описания всех node types для индексации (имя, описание, имена параметров наибольшей версии)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, version, display_name, description, data FROM node_types ORDER BY name"
+            ).fetchall()
+        
+        versions: Dict[str, List[tuple]] = {}
+        for row in rows:
+            versions.setdefault(row[0], []).append(row)
+        
+        for name, name_rows in versions.items():
+            _, _, display_name, description, data = max(name_rows, key=lambda r: self._version_number(r[1]))
+            
+            properties = json.loads(data).get('properties') or []
+            yield {
+                "name": name,
+                "display_name": display_name,
+                "description": description,
+                "parameters": [p.get('displayName') or p.get('name', '') for p in properties if isinstance(p, dict)]
+            }
+    
+    def count(self) -> int:
+        """Количество уникальных node types"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT name) FROM node_types").fetchone()[0]
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        """Чтение метаданных каталога"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        """Запись метаданных (вызывается под блокировкой)"""
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def stats(self) -> Dict:
+        """Статистика каталога"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM node_types").fetchone()[0]
+            credentials = self._conn.execute("SELECT COUNT(DISTINCT credential) FROM node_credentials").fetchone()[0]
+        
+        return {
+            "node_types": self.count(),
+            "entries": entries,
+            "credentials": credentials,
+            "last_sync": self.get_meta('last_sync'),
+            "source": self.get_meta('source'),
+            "path": self.db_path
+        }
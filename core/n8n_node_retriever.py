@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+🎯 N8N Node Retriever
+Отбор наиболее релевантных node types для описания (BM25 по основам слов)
+"""
+
+import os
+import re
+import sys
+import numpy as np
+from typing import Dict, List, Tuple, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_keyword_matcher import tokenize
+
+def split_identifier(identifier: str) -> str:
+    """n8n-nodes-base.googleSheets -> 'google sheets' (для индексации имен nodes)"""
+    name = identifier.split('.')[-1]
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', name)
+
+class N8NNodeRetriever:
+    """BM25 индекс над описаниями node types (разреженная матрица в CSC-формате на NumPy)"""
+    
+    def __init__(self, documents: Dict[str, Dict], k1: float = 1.5, b: float = 0.75):
+        """
+        Построение индекса
+        
+        Args:
+            documents: {node_type: {"display_name", "description", "text"}} - text индексируется
+            k1: Насыщение частоты термина BM25
+            b: Нормализация по длине документа BM25
+        """
+        self.node_types = list(documents.keys())
+        self.summaries = {
+            name: {"display_name": doc.get('display_name', name), "description": doc.get('description', '')}
+            for name, doc in documents.items()
+        }
+        
+        # Частоты терминов по документам
+        doc_term_counts = []
+        for name in self.node_types:
+            counts = {}
+            for token in tokenize(documents[name].get('text', '')):
+                counts[token] = counts.get(token, 0) + 1
+            doc_term_counts.append(counts)
+        
+        n_docs = len(self.node_types)
+        doc_lengths = np.array([sum(counts.values()) for counts in doc_term_counts], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if n_docs and doc_lengths.mean() > 0 else 1.0
+        
+        # Постинги по терминам: term -> [(doc_index, tf)]
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_index, counts in enumerate(doc_term_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_index, tf))
+        
+        self.vocabulary = {term: column for column, term in enumerate(postings)}
+        
+        # CSC: для термина column веса лежат в data[indptr[column]:indptr[column + 1]]
+        indptr = [0]
+        indices = []
+        data = []
+        
+        for term, term_postings in postings.items():
+            df = len(term_postings)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            
+            for doc_index, tf in term_postings:
+                norm = k1 * (1.0 - b + b * doc_lengths[doc_index] / avg_length)
+                indices.append(doc_index)
+                data.append(idf * tf * (k1 + 1.0) / (tf + norm))
+            
+            indptr.append(len(indices))
+        
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int32)
+        self.data = np.array(data, dtype=np.float32)
+        self.n_docs = n_docs
+    
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base, node_catalog=None) -> 'N8NNodeRetriever':
+        """Индекс по nodes базы знаний (и синхронизированному каталогу n8n, если передан)"""
+        documents = {}
+        
+        if node_catalog is not None:
+            for entry in node_catalog.iter_documents():
+                documents[entry['name']] = {
+                    "display_name": entry['display_name'],
+                    "description": entry['description'],
+                    "text": " ".join([
+                        split_identifier(entry['name']),
+                        entry['display_name'] or '',
+                        entry['description'] or '',
+                        " ".join(entry['parameters'])
+                    ])
+                }
+        
+        # Описания из базы знаний подробнее и приоритетнее каталога
+        for name, info in knowledge_base.nodes.items():
+            parameters = info.get('parameters', {})
+            documents[name] = {
+                "display_name": info['display_name'],
+                "description": info['description'],
+                "text": " ".join([
+                    split_identifier(name),
+                    info['display_name'],
+                    info['description'],
+                    " ".join(info.get('use_cases', [])),
+                    " ".join(parameters.keys()),
+                    " ".join(str(p.get('description', '')) for p in parameters.values() if isinstance(p, dict))
+                ])
+            }
+        
+        return cls(documents)
+    
+    def score(self, query: str) -> np.ndarray:
+        """BM25 оценки всех документов для запроса"""
+        columns = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not columns or not self.n_docs:
+            return np.zeros(self.n_docs, dtype=np.float32)
+        
+        slices = [slice(self.indptr[column], self.indptr[column + 1]) for column in columns]
+        indices = np.concatenate([self.indices[s] for s in slices])
+        weights = np.concatenate([self.data[s] for s in slices])
+        
+        return np.bincount(indices, weights=weights, minlength=self.n_docs)
+    
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[str, float]]:
+        """Top-k релевантных node types (только с ненулевой оценкой), по убыванию оценки"""
+        scores = self.score(query)
+        if not self.n_docs or top_k <= 0:
+            return []
+        
+        k = min(top_k, self.n_docs)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+        
+        return [(self.node_types[i], float(scores[i])) for i in ranked if scores[i] > 0]
+    
+    def get_summary(self, node_type: str) -> Optional[Dict]:
+        """Отображаемое имя и описание node type из индекса"""
+        return self.summaries.get(node_type)
@@ -4,23 +4,48 @@
 Рабочий клиент для создания workflow в n8n через реальный API
 """
 
-import requests
+import os
+import sys
 import json
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_http_transport import N8NHTTPTransport, get_shared_transport
+from n8n_bulk_transfer import (
+    N8NTransferCheckpoint, N8NWorkflowSink, importable_workflow, iter_workflow_source, transfer_summary
+)
+from n8n_workflow_diff import describe_diff, diff_workflows, workflow_update_body
+
+# Запрос шага обновления или активации: (метод, путь API, JSON тело или None)
+WorkflowRequest = Tuple[str, str, Optional[Dict]]
 
 class N8NProductionClient:
     """Production-ready клиент для n8n API"""
     
-    def __init__(self, api_key: str, base_url: str = "http://localhost:5678"):
+    def __init__(self, api_key: str, base_url: str = "http://localhost:5678",
+                 transport: Optional[N8NHTTPTransport] = None):
+        """
+        Инициализация клиента
+        
+        Args:
+            api_key: API ключ n8n
+            base_url: Адрес n8n
+            transport: Пул соединений, таймауты и повторы (по умолчанию - общий для процесса)
+        """
         self.base_url = base_url.rstrip('/')
         self.api_key = api_key
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.transport = transport or get_shared_transport()
+        self.session = self.transport.create_session({
             'X-N8N-API-KEY': self.api_key,
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
+        
+        # Есть ли на сервере POST /workflows/{id}/activate (None - еще не известно)
+        self.supports_activation_endpoints: Optional[bool] = None
     
     def create_workflow(self, workflow_data: Dict) -> Dict:
         """Создание workflow в n8n"""
@@ -54,70 +79,543 @@ class N8NProductionClient:
                 "message": f"Ошибка создания workflow: {str(e)}"
             }
     
-    def get_workflows(self) -> Dict:
-        """Получение списка workflow"""
+    def get_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Получение списка workflow (все страницы)"""
+        try:
+            workflows = list(self.iter_workflows(filters=filters))
+            return {
+                "status": "success",
+                "count": len(workflows),
+                "workflows": workflows
+            }
+        
+        except N8NAPIError as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка {e.status_code}: {e.response}"
+            }
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка: {str(e)}"
+            }
+    
+    def get_workflow(self, workflow_id: str) -> Dict:
+        """Получение workflow по ID"""
         try:
-            response = self.session.get(f"{self.base_url}/api/v1/workflows")
+            response = self.session.get(f"{self.base_url}/api/v1/workflows/{workflow_id}")
             
             if response.status_code == 200:
-                data = response.json()
-                workflows = data.get('data', [])
                 return {
                     "status": "success",
-                    "count": len(workflows),
-                    "workflows": workflows
+                    "workflow": response.json()
                 }
             else:
                 return {
                     "status": "error",
-                    "message": f"Ошибка {response.status_code}: {response.text}"
+                    "status_code": response.status_code,
+                    "message": f"Workflow не найден: {response.status_code}",
+                    "response": response.text
                 }
-                
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка получения workflow: {str(e)}"
+            }
+    
+    def update_workflow(self, workflow_id: str, workflow_data: Dict, current: Optional[Dict] = None) -> Dict:
+        """
+        Обновление workflow только при структурных изменениях
+        
+        Сравнивает сохраненный и желаемый workflow (nodes по id или имени,
+        connections по ребрам). Без изменений запрос не отправляется; изменение
+        только active идет через activate/deactivate endpoint без PUT - n8n не
+        перерегистрирует триггеры. Поля, отсутствующие в workflow_data, сохраняются.
+        
+        Args:
+            workflow_id: ID workflow в n8n
+            workflow_data: Желаемый workflow (name, nodes, connections, settings, active)
+            current: Сохраненный workflow, если уже известен (иначе - GET из n8n)
+        
+        Returns:
+            Dict с changed, diff и итоговым workflow
+        """
+        try:
+            return self._run_steps(update_workflow_steps(self, workflow_id, workflow_data, current))
+        
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка обновления workflow: {str(e)}"
+            }
+    
+    def update_workflows(self, updates: Dict[str, Dict], current: Optional[Dict[str, Dict]] = None,
+                         max_concurrency: int = 8) -> Dict:
+        """
+        Обновление списка workflow (повторная синхронизация сгенерированных workflow)
+        
+        Args:
+            updates: ID workflow -> желаемый workflow
+            current: ID workflow -> сохраненный workflow (например, из зеркала) - без GET для каждого
+            max_concurrency: Максимум одновременных запросов
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency должен быть >= 1")
+        
+        current = current or {}
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = dict(zip(updates, executor.map(
+                lambda workflow_id: self.update_workflow(workflow_id, updates[workflow_id], current.get(workflow_id)),
+                updates
+            )))
+        
+        return bulk_update_summary(results)
+    
+    def iter_workflows(self, limit: int = 100, filters: Optional[Dict] = None,
+                       fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+        """
+        Постраничный обход workflow по nextCursor
+        
+        Args:
+            limit: Размер страницы (в памяти одновременно только одна страница)
+            filters: Фильтры n8n API: active, tags, name, projectId
+            fields: Оставить только эти поля (например, WORKFLOW_SUMMARY_FIELDS). Отбор
+                выполняется на клиенте после загрузки страницы: n8n API не умеет отдавать
+                часть полей, и nodes/connections все равно передаются по сети. На сервере
+                отбрасывается только pinData (excludePinnedData); выигрыш - память, не трафик
+        
+        Yields:
+            Dict workflow
+        
+        Raises:
+            N8NAPIError: если n8n ответил ошибкой
+        """
+        return iter_workflow_pages(self.session, f"{self.base_url}/api/v1/workflows", limit, filters, fields)
+    
+    def count_workflows(self, filters: Optional[Dict] = None) -> Dict:
+        """Количество workflow (всего, активных, архивных, по тегам) без хранения полного списка в памяти"""
+        try:
+            return summarize_workflows(self.iter_workflows(limit=250, filters=filters, fields=WORKFLOW_SUMMARY_FIELDS))
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Ошибка: {str(e)}"
             }
     
+    def bulk_create(self, source: str, checkpoint_path: Optional[str] = None, max_concurrency: int = 8,
+                    on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """
+        Пакетное создание workflow из JSONL файла или каталога с *.json
+        
+        Источник читается потоком: в памяти не больше 2 * max_concurrency workflow.
+        Созданные элементы записываются в контрольную точку - повторный запуск
+        после сбоя продолжает с необработанных, не создавая дубликаты.
+        
+        Args:
+            source: JSONL файл (workflow на строку) или каталог (например, результат bulk_export)
+            checkpoint_path: Файл контрольной точки (по умолчанию <source>.import.checkpoint)
+            max_concurrency: Максимум одновременных запросов создания
+            on_result: Вызывается для каждого элемента (ключ, результат create_workflow)
+        
+        Returns:
+            Dict с количеством созданных, пропущенных, ошибками и workflows_per_second
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency должен быть >= 1")
+        
+        checkpoint = N8NTransferCheckpoint(checkpoint_path or f"{source.rstrip(os.sep)}.import.checkpoint")
+        started = time.monotonic()
+        counters = {"processed": 0, "skipped": 0}
+        failed = []
+        
+        def create(key: str, workflow: Dict):
+            try:
+                result = self.create_workflow(importable_workflow(workflow))
+            except Exception as e:
+                result = {"status": "error", "message": f"Ошибка создания: {str(e)}"}
+            if result['status'] == 'success':
+                checkpoint.mark(key, id=result['id'])
+            return key, result
+        
+        def collect(futures) -> None:
+            for future in futures:
+                key, result = future.result()
+                if result['status'] == 'success':
+                    counters['processed'] += 1
+                else:
+                    failed.append({"key": key, "stage": "create", "message": result['message']})
+                if on_result is not None:
+                    on_result(key, result)
+        
+        items = iter_workflow_source(source)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                pending = set()
+                
+                while True:
+                    # Ошибка источника останавливает чтение, уже отправленные workflow досоздаются
+                    try:
+                        item = next(items, None)
+                    except (OSError, ValueError) as e:
+                        failed.append({"key": None, "stage": "read", "message": f"Ошибка чтения источника: {str(e)}"})
+                        break
+                    if item is None:
+                        break
+                    
+                    key, workflow = item
+                    if key in checkpoint.done:
+                        counters['skipped'] += 1
+                        continue
+                    
+                    pending.add(executor.submit(create, key, workflow))
+                    if len(pending) >= 2 * max_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                
+                collect(as_completed(pending))
+        
+        finally:
+            checkpoint.close()
+        
+        return transfer_summary("Создано", counters['processed'], counters['skipped'], failed, started)
+    
+    def bulk_export(self, destination: str, filters: Optional[Dict] = None,
+                    checkpoint_path: Optional[str] = None,
+                    on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """
+        Пакетная выгрузка workflow в JSONL файл (*.jsonl) или каталог (файл на workflow)
+        
+        Список n8n уже содержит workflow целиком, поэтому выгрузка идет страницами
+        iter_workflows (один запрос на 250 workflow) и пишется по мере получения.
+        JSONL обрезается до размера на последней контрольной точке: строка, записанная
+        перед сбоем, но не отмеченная, не дублируется (без контрольной точки файл перезаписывается).
+        
+        Args:
+            destination: Файл .jsonl или каталог
+            filters: Фильтры iter_workflows (active, tags, name, projectId)
+            checkpoint_path: Файл контрольной точки (по умолчанию <destination>.export.checkpoint)
+            on_result: Вызывается для каждого выгруженного workflow (id, workflow)
+        
+        Returns:
+            Dict с количеством выгруженных, пропущенных, ошибками и workflows_per_second
+        """
+        checkpoint = N8NTransferCheckpoint(checkpoint_path or f"{destination.rstrip(os.sep)}.export.checkpoint")
+        sink = N8NWorkflowSink(destination, resume_offset=checkpoint.offset)
+        started = time.monotonic()
+        processed, skipped = 0, 0
+        failed = []
+        key, stage = None, "list"
+        
+        try:
+            for workflow in self.iter_workflows(limit=250, filters=filters):
+                key = str(workflow.get('id'))
+                if key in checkpoint.done:
+                    skipped += 1
+                    continue
+                
+                stage = "write"
+                offset = sink.write(workflow)
+                checkpoint.mark(key, offset=offset)
+                processed += 1
+                if on_result is not None:
+                    on_result(key, workflow)
+                key, stage = None, "list"
+        
+        except Exception as e:
+            failed.append({"key": key, "stage": stage, "message": f"Ошибка выгрузки: {str(e)}"})
+        
+        finally:
+            sink.close()
+            checkpoint.close()
+        
+        return transfer_summary("Выгружено", processed, skipped, failed, started)
+    
     def activate_workflow(self, workflow_id: str) -> Dict:
         """Активация workflow"""
+        return self._set_active(workflow_id, True)
+    
+    def deactivate_workflow(self, workflow_id: str) -> Dict:
+        """Деактивация workflow"""
+        return self._set_active(workflow_id, False)
+    
+    def activate_workflows(self, workflow_ids: List[str], max_concurrency: int = 8) -> Dict:
+        """Активация списка workflow (не больше max_concurrency запросов одновременно)"""
+        return self._bulk_set_active(workflow_ids, True, max_concurrency)
+    
+    def deactivate_workflows(self, workflow_ids: List[str], max_concurrency: int = 8) -> Dict:
+        """Деактивация списка workflow (не больше max_concurrency запросов одновременно)"""
+        return self._bulk_set_active(workflow_ids, False, max_concurrency)
+    
+    def _set_active(self, workflow_id: str, active: bool) -> Dict:
+        """Смена статуса workflow (шаги и обработка старых серверов - в set_active_steps)"""
         try:
-            # Получаем текущий workflow
-            get_response = self.session.get(f"{self.base_url}/api/v1/workflows/{workflow_id}")
-            
-            if get_response.status_code != 200:
-                return {
-                    "status": "error",
-                    "message": f"Workflow не найден: {get_response.status_code}"
-                }
-            
-            workflow = get_response.json()
-            workflow['active'] = True
-            
-            # Обновляем workflow
-            update_response = self.session.put(
-                f"{self.base_url}/api/v1/workflows/{workflow_id}",
-                json=workflow
-            )
-            
-            if update_response.status_code == 200:
-                return {
-                    "status": "success",
-                    "message": "Workflow активирован!",
-                    "workflow": update_response.json()
-                }
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Ошибка активации: {update_response.status_code}",
-                    "response": update_response.text
-                }
-                
+            return self._run_steps(set_active_steps(self, workflow_id, active))
+        
         except Exception as e:
             return {
                 "status": "error",
-                "message": f"Ошибка активации: {str(e)}"
+                "message": f"Ошибка {'активации' if active else 'деактивации'}: {str(e)}"
+            }
+    
+    def _run_steps(self, steps: Generator[WorkflowRequest, object, Dict]) -> Dict:
+        """Выполнение запросов шагов (update_workflow_steps, set_active_steps) через сессию клиента"""
+        try:
+            method, path, body = next(steps)
+            while True:
+                kwargs = {'json': body} if body is not None else {}
+                response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+                method, path, body = steps.send(response)
+        except StopIteration as done:
+            return done.value
+    
+    def _bulk_set_active(self, workflow_ids: List[str], active: bool, max_concurrency: int) -> Dict:
+        """Параллельная смена статуса списка workflow"""
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency должен быть >= 1")
+        
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = dict(zip(workflow_ids, executor.map(lambda wf_id: self._set_active(wf_id, active), workflow_ids)))
+        
+        return bulk_activation_summary(results, active)
+
+class N8NAPIError(Exception):
+    """Ошибка ответа n8n API (для генераторов, которые не могут вернуть dict со статусом)"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, response: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+# Поля списка workflow без nodes, connections и pinData
+WORKFLOW_SUMMARY_FIELDS = ('id', 'name', 'active', 'isArchived', 'createdAt', 'updatedAt', 'tags')
+
+def workflow_query_params(limit: int, filters: Optional[Dict] = None, exclude_pinned_data: bool = False) -> Dict:
+    """Параметры запроса списка workflow (bool и списки - в формате n8n API)"""
+    params = {'limit': limit}
+    
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        elif isinstance(value, (list, tuple, set)):
+            value = ','.join(value)
+        params[key] = value
+    
+    if exclude_pinned_data:
+        params['excludePinnedData'] = 'true'
+    
+    return params
+
+def iter_workflow_pages(session, url: str, limit: int = 100, filters: Optional[Dict] = None,
+                        fields: Optional[Sequence[str]] = None) -> Iterator[Dict]:
+    """Обход страниц GET /workflows по nextCursor (общий для синхронных клиентов)"""
+    params = workflow_query_params(limit, filters, exclude_pinned_data=fields is not None)
+    
+    while True:
+        response = session.get(url, params=params)
+        if response.status_code != 200:
+            raise N8NAPIError(
+                f"Ошибка получения workflow: {response.status_code}", response.status_code, response.text
+            )
+        
+        page = response.json()
+        for workflow in page.get('data', []):
+            yield {key: workflow[key] for key in fields if key in workflow} if fields is not None else workflow
+        
+        cursor = page.get('nextCursor')
+        if not cursor:
+            return
+        params['cursor'] = cursor
+
+def update_workflow_steps(client, workflow_id: str, workflow_data: Dict,
+                          current: Optional[Dict] = None) -> Generator[WorkflowRequest, object, Dict]:
+    """
+    Шаги update_workflow без ввода-вывода (общие для синхронного и асинхронного клиентов)
+    
+    Генератор отдает запросы (метод, путь, тело), клиент выполняет их и отправляет
+    ответ обратно через send(). Без изменений запросов нет; изменение только active
+    идет через set_active_steps без PUT; активный workflow деактивируется до PUT.
+    
+    Args:
+        client: Клиент n8n (нужен только supports_activation_endpoints)
+        workflow_id: ID workflow в n8n
+        workflow_data: Желаемый workflow
+        current: Сохраненный workflow, если уже известен (иначе - GET)
+    
+    Returns:
+        Результат update_workflow (changed, diff, workflow)
+    """
+    path = f"/api/v1/workflows/{workflow_id}"
+    
+    if current is None:
+        response = yield ('GET', path, None)
+        if response.status_code != 200:
+            return {
+                "status": "error",
+                "status_code": response.status_code,
+                "message": f"Workflow не найден: {response.status_code}",
+                "response": response.text
             }
+        current = response.json()
+    
+    diff = diff_workflows(current, workflow_data)
+    
+    if not diff['changed']:
+        return {
+            "status": "success",
+            "changed": False,
+            "diff": diff,
+            "workflow": current,
+            "message": "Изменений нет - workflow не обновлялся"
+        }
+    
+    workflow = current
+    
+    # Деактивация до PUT: измененный активный workflow не активируется повторно
+    if diff['active'] is False:
+        activation_result = yield from set_active_steps(client, workflow_id, False)
+        if activation_result['status'] != 'success':
+            return {**activation_result, "diff": diff}
+        workflow = activation_result['workflow']
+    
+    if diff['content_changed']:
+        response = yield ('PUT', path, workflow_update_body(current, workflow_data))
+        if response.status_code != 200:
+            return {
+                "status": "error",
+                "status_code": response.status_code,
+                "message": f"Ошибка обновления: {response.status_code}",
+                "response": response.text,
+                "diff": diff
+            }
+        workflow = response.json()
+    
+    if diff['active'] is True:
+        activation_result = yield from set_active_steps(client, workflow_id, True)
+        if activation_result['status'] != 'success':
+            return {**activation_result, "diff": diff, "workflow": workflow}
+        workflow = activation_result['workflow']
+    
+    return {
+        "status": "success",
+        "changed": True,
+        "diff": diff,
+        "workflow": workflow,
+        "message": f"Workflow обновлен: {describe_diff(diff)}"
+    }
+
+def set_active_steps(client, workflow_id: str, active: bool) -> Generator[WorkflowRequest, object, Dict]:
+    """
+    Шаги смены статуса без ввода-вывода (протокол как у update_workflow_steps)
+    
+    Один запрос к POST /workflows/{id}/activate|deactivate. Серверы без этих endpoints
+    (404/405) обрабатываются старым способом: GET workflow и PUT с новым значением active.
+    Результат проверки запоминается в client.supports_activation_endpoints - после
+    первого такого ответа клиент сразу использует старый способ.
+    """
+    action = "активации" if active else "деактивации"
+    path = f"/api/v1/workflows/{workflow_id}"
+    
+    if client.supports_activation_endpoints is not False:
+        response = yield ('POST', f"{path}/{'activate' if active else 'deactivate'}", None)
+        
+        if response.status_code == 200:
+            client.supports_activation_endpoints = True
+            return {
+                "status": "success",
+                "message": "Workflow активирован!" if active else "Workflow деактивирован!",
+                "workflow": response.json()
+            }
+        
+        if response.status_code not in (404, 405) or client.supports_activation_endpoints:
+            return {
+                "status": "error",
+                "status_code": response.status_code,
+                "message": f"Ошибка {action}: {response.status_code}",
+                "response": response.text
+            }
+    
+    get_response = yield ('GET', path, None)
+    
+    if get_response.status_code != 200:
+        return {
+            "status": "error",
+            "status_code": get_response.status_code,
+            "message": f"Workflow не найден: {get_response.status_code}"
+        }
+    
+    # Workflow существует - значит 404 был от отсутствующего endpoint активации
+    client.supports_activation_endpoints = False
+    
+    workflow = get_response.json()
+    workflow['active'] = active
+    
+    update_response = yield ('PUT', path, workflow)
+    
+    if update_response.status_code == 200:
+        return {
+            "status": "success",
+            "message": "Workflow активирован!" if active else "Workflow деактивирован!",
+            "workflow": update_response.json()
+        }
+    else:
+        return {
+            "status": "error",
+            "status_code": update_response.status_code,
+            "message": f"Ошибка {action}: {update_response.status_code}",
+            "response": update_response.text
+        }
+
+def summarize_workflows(workflows: Iterable[Dict] = ()) -> Dict:
+    """Подсчет workflow по потоку (список целиком не хранится)"""
+    summary = {"status": "success", "total": 0, "active": 0, "inactive": 0, "archived": 0, "tags": {}}
+    
+    for workflow in workflows:
+        add_to_summary(summary, workflow)
+    
+    return summary
+
+def add_to_summary(summary: Dict, workflow: Dict) -> None:
+    """Учет одного workflow в итогах summarize_workflows"""
+    summary['total'] += 1
+    summary['active' if workflow.get('active') else 'inactive'] += 1
+    if workflow.get('isArchived'):
+        summary['archived'] += 1
+    for tag in workflow.get('tags') or []:
+        name = tag.get('name') if isinstance(tag, dict) else str(tag)
+        summary['tags'][name] = summary['tags'].get(name, 0) + 1
+
+def bulk_activation_summary(results: Dict[str, Dict], active: bool) -> Dict:
+    """Итог пакетной активации/деактивации по результатам для каждого ID"""
+    failed = [workflow_id for workflow_id, result in results.items() if result['status'] != 'success']
+    action = "Активировано" if active else "Деактивировано"
+    
+    return {
+        "status": "success" if not failed else "error",
+        "message": f"{action} {len(results) - len(failed)} из {len(results)} workflow",
+        "succeeded": len(results) - len(failed),
+        "failed": failed,
+        "results": results
+    }
+
+def bulk_update_summary(results: Dict[str, Dict]) -> Dict:
+    """Итог пакетного обновления: обновленные, без изменений и ошибки по ID"""
+    failed = [workflow_id for workflow_id, result in results.items() if result['status'] != 'success']
+    updated = sum(1 for result in results.values() if result.get('changed'))
+    
+    return {
+        "status": "success" if not failed else "error",
+        "message": f"Обновлено {updated}, без изменений {len(results) - updated - len(failed)}, "
+                   f"ошибок {len(failed)} из {len(results)} workflow",
+        "updated": updated,
+        "unchanged": len(results) - updated - len(failed),
+        "failed": failed,
+        "results": results
+    }
 
 def test_production_client():
     """Тестирование Production клиента"""
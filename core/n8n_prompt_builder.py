@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+🧱 N8N Prompt Builder
+Сборка компактного промпта для генерации workflow с бюджетом входных токенов:
+стабильный префикс для prompt caching и короткая часть конкретного запроса
+"""
+
+import re
+import os
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_keyword_matcher import tokenize
+
+CYRILLIC_PATTERN = re.compile('[а-яА-ЯёЁ]')
+
+def estimate_tokens(text: str) -> int:
+    """
+    Оценка количества токенов без обращения к API
+    
+    Кириллица токенизируется заметно плотнее латиницы, поэтому считаем раздельно
+    (~2 символа на токен для кириллицы и ~3.5 для остального текста).
+    """
+    cyrillic = len(CYRILLIC_PATTERN.findall(text))
+    other = len(text) - cyrillic
+    return int(cyrillic / 2.0 + other / 3.5) + 1
+
+ROLE_SECTION = (
+    "Ты эксперт по n8n. Создай РАБОЧИЙ n8n workflow по описанию бизнес-процесса. "
+    "Ответь JSON workflow в блоке ```json```."
+)
+
+REQUIREMENTS_SECTION = """ТРЕБОВАНИЯ:
+1. Только node types из списков ДОСТУПНЫЕ NODES и ДОПОЛНИТЕЛЬНЫЕ NODES, без вымышленных nodes
+2. Уникальный id у каждого node, реалистичные parameters
+3. connections ссылаются на имена nodes (не id)
+4. position слева направо с шагом ~200px"""
+
+STRUCTURE_SECTION = """СТРУКТУРА:
+```json
+{"name": "...", "active": false,
+ "nodes": [{"id": "1", "name": "Webhook", "type": "n8n-nodes-base.webhook", "typeVersion": 1, "position": [100, 200], "parameters": {}}],
+ "connections": {"Webhook": {"main": [[{"node": "Next Node", "type": "main", "index": 0}]]}},
+ "settings": {}, "staticData": {}}
+```"""
+
+# Секции со списком и схемами nodes: без них модель не знает, какие nodes использовать,
+# поэтому их сокращение считается превышением бюджета (остальные секции - по возможности)
+REQUIRED_SECTIONS = ("description", "relevant_nodes", "extra_nodes")
+
+class N8NPromptBuilder:
+    """Сборщик промпта по секциям с учетом бюджета токенов"""
+    
+    def __init__(self, knowledge_base, node_retriever, node_catalog=None,
+                 max_input_tokens: int = 600, max_params_per_node: int = 3):
+        """
+        Инициализация сборщика
+        
+        Args:
+            knowledge_base: База знаний n8n
+            node_retriever: Индекс nodes (источник отображаемых имен и описаний)
+            node_catalog: Каталог n8n для параметров nodes, которых нет в базе знаний
+            max_input_tokens: Бюджет входных токенов на запрос (без кэшируемого префикса)
+            max_params_per_node: Максимум параметров в компактной схеме node
+        """
+        self.knowledge_base = knowledge_base
+        self.node_retriever = node_retriever
+        self.node_catalog = node_catalog
+        self.max_input_tokens = max_input_tokens
+        self.max_params_per_node = max_params_per_node
+        self._static_prefix = None
+    
+    def build_static_prefix(self) -> str:
+        """
+        Статический префикс промпта: роль, полный список nodes базы знаний,
+        паттерны, требования и пример структуры
+        
+        Префикс одинаков для всех запросов (зависит только от базы знаний),
+        поэтому передается как system с cache_control и кэшируется на стороне API.
+        API кэширует префиксы от ~1024 токенов, поэтому nodes описаны полностью.
+        """
+        if self._static_prefix is None:
+            node_lines = ["ДОСТУПНЫЕ NODES (тип | название | параметры):"]
+            for node_type in self.knowledge_base.nodes:
+                parameters = self._node_parameters(node_type)
+                line = self._format_node_line(node_type, list(parameters.items()))
+                use_cases = self.knowledge_base.nodes[node_type].get('use_cases', [])
+                if use_cases:
+                    line += f" | применение: {', '.join(use_cases)}"
+                node_lines.append(line)
+            
+            pattern_lines = ["ПАТТЕРНЫ:"]
+            for pattern in self.knowledge_base.workflow_patterns.values():
+                pattern_lines.append(f"- {pattern['description']}: {' -> '.join(pattern['nodes'])}")
+            
+            self._static_prefix = "\n\n".join([
+                ROLE_SECTION,
+                "\n".join(node_lines),
+                "\n".join(pattern_lines),
+                REQUIREMENTS_SECTION,
+                STRUCTURE_SECTION
+            ])
+        
+        return self._static_prefix
+    
+    def build(self, description: str, context: Dict) -> Dict:
+        """
+        Сборка промпта: кэшируемый префикс (system) и короткая часть запроса (prompt)
+        
+        В часть запроса всегда входит описание; ранжированный список релевантных nodes,
+        схемы nodes вне базы знаний, паттерн и контекст добавляются по приоритету,
+        пока хватает бюджета.
+        
+        Returns:
+            Dict с префиксом (system), текстом запроса (prompt) и метриками размера (metrics);
+            metrics.over_budget - бюджет превышен или не поместилась секция из REQUIRED_SECTIONS
+        """
+        description_tokens = set(tokenize(description))
+        static_prefix = self.build_static_prefix()
+        
+        sections = {
+            "description": f"ОПИСАНИЕ ПРОЦЕССА:\n{description.strip()}"
+        }
+        budget_used = estimate_tokens(sections["description"])
+        
+        available_nodes = context.get('available_nodes', [])
+        optional_sections = []
+        
+        if available_nodes:
+            optional_sections.append(("relevant_nodes", f"РЕЛЕВАНТНЫЕ NODES: {', '.join(available_nodes)}"))
+        
+        suggested_pattern = context.get('suggested_pattern')
+        if suggested_pattern:
+            optional_sections.append(("pattern", (
+                f"РЕКОМЕНДУЕМЫЙ ПАТТЕРН: {suggested_pattern['description']}\n"
+                f"nodes: {' -> '.join(suggested_pattern['nodes'])}"
+            )))
+        
+        optional_sections.append(("context", (
+            f"Сложность: {context.get('complexity', 'Средняя')}; "
+            f"категории: {', '.join(context.get('node_categories', [])) or '-'}"
+        )))
+        
+        dropped_sections = []
+        for name, text in optional_sections:
+            cost = estimate_tokens(text)
+            if budget_used + cost > self.max_input_tokens:
+                dropped_sections.append(name)
+                continue
+            sections[name] = text
+            budget_used += cost
+        
+        # Схемы nodes вне базы знаний (из каталога n8n) в порядке релевантности
+        extra_lines = []
+        extra_nodes = []
+        dropped_nodes = []
+        header = "ДОПОЛНИТЕЛЬНЫЕ NODES (тип | название | параметры):"
+        
+        for node_type in available_nodes:
+            if node_type in self.knowledge_base.nodes:
+                continue
+            
+            line = self._compact_node_schema(node_type, description_tokens)
+            cost = estimate_tokens(line) + (0 if extra_lines else estimate_tokens(header))
+            
+            if budget_used + cost > self.max_input_tokens:
+                dropped_nodes.append(node_type)
+                continue
+            
+            extra_lines.append(line)
+            extra_nodes.append(node_type)
+            budget_used += cost
+        
+        if extra_lines:
+            sections["extra_nodes"] = "\n".join([header] + extra_lines)
+        
+        order = ["description", "context", "pattern", "relevant_nodes", "extra_nodes"]
+        prompt = "\n\n".join(sections[name] for name in order if name in sections)
+        
+        # Node попал в промпт, если он есть в отправленном списке или у него есть схема
+        included_nodes = set(available_nodes) if "relevant_nodes" in sections else set()
+        included_nodes.update(extra_nodes)
+        
+        required_trimmed = bool(dropped_nodes) or any(name in REQUIRED_SECTIONS for name in dropped_sections)
+        
+        section_tokens = {"static_prefix": estimate_tokens(static_prefix)}
+        section_tokens.update({name: estimate_tokens(sections[name]) for name in order if name in sections})
+        
+        return {
+            "system": static_prefix,
+            "prompt": prompt,
+            "metrics": {
+                "estimated_tokens": section_tokens["static_prefix"] + estimate_tokens(prompt),
+                "static_tokens": section_tokens["static_prefix"],
+                "request_tokens": estimate_tokens(prompt),
+                "budget": self.max_input_tokens,
+                "over_budget": budget_used > self.max_input_tokens or required_trimmed,
+                "sections": section_tokens,
+                "nodes_included": len(included_nodes),
+                "nodes_dropped": dropped_nodes,
+                "sections_dropped": dropped_sections,
+                "characters": len(static_prefix) + len(prompt)
+            }
+        }
+    
+    def _node_parameters(self, node_type: str) -> Dict[str, Dict]:
+        """Параметры node в едином формате {имя: {type, options, required, description}}"""
+        node_info = self.knowledge_base.get_node_info(node_type)
+        if node_info:
+            parameters = {}
+            for name, spec in node_info.get('parameters', {}).items():
+                spec = dict(spec) if isinstance(spec, dict) else {}
+                if name in node_info.get('example_config', {}):
+                    spec['in_example'] = True
+                parameters[name] = spec
+            return parameters
+        
+        if self.node_catalog is not None:
+            catalog_entry = self.node_catalog.get_node_type(node_type) or {}
+            parameters = {}
+            for prop in catalog_entry.get('properties') or []:
+                if not isinstance(prop, dict) or not prop.get('name'):
+                    continue
+                options = [o.get('value') for o in prop.get('options') or [] if isinstance(o, dict) and 'value' in o]
+                parameters[prop['name']] = {
+                    "type": prop.get('type'),
+                    "options": options,
+                    "required": prop.get('required', False),
+                    "description": prop.get('description') or prop.get('displayName', '')
+                }
+            return parameters
+        
+        return {}
+    
+    def _compact_node_schema(self, node_type: str, description_tokens: set) -> str:
+        """Однострочная схема node только с нужными параметрами"""
+        parameters = self._node_parameters(node_type)
+        
+        # Нужные параметры: обязательные, связанные с описанием, из примера конфигурации
+        needed = []
+        for name, spec in parameters.items():
+            text_tokens = set(tokenize(f"{name} {spec.get('description', '')} {' '.join(map(str, spec.get('options') or []))}"))
+            rank = (
+                not spec.get('required', False),
+                not (text_tokens & description_tokens),
+                not spec.get('in_example', False)
+            )
+            if not all(rank):
+                needed.append((rank, name, spec))
+        
+        # Если ничего не нашлось - перечисления, в которых модель чаще всего ошибается
+        if not needed:
+            needed = [((True,), name, spec) for name, spec in parameters.items() if spec.get('options')]
+        
+        needed.sort(key=lambda entry: entry[0])
+        selected = [(name, spec) for _, name, spec in needed[:self.max_params_per_node]]
+        
+        return self._format_node_line(node_type, selected)
+    
+    def _format_node_line(self, node_type: str, parameters: List) -> str:
+        """Строка node для промпта: тип | название: описание | параметры"""
+        summary = self.node_retriever.get_summary(node_type) or {"display_name": node_type, "description": ""}
+        
+        params_info = []
+        for name, spec in parameters:
+            options = spec.get('options') or []
+            if options:
+                params_info.append(f"{name}({'/'.join(str(o) for o in options[:6])})")
+            else:
+                params_info.append(f"{name}:{spec.get('type') or 'any'}")
+        
+        line = f"- {node_type} | {summary['display_name']}: {summary['description']}"
+        if params_info:
+            line += f" | {', '.join(params_info)}"
+        
+        return line
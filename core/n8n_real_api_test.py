@@ -7,17 +7,21 @@
 import requests
 import json
 import os
-from typing import Dict
+import sys
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_http_transport import N8NHTTPTransport, get_shared_transport
 
 class N8NRealAPITester:
     """Тестер реального n8n API"""
     
-    def __init__(self):
+    def __init__(self, transport: Optional[N8NHTTPTransport] = None):
         self.base_url = "http://localhost:5678"
         self.api_key = os.getenv('N8N_API_KEY') or "your_n8n_api_key_here"
         
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.transport = transport or get_shared_transport()
+        self.session = self.transport.create_session({
             'X-N8N-API-KEY': self.api_key,
             'Content-Type': 'application/json',
             'Accept': 'application/json'
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+⏱️ N8N Request Scheduler
+Планировщик запросов к Claude API: клиентские лимиты RPM/TPM, общие для всех потоков,
+повторы с экспоненциальной задержкой и jitter, учет retry-after
+"""
+
+import os
+import time
+import random
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import anthropic
+
+# Коды ответа, при которых запрос имеет смысл повторить (529 - перегрузка API)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+class N8NRequestScheduler:
+    """Общий для потоков планировщик с бюджетами запросов и токенов в минуту"""
+    
+    def __init__(self, requests_per_minute: int = 50, tokens_per_minute: int = 40000,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        """
+        Инициализация планировщика
+        
+        Args:
+            requests_per_minute: Клиентский лимит запросов в минуту (None - без лимита)
+            tokens_per_minute: Клиентский лимит токенов в минуту (None - без лимита)
+            max_retries: Максимум повторов одного запроса
+            base_delay: Базовая задержка экспоненциального backoff (секунды)
+            max_delay: Максимальная задержка между повторами (секунды)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+        # Token bucket: запасы пополняются непрерывно до лимита в минуту
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        
+        self._condition = threading.Condition()
+        
+        self._metrics = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failed": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "in_flight": 0,
+            "wait_seconds": 0.0,
+            "tokens_used": 0
+        }
+    
+    def call(self, func: Callable, *args, estimated_tokens: int = 0, **kwargs) -> Any:
+        """
+        Вызов func с ожиданием бюджета и повторами при временных ошибках
+        
+        Args:
+            func: Вызываемый метод клиента (например, client.messages.create)
+            estimated_tokens: Оценка токенов запроса для бюджета TPM
+                (уточняется по usage ответа, если он есть)
+        
+        Returns:
+            Результат func
+        
+        Raises:
+            Последнее исключение, если повторы исчерпаны или ошибка не временная
+        """
+        attempt = 0
+        
+        while True:
+            self.acquire(estimated_tokens)
+            
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._release()
+                
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    with self._condition:
+                        self._metrics['failed'] += 1
+                    raise
+                
+                attempt += 1
+                with self._condition:
+                    self._metrics['retries'] += 1
+                
+                time.sleep(delay)
+                continue
+            
+            self._release()
+            
+            usage = getattr(result, 'usage', None)
+            if usage is not None:
+                actual_tokens = (getattr(usage, 'input_tokens', 0) or 0) + (getattr(usage, 'output_tokens', 0) or 0)
+                self.record_usage(estimated_tokens, actual_tokens)
+            
+            return result
+    
+    def acquire(self, estimated_tokens: int = 0) -> None:
+        """Ожидание бюджета на один запрос (блокирует поток, пока лимиты не позволят)"""
+        started = time.monotonic()
+        
+        with self._condition:
+            self._metrics['queue_depth'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._metrics['queue_depth'])
+            
+            try:
+                while True:
+                    wait = self._time_until_available(estimated_tokens)
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._metrics['queue_depth'] -= 1
+            
+            if self.requests_per_minute:
+                self._request_allowance -= 1
+            if self.tokens_per_minute:
+                self._token_allowance -= min(estimated_tokens, self.tokens_per_minute)
+            
+            self._metrics['requests'] += 1
+            self._metrics['in_flight'] += 1
+            self._metrics['tokens_used'] += estimated_tokens
+            self._metrics['wait_seconds'] += time.monotonic() - started
+    
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Уточнение бюджета TPM по фактическому расходу (возврат или доплата разницы)"""
+        if not self.tokens_per_minute:
+            return
+        
+        with self._condition:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + estimated_tokens - actual_tokens
+            )
+            self._metrics['tokens_used'] += actual_tokens - estimated_tokens
+            self._condition.notify_all()
+    
+    def _release(self) -> None:
+        """Завершение запроса"""
+        with self._condition:
+            self._metrics['in_flight'] -= 1
+            self._condition.notify_all()
+    
+    def _time_until_available(self, estimated_tokens: int) -> float:
+        """Сколько ждать до появления бюджета (вызывается под блокировкой)"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60.0
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60.0
+            )
+        
+        wait = self._paused_until - now
+        
+        if self.requests_per_minute and self._request_allowance < 1:
+            wait = max(wait, (1 - self._request_allowance) * 60.0 / self.requests_per_minute)
+        
+        if self.tokens_per_minute:
+            # Запрос больше минутного лимита ждет полного бюджета, а не бесконечно
+            needed = min(estimated_tokens, self.tokens_per_minute)
+            if self._token_allowance < needed:
+                wait = max(wait, (needed - self._token_allowance) * 60.0 / self.tokens_per_minute)
+        
+        return wait
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Задержка перед повтором (None - ошибку не повторяем)"""
+        if attempt >= self.max_retries:
+            return None
+        
+        if isinstance(error, anthropic.APIStatusError):
+            if error.status_code not in RETRYABLE_STATUS_CODES:
+                return None
+            retry_after = self._retry_after(error)
+        elif isinstance(error, anthropic.APIConnectionError):
+            retry_after = None
+        else:
+            return None
+        
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+        else:
+            # Full jitter: случайная задержка до экспоненциальной границы
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        
+        if isinstance(error, anthropic.APIStatusError) and error.status_code == 429:
+            # Лимит превышен у всех потоков сразу - приостанавливаем и остальные запросы
+            with self._condition:
+                self._metrics['rate_limited'] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        
+        return delay
+    
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Задержка из заголовков retry-after-ms / retry-after"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        
+        try:
+            if headers.get('retry-after-ms') is not None:
+                return float(headers['retry-after-ms']) / 1000.0
+            if headers.get('retry-after') is not None:
+                return float(headers['retry-after'])
+        except (TypeError, ValueError):
+            return None
+        
+        return None
+    
+    def stats(self) -> Dict:
+        """Метрики планировщика: глубина очереди, повторы, ожидание бюджета"""
+        with self._condition:
+            metrics = dict(self._metrics)
+            metrics['request_allowance'] = round(self._request_allowance, 2)
+            metrics['token_allowance'] = int(self._token_allowance)
+        
+        metrics['wait_seconds'] = round(metrics['wait_seconds'], 3)
+        metrics['requests_per_minute'] = self.requests_per_minute
+        metrics['tokens_per_minute'] = self.tokens_per_minute
+        return metrics
+
+_shared_scheduler: Optional[N8NRequestScheduler] = None
+_shared_scheduler_lock = threading.Lock()
+
+def get_shared_scheduler() -> N8NRequestScheduler:
+    """
+    Общий планировщик процесса (лимиты из CLAUDE_RPM_LIMIT / CLAUDE_TPM_LIMIT)
+    
+    Все сервисы в процессе делят один бюджет, поэтому параллельные пакеты
+    не превышают лимиты API в сумме.
+    """
+    global _shared_scheduler
+    
+    if _shared_scheduler is None:
+        with _shared_scheduler_lock:
+            if _shared_scheduler is None:
+                _shared_scheduler = N8NRequestScheduler(
+                    requests_per_minute=int(os.getenv('CLAUDE_RPM_LIMIT', '50')),
+                    tokens_per_minute=int(os.getenv('CLAUDE_TPM_LIMIT', '40000'))
+                )
+    
+    return _shared_scheduler
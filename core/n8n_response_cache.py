@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+💾 N8N Response Cache
+Персистентный кэш сгенерированных workflow с адресацией по содержимому запроса
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Optional
+
+# Каталог для локальных кэшей N8N-Agent (можно переопределить через окружение)
+DEFAULT_CACHE_DIR = os.getenv('N8N_AGENT_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache'
+)
+
+# Параметры, которые не влияют на результат генерации
+NON_GENERATION_PARAMS = {'auto_activate'}
+
+def normalize_description(description: str) -> str:
+    """Нормализация описания: регистр и пробелы не влияют на ключ"""
+    return " ".join(description.lower().split())
+
+def make_request_key(description: str, params: Optional[Dict], model: str,
+                     prompt_version: str, kb_version: str) -> str:
+    """Хэш запроса генерации (описание, параметры, модель, версии промпта и базы знаний)"""
+    generation_params = {
+        key: value for key, value in (params or {}).items()
+        if key not in NON_GENERATION_PARAMS
+    }
+    
+    payload = json.dumps({
+        "description": normalize_description(description),
+        "params": generation_params,
+        "model": model,
+        "prompt_version": prompt_version,
+        "kb_version": kb_version
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class N8NResponseCache:
+    """Кэш ответов генерации на SQLite с LRU/TTL вытеснением и лимитами размера"""
+    
+    def __init__(self, cache_dir: str = None, max_entries: int = 1000,
+                 max_bytes: int = 50 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        """
+        Инициализация кэша
+        
+        Args:
+            cache_dir: Каталог для файла кэша (по умолчанию .cache/ в корне проекта)
+            max_entries: Максимальное количество записей
+            max_bytes: Максимальный суммарный размер записей в байтах
+            ttl_seconds: Время жизни записи (None - без ограничения)
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, 'responses.sqlite')
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Получение записи из кэша (None при промахе или истекшем TTL)"""
+        now = time.time()
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None:
+                self.misses += 1
+                return None
+            
+            value, created_at = row
+            
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        
+        return json.loads(value)
+    
+    def set(self, key: str, value: Dict) -> None:
+        """Сохранение записи в кэш с последующим вытеснением по лимитам"""
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        
+        # Запись больше всего кэша не сохраняем
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self) -> None:
+        """Удаление устаревших записей и LRU вытеснение сверх лимитов"""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        
+        count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        
+        if (self.max_entries is None or count <= self.max_entries) and \
+                (self.max_bytes is None or total_size <= self.max_bytes):
+            return
+        
+        # Идем от давно неиспользуемых записей к свежим
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall():
+            if (self.max_entries is None or count <= self.max_entries) and \
+                    (self.max_bytes is None or total_size <= self.max_bytes):
+                break
+            
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total_size -= size
+            self.evictions += 1
+    
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+    
+    def stats(self) -> Dict:
+        """Статистика кэша"""
+        with self._lock:
+            count, total_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        
+        lookups = self.hits + self.misses
+        
+        return {
+            "entries": count,
+            "size_bytes": total_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "path": self.db_path
+        }
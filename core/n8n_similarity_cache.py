@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+🧬 N8N Similarity Cache
+Кэш ранее сгенерированных workflow с поиском по похожим описаниям
+(TF-IDF по символьным n-граммам, косинусная близость на NumPy)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Set
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_response_cache import DEFAULT_CACHE_DIR, NON_GENERATION_PARAMS, normalize_description
+
+def char_ngrams(text: str, min_n: int = 2, max_n: int = 3) -> List[str]:
+    """Символьные n-граммы внутри слов (слова обрамлены пробелами)"""
+    ngrams = []
+    for word in normalize_description(text).split():
+        padded = f" {word} "
+        for n in range(min_n, max_n + 1):
+            ngrams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return ngrams
+
+# Единицы времени расписания: "каждый час" и "каждый день" не взаимозаменяемы
+TIME_UNITS = {
+    'minute': ('минут', 'minute'),
+    'hour': ('час', 'ежечас', 'hour'),
+    'day': ('ден', 'дн', 'ежеднев', 'сутк', 'day', 'daily'),
+    'week': ('недел', 'еженедел', 'week'),
+    'month': ('месяц', 'ежемесяч', 'month')
+}
+
+# Слова, меняющие смысл условия при почти одинаковом тексте
+CONDITION_WORDS = {'больше', 'меньше', 'равно', 'не', 'без', 'кроме', 'выше', 'ниже'}
+
+LATIN_OR_DIGIT_PATTERN = re.compile(r'[a-z0-9]+')
+
+def description_signature(text: str) -> str:
+    """
+    Сигнатура описания: латинские слова (сервисы, API), числа, единицы времени
+    и слова условий
+    
+    Описания с разной сигнатурой не считаются похожими при любой близости
+    (например, "в Slack" / "в Telegram", "каждый час" / "каждый день", "больше" / "меньше").
+    """
+    normalized = normalize_description(text)
+    parts = set(LATIN_OR_DIGIT_PATTERN.findall(normalized))
+    
+    for word in normalized.split():
+        word = word.strip('.,;:!?()"\'')
+        if word in CONDITION_WORDS:
+            parts.add(f"cond:{word}")
+        for unit, prefixes in TIME_UNITS.items():
+            if word.startswith(prefixes):
+                parts.add(f"time:{unit}")
+    
+    return ",".join(sorted(parts))
+
+def params_key(params: Optional[Dict]) -> str:
+    """Ключ параметров генерации (похожими считаются только запросы с теми же параметрами)"""
+    generation_params = {
+        key: value for key, value in (params or {}).items()
+        if key not in NON_GENERATION_PARAMS
+    }
+    return json.dumps(generation_params, sort_keys=True, ensure_ascii=False, default=str)
+
+# Начальное количество строк буфера векторов
+INITIAL_CAPACITY = 64
+
+class N8NSimilarityCache:
+    """Кэш workflow с поиском ближайшего описания по косинусной близости"""
+    
+    def __init__(self, cache_dir: str = None, threshold: float = 0.7,
+                 n_features: int = 2 ** 12, max_entries: int = 2000):
+        """
+        Инициализация кэша
+        
+        Args:
+            cache_dir: Каталог для файла кэша (по умолчанию .cache/ в корне проекта)
+            threshold: Минимальная косинусная близость описаний для повторного использования
+            n_features: Размерность векторов (n-граммы хэшируются в этот диапазон)
+            max_entries: Максимальное количество хранимых workflow (старые вытесняются)
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.threshold = threshold
+        self.n_features = n_features
+        self.max_entries = max_entries
+        
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.db_path = os.path.join(self.cache_dir, 'similar_workflows.sqlite')
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS workflows (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                description TEXT NOT NULL,
+                params_key TEXT NOT NULL,
+                kb_version TEXT NOT NULL,
+                groups TEXT NOT NULL,
+                workflow TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        
+        # Векторы описаний в памяти: частоты n-грамм (первые len(_ids) строк буфера,
+        # буфер растет геометрически) и документная частота признаков
+        self._ids: List[int] = []
+        self._meta: List[Dict] = []
+        self._term_counts = np.zeros((INITIAL_CAPACITY, n_features), dtype=np.float32)
+        self._document_frequency = np.zeros(n_features, dtype=np.float32)
+        self._matrix: Optional[np.ndarray] = None
+        
+        for row_id, description, key, kb_version, groups in self._conn.execute(
+            "SELECT id, description, params_key, kb_version, groups FROM workflows ORDER BY id"
+        ).fetchall():
+            self._append_vector(row_id, description, key, kb_version, groups)
+    
+    def _vectorize(self, text: str) -> np.ndarray:
+        """Вектор частот хэшированных n-грамм"""
+        indices = [zlib.crc32(ngram.encode('utf-8')) % self.n_features for ngram in char_ngrams(text)]
+        return np.bincount(indices, minlength=self.n_features).astype(np.float32)
+    
+    def _append_vector(self, row_id: int, description: str, key: str, kb_version: str, groups: str) -> None:
+        """Добавление описания в матрицу (вызывается под блокировкой или при инициализации)"""
+        counts = self._vectorize(description)
+        self._ids.append(row_id)
+        self._meta.append({
+            "description": description,
+            "signature": description_signature(description),
+            "params_key": key,
+            "kb_version": kb_version,
+            "groups": groups
+        })
+        size = len(self._ids)
+        if size > len(self._term_counts):
+            self._grow(size)
+        self._term_counts[size - 1] = counts
+        self._document_frequency += counts > 0
+        self._matrix = None
+    
+    def _grow(self, size: int) -> None:
+        """Увеличение буфера векторов вдвое (не больше max_entries + 1 строк)"""
+        capacity = max(size, 2 * len(self._term_counts))
+        if self.max_entries is not None:
+            capacity = max(size, min(capacity, self.max_entries + 1))
+        
+        term_counts = np.zeros((capacity, self.n_features), dtype=np.float32)
+        term_counts[:size - 1] = self._term_counts[:size - 1]
+        self._term_counts = term_counts
+    
+    def _tfidf_matrix(self) -> np.ndarray:
+        """Нормированная TF-IDF матрица (пересчитывается лениво после изменений)"""
+        if self._matrix is None:
+            idf = self._idf()
+            weighted = np.log1p(self._term_counts[:len(self._ids)]) * idf
+            norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+            self._matrix = weighted / np.maximum(norms, 1e-9)
+        return self._matrix
+    
+    def _idf(self) -> np.ndarray:
+        """Сглаженный IDF признаков"""
+        n_docs = len(self._ids)
+        return np.log((1.0 + n_docs) / (1.0 + self._document_frequency)) + 1.0
+    
+    def lookup(self, description: str, params: Optional[Dict], kb_version: str,
+               groups: Optional[Set[str]] = None) -> Optional[Dict]:
+        """
+        Поиск workflow для похожего описания
+        
+        Args:
+            description: Описание бизнес-процесса
+            params: Параметры генерации (должны совпадать)
+            kb_version: Версия базы знаний (должна совпадать)
+            groups: Группы ключевых слов описания - если переданы, должны совпадать
+                (защищает от совпадений вида "в Slack" / "в Gmail")
+        
+        Returns:
+            Dict с workflow, исходным описанием и близостью (similarity) или None
+        """
+        key = params_key(params)
+        groups_key = ",".join(sorted(groups)) if groups is not None else None
+        signature = description_signature(description)
+        
+        with self._lock:
+            if not self._ids:
+                self.misses += 1
+                return None
+            
+            matrix = self._tfidf_matrix()
+            query = np.log1p(self._vectorize(description)) * self._idf()
+            norm = np.linalg.norm(query)
+            if norm == 0:
+                self.misses += 1
+                return None
+            
+            scores = matrix @ (query / norm)
+            
+            # Кандидаты только с теми же параметрами, версией базы знаний, сигнатурой и группами
+            mask = np.array([
+                meta['params_key'] == key and meta['kb_version'] == kb_version
+                and meta['signature'] == signature
+                and (groups_key is None or meta['groups'] == groups_key)
+                for meta in self._meta
+            ])
+            scores = np.where(mask, scores, -1.0)
+            
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            
+            row = self._conn.execute(
+                "SELECT description, workflow FROM workflows WHERE id = ?", (self._ids[best],)
+            ).fetchone()
+            self.hits += 1
+        
+        return {
+            "workflow": json.loads(row[1]),
+            "description": row[0],
+            "similarity": round(similarity, 4)
+        }
+    
+    def add(self, description: str, params: Optional[Dict], kb_version: str,
+            workflow: Dict, groups: Optional[Set[str]] = None) -> None:
+        """Сохранение сгенерированного workflow"""
+        key = params_key(params)
+        groups_key = ",".join(sorted(groups or []))
+        
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO workflows (description, params_key, kb_version, groups, workflow, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (description, key, kb_version, groups_key, json.dumps(workflow, ensure_ascii=False), time.time())
+            )
+            self._append_vector(cursor.lastrowid, description, key, kb_version, groups_key)
+            
+            if self.max_entries is not None and len(self._ids) > self.max_entries:
+                self._evict(len(self._ids) - self.max_entries)
+            
+            self._conn.commit()
+    
+    def _evict(self, count: int) -> None:
+        """Вытеснение самых старых записей (вызывается под блокировкой)"""
+        evicted = self._ids[:count]
+        self._conn.executemany("DELETE FROM workflows WHERE id = ?", [(row_id,) for row_id in evicted])
+        
+        size = len(self._ids)
+        self._document_frequency -= (self._term_counts[:count] > 0).sum(axis=0)
+        self._term_counts[:size - count] = self._term_counts[count:size]
+        self._term_counts[size - count:size] = 0
+        self._ids = self._ids[count:]
+        self._meta = self._meta[count:]
+        self._matrix = None
+    
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        with self._lock:
+            self._conn.execute("DELETE FROM workflows")
+            self._conn.commit()
+            self._ids, self._meta = [], []
+            self._term_counts = np.zeros((INITIAL_CAPACITY, self.n_features), dtype=np.float32)
+            self._document_frequency = np.zeros(self.n_features, dtype=np.float32)
+            self._matrix = None
+    
+    def stats(self) -> Dict:
+        """Статистика кэша"""
+        lookups = self.hits + self.misses
+        
+        return {
+            "entries": len(self._ids),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "path": self.db_path
+        }
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+🛬 N8N Single Flight
+Объединение одинаковых одновременных запросов: выполняется один вызов,
+все ожидающие получают его результат
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+class _InFlightCall:
+    """Выполняющийся вызов и его результат"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.snapshot: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class N8NSingleFlight:
+    """Дедупликация одновременных вызовов по ключу (потокобезопасно)"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        
+        self.executed = 0
+        self.coalesced = 0
+    
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Выполнение func или ожидание уже выполняющегося вызова с тем же ключом
+        
+        Args:
+            key: Ключ запроса
+            func: Вызов без аргументов
+        
+        Returns:
+            (результат, shared) - shared=True, если результат получен от чужого вызова
+            (в этом случае возвращается копия, чтобы вызывающие не меняли общий объект)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.snapshot), True
+        
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # После удаления ключа новые ожидающие не появятся - снимок делается один раз,
+            # до того как вызывающий получит (и сможет изменить) результат
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.waiters and call.error is None:
+                call.snapshot = copy.deepcopy(call.result)
+            call.done.set()
+        
+        return call.result, False
+    
+    def stats(self) -> Dict:
+        """Статистика объединения запросов"""
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(call.waiters for call in self._calls.values())
+        
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "waiting": waiting
+        }
+
+# Общий для процесса экземпляр: сессии Streamlit и пакетные задачи создают
+# собственные сервисы, но одинаковые запросы должны объединяться между ними
+_shared_single_flight = N8NSingleFlight()
+
+def get_shared_single_flight() -> N8NSingleFlight:
+    """Общий для процесса объединитель запросов"""
+    return _shared_single_flight
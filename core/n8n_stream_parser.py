@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+🌊 N8N Stream Parser
+Инкрементальный разбор JSON workflow из потока ответа Claude:
+nodes отдаются сразу после закрытия их объектов
+"""
+
+import os
+import sys
+import json
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_json_extractor import CLOSING_BRACKETS, root_level_step
+
+class StreamStructureError(ValueError):
+    """Неисправимая ошибка структуры JSON в потоке (генерацию можно прерывать)"""
+
+class IncrementalWorkflowParser:
+    """
+    Потоковый сканер JSON workflow
+    
+    Каждый символ ответа обрабатывается ровно один раз (позиция сканирования только
+    растет): учитываются строки и экранирование, стек скобок и ключи корневого объекта.
+    Когда закрывается объект внутри корневого массива "nodes", он разбирается и
+    возвращается из feed().
+    
+    Фигурная скобка в тексте перед JSON отбрасывается по тем же правилам, что и в
+    scan_object (root_level_step, несовпадение скобок, объект без ключа "nodes"), и
+    сканирование продолжается с символа, на котором она отброшена (если это "{" - он
+    становится новым началом). Объект, вложенный в отброшенный фрагмент (например,
+    {"workflow": {...}}), потоком не разбирается - его находит финальный
+    extract_json_object по полному тексту.
+    """
+    
+    def __init__(self, max_preamble_chars: int = 2000):
+        """
+        Args:
+            max_preamble_chars: Сколько текста до начала JSON допустимо (дальше - ошибка структуры)
+        """
+        self.max_preamble_chars = max_preamble_chars
+        
+        self.buffer: List[str] = []
+        self.json_start: Optional[int] = None
+        self.json_end: Optional[int] = None
+        self.nodes_seen = 0
+        
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars: Optional[List[str]] = None
+        self._last_string: Optional[str] = None
+        self._root_key: Optional[str] = None
+        self._root_expect_value = False
+        self._has_nodes_key = False
+        self._nodes_depth: Optional[int] = None
+        self._node_start: Optional[int] = None
+        
+        # После отброшенного фрагмента JSON мог начаться внутри него (например, внутри
+        # строки в тексте) - тогда отсутствие JSON в потоке не считается ошибкой
+        self._candidates_rejected = 0
+    
+    @property
+    def position(self) -> int:
+        """Количество полученных символов"""
+        return len(self.buffer)
+    
+    @property
+    def complete(self) -> bool:
+        """Корневой объект JSON полностью получен"""
+        return self.json_end is not None
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Обработка очередного фрагмента текста
+        
+        Returns:
+            Список nodes, объекты которых закрылись в этом фрагменте
+        
+        Raises:
+            StreamStructureError: при несовпадении скобок или отсутствии JSON
+        """
+        completed_nodes = []
+        offset = len(self.buffer)
+        self.buffer.extend(chunk)
+        
+        for index in range(offset, len(self.buffer)):
+            if self.complete:
+                break
+            char = self.buffer[index]
+            
+            if self.json_start is None:
+                if char == '{':
+                    self.json_start = index
+                    self._stack.append('{')
+                elif index >= self.max_preamble_chars and not self._candidates_rejected:
+                    raise StreamStructureError(f"JSON не начался в первых {self.max_preamble_chars} символах ответа")
+                continue
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_chars is not None:
+                        self._last_string = "".join(self._string_chars)
+                        self._string_chars = None
+                    continue
+                
+                if self._string_chars is not None:
+                    self._string_chars.append(char)
+                continue
+            
+            if char == '"':
+                self._in_string = True
+                # Содержимое строк запоминаем только в корневом объекте (там ключи workflow)
+                self._string_chars = [] if len(self._stack) == 1 else None
+                continue
+            
+            if char in '}]':
+                if self._stack[-1] != CLOSING_BRACKETS[char]:
+                    if not self._has_nodes_key:
+                        self._reset_candidate(index, char)
+                        continue
+                    raise StreamStructureError(f"Несовпадение скобок в позиции {index}")
+                self._stack.pop()
+                
+                if char == '}' and self._node_start is not None and len(self._stack) == self._nodes_depth:
+                    node = self._parse_node("".join(self.buffer[self._node_start:index + 1]))
+                    self._node_start = None
+                    if node is not None:
+                        self.nodes_seen += 1
+                        completed_nodes.append(node)
+                
+                elif char == ']' and self._nodes_depth is not None and len(self._stack) == 1:
+                    self._nodes_depth = None
+                
+                if not self._stack:
+                    if self._has_nodes_key:
+                        self.json_end = index + 1
+                    else:
+                        self._reset_candidate()
+                continue
+            
+            if len(self._stack) == 1:
+                expect_value = root_level_step(char, self._root_expect_value)
+                if expect_value is None:
+                    # Текст вместо JSON: до ключа "nodes" это был не workflow
+                    if not self._has_nodes_key:
+                        self._reset_candidate(index, char)
+                        continue
+                    raise StreamStructureError(f"Текст вместо JSON в позиции {index}")
+                self._root_expect_value = expect_value
+                
+                if char == ':':
+                    self._root_key = self._last_string
+                    if self._root_key == 'nodes':
+                        self._has_nodes_key = True
+            
+            if char in '{[':
+                if char == '[' and len(self._stack) == 1 and self._root_key == 'nodes':
+                    self._nodes_depth = 2
+                elif char == '{' and self._nodes_depth is not None and len(self._stack) == self._nodes_depth:
+                    self._node_start = index
+                self._stack.append(char)
+            
+            elif char == '`':
+                # Обратные кавычки вне строк в JSON невозможны
+                if not self._has_nodes_key:
+                    self._reset_candidate(index, char)
+                    continue
+                raise StreamStructureError(f"Текст вместо JSON в позиции {index}")
+        
+        return completed_nodes
+    
+    def _reset_candidate(self, index: Optional[int] = None, char: str = '') -> None:
+        """
+        Сброс найденного начала JSON (это был текст ответа, а не workflow)
+        
+        Args:
+            index, char: Символ, на котором фрагмент отброшен - "{" сразу становится
+                началом следующего кандидата (сканирование не возвращается назад)
+        """
+        self._candidates_rejected += 1
+        self.json_start = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars = None
+        self._root_key = None
+        self._root_expect_value = False
+        self._last_string = None
+        self._nodes_depth = None
+        self._node_start = None
+        
+        if char == '{':
+            self.json_start = index
+            self._stack.append('{')
+    
+    @staticmethod
+    def _parse_node(text: str) -> Optional[Dict]:
+        """Разбор объекта node (None если он невалиден - его исправит финальный разбор)"""
+        try:
+            node = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return node if isinstance(node, dict) else None
+    
+    @property
+    def text(self) -> str:
+        """Весь полученный текст ответа"""
+        return "".join(self.buffer)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+📐 N8N Template Engine
+Детерминированная сборка workflow из паттернов базы знаний без обращения к Claude:
+узнаваемые описания заполняются слотами (канал, интервал, URL, таблица, email, условие)
+"""
+
+import re
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+# Node types, которые называются в описании явно (префиксы слов)
+SERVICE_PREFIXES = {
+    'n8n-nodes-base.slack': ('slack', 'слак'),
+    'n8n-nodes-base.gmail': ('gmail', 'email', 'mail', 'письм', 'почт', 'имейл', 'емейл'),
+    'n8n-nodes-base.googleSheets': ('sheets', 'spreadsheet', 'таблиц'),
+    'n8n-nodes-base.httpRequest': ('api', 'http', 'url')
+}
+
+TRIGGER_PREFIXES = {
+    'n8n-nodes-base.webhook': ('webhook', 'вебхук', 'hook'),
+    'n8n-nodes-base.schedule': ('кажд', 'ежеднев', 'ежечас', 'еженедел', 'периодичес', 'регулярн', 'расписан', 'cron')
+}
+
+CONDITION_PREFIXES = ('если', 'услови', 'иначе', 'остальн')
+
+# Слова, которые шаблон "понимает" (префиксы): все остальное снижает уверенность
+KNOWN_PREFIXES = (
+    'получ', 'отправ', 'присыл', 'прислат', 'пересыл', 'сохран', 'запис', 'добав', 'выгруж', 'загруж',
+    'забир', 'бра', 'приход', 'приш', 'поступ', 'входящ', 'нов', 'данн', 'уведом', 'сообщ', 'оповещ',
+    'информац', 'событи', 'запрос', 'отчет', 'сводк', 'результат', 'канал', 'команд', 'google', 'гугл',
+    'минут', 'час', 'ден', 'дн', 'недел', 'месяц', 'утр', 'вечер', 'раз', 'ответствен', 'менеджер',
+    'тот', 'та', 'то', 'эт', 'все', 'вс'
+)
+
+STOP_WORDS = {
+    'в', 'во', 'и', 'из', 'с', 'со', 'при', 'на', 'по', 'для', 'от', 'о', 'об', 'к', 'ко',
+    'а', 'же', 'их', 'его', 'ее', 'или', 'также', 'затем', 'потом', 'после', 'чего', 'этого', 'туда',
+    'мне', 'нам', 'него', 'них', 'когда', 'как', 'что', 'тогда'
+}
+
+URL_PATTERN = re.compile(r'https?://[^\s,;"\'<>]+', re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+CHANNEL_PATTERN = re.compile(r'#[\w-]+')
+QUOTED_PATTERN = re.compile(r'["«]([^"»]+)["»]')
+SHEET_URL_PATTERN = re.compile(r'docs\.google\.com/spreadsheets/d/([\w-]+)')
+WORD_PATTERN = re.compile(r'[a-zа-яё0-9]+')
+
+INTERVAL_PATTERN = re.compile(
+    r'(?:кажд\w*|раз\s+в)\s+(?:(\d+)\s+)?(минут\w*|час\w*|день|дня|дней|сутк\w*|недел\w*|месяц\w*)'
+)
+INTERVAL_ADVERBS = {'ежечасно': 60, 'ежедневно': 24 * 60, 'еженедельно': 7 * 24 * 60}
+INTERVAL_UNITS = (('минут', 1), ('час', 60), ('ден', 24 * 60), ('дн', 24 * 60), ('сутк', 24 * 60),
+                  ('недел', 7 * 24 * 60), ('месяц', 30 * 24 * 60))
+
+CONDITION_PATTERN = re.compile(
+    r'если\s+((?:[а-яёa-z_]+\s+){0,2}?[а-яёa-z_]+)\s+(больше|меньше|выше|ниже|равн\w*)\s+(\d+(?:[.,]\d+)?)'
+)
+CONDITION_OPERATIONS = {'больше': 'larger', 'выше': 'larger', 'меньше': 'smaller', 'ниже': 'smaller'}
+
+class N8NTemplateEngine:
+    """Сборка workflow по паттернам базы знаний с оценкой уверенности"""
+    
+    def __init__(self, knowledge_base, min_confidence: float = 0.85):
+        """
+        Инициализация движка
+        
+        Args:
+            knowledge_base: База знаний n8n (паттерны и конфигурации nodes)
+            min_confidence: Минимальная уверенность, при которой шаблон используется вместо Claude
+        """
+        self.knowledge_base = knowledge_base
+        self.min_confidence = min_confidence
+    
+    def generate(self, description: str, params: Dict = None) -> Optional[Dict]:
+        """
+        Генерация workflow по шаблону
+        
+        Returns:
+            Результат в формате generate_workflow или None, если уверенности недостаточно
+        """
+        if params is None:
+            params = {}
+        
+        # Сложные процессы всегда генерирует Claude
+        if params.get('complexity') == 'Сложная':
+            return None
+        
+        match = self.match(description)
+        if match is None or match['confidence'] < self.min_confidence:
+            return None
+        
+        workflow = self._build_workflow(description, match)
+        
+        return {
+            "status": "success",
+            "workflow": workflow,
+            "description": description,
+            "params": params,
+            "template": {
+                "pattern": match['pattern'],
+                "confidence": match['confidence'],
+                "slots": match['slots'],
+                "missing_slots": match['missing_slots']
+            },
+            "cached": False
+        }
+    
+    def match(self, description: str) -> Optional[Dict]:
+        """
+        Подбор паттерна и извлечение слотов
+        
+        Returns:
+            Dict с паттерном, слотами и уверенностью (доля понятых слов описания)
+            или None, если ни один паттерн не подходит по составу nodes
+        """
+        slots, remainder = self._extract_slots(description)
+        words = [word for word in WORD_PATTERN.findall(remainder) if word not in STOP_WORDS]
+        
+        required = self._required_nodes(words, slots)
+        if required is None:
+            return None
+        
+        found = self._find_pattern(required)
+        if found is None:
+            return None
+        pattern_name, omitted_nodes = found
+        
+        explained = sum(1 for word in words if self._is_known_word(word))
+        confidence = explained / len(words) if words else 0.0
+        
+        return {
+            "pattern": pattern_name,
+            "confidence": round(confidence, 3),
+            "slots": slots,
+            "missing_slots": self._missing_slots(pattern_name, omitted_nodes, slots),
+            "omitted_nodes": sorted(omitted_nodes)
+        }
+    
+    def _extract_slots(self, description: str) -> Tuple[Dict, str]:
+        """
+        Извлечение слотов; распознанные фрагменты вырезаются из текста
+        
+        URL, ID таблицы, email, канал и имя в кавычках берутся из исходного текста
+        (регистр в них значим), остаток для поиска ключевых слов приводится к нижнему регистру.
+        
+        Returns:
+            (слоты, остаток описания в нижнем регистре)
+        """
+        slots = {}
+        text = description
+        
+        sheet = SHEET_URL_PATTERN.search(text)
+        if sheet:
+            slots['sheet'] = sheet.group(1)
+        
+        urls = [url for url in URL_PATTERN.findall(text) if not SHEET_URL_PATTERN.search(url)]
+        if urls:
+            slots['url'] = urls[0]
+        text = URL_PATTERN.sub(' url ', text)
+        
+        email = EMAIL_PATTERN.search(text)
+        if email:
+            slots['email'] = email.group(0)
+            text = EMAIL_PATTERN.sub(' email ', text)
+        
+        channel = CHANNEL_PATTERN.search(text)
+        if channel:
+            slots['channel'] = channel.group(0)
+            text = CHANNEL_PATTERN.sub(' канал ', text)
+        
+        quoted = QUOTED_PATTERN.search(text)
+        if quoted and 'sheet' not in slots:
+            slots['sheet'] = quoted.group(1)
+        text = QUOTED_PATTERN.sub(' ', text)
+        
+        text = text.lower().replace('ё', 'е')
+        
+        interval = INTERVAL_PATTERN.search(text)
+        if interval:
+            slots['interval_minutes'] = int(interval.group(1) or 1) * self._unit_minutes(interval.group(2))
+            text = text[:interval.start()] + ' каждый ' + text[interval.end():]
+        else:
+            for adverb, minutes in INTERVAL_ADVERBS.items():
+                if adverb in text:
+                    slots['interval_minutes'] = minutes
+                    break
+        
+        condition = CONDITION_PATTERN.search(text)
+        if condition:
+            field, operator, value = condition.groups()
+            operation = CONDITION_OPERATIONS.get(operator, 'equal')
+            slots['condition'] = {
+                "field": field.split()[0],
+                "operation": operation,
+                "value": float(value.replace(',', '.')) if '.' in value or ',' in value else int(value)
+            }
+            text = text[:condition.start()] + ' если ' + text[condition.end():]
+        
+        return slots, text
+    
+    @staticmethod
+    def _unit_minutes(unit: str) -> int:
+        """Длительность единицы интервала в минутах"""
+        for prefix, minutes in INTERVAL_UNITS:
+            if unit.startswith(prefix):
+                return minutes
+        return 60
+    
+    def _required_nodes(self, words: List[str], slots: Dict) -> Optional[Set[str]]:
+        """Nodes, которые описание явно требует (None - нет однозначного триггера или действия)"""
+        triggers = {
+            node_type for node_type, prefixes in TRIGGER_PREFIXES.items()
+            if any(word.startswith(prefixes) for word in words)
+        }
+        if 'interval_minutes' in slots:
+            triggers.add('n8n-nodes-base.schedule')
+        
+        if len(triggers) != 1:
+            return None
+        
+        services = {
+            node_type for node_type, prefixes in SERVICE_PREFIXES.items()
+            if any(word.startswith(prefixes) for word in words)
+        }
+        if 'url' in slots:
+            services.add('n8n-nodes-base.httpRequest')
+        if 'email' in slots:
+            services.add('n8n-nodes-base.gmail')
+        if 'sheet' in slots:
+            services.add('n8n-nodes-base.googleSheets')
+        
+        # Без явного назначения (куда отправить/сохранить) шаблон не угадывает действие
+        if not services - {'n8n-nodes-base.httpRequest'}:
+            return None
+        
+        required = triggers | services
+        
+        if any(word.startswith(CONDITION_PREFIXES) for word in words):
+            # Условие без распознанного сравнения шаблон не построит
+            if 'condition' not in slots:
+                return None
+            required.add('n8n-nodes-base.if')
+        
+        return required
+    
+    def _find_pattern(self, required: Set[str]) -> Optional[Tuple[str, Set[int]]]:
+        """
+        Паттерн из ровно требуемых nodes (допускается дополнительный Set)
+        
+        Ветки IF необязательны: ненужный получатель ветки исключается
+        (например, условное уведомление только в Slack без Gmail).
+        
+        Returns:
+            (имя паттерна, индексы исключенных nodes) или None
+        """
+        best = None
+        
+        for name, pattern in self.knowledge_base.workflow_patterns.items():
+            branches = self._branch_nodes(pattern)
+            omitted = {index for index in branches if pattern['nodes'][index] not in required}
+            if branches and omitted == branches:
+                continue
+            
+            nodes = {node for index, node in enumerate(pattern['nodes']) if index not in omitted}
+            if not required <= nodes or nodes - required - {'n8n-nodes-base.set'}:
+                continue
+            
+            size = len(pattern['nodes']) - len(omitted)
+            if best is None or size < best[2]:
+                best = (name, omitted, size)
+        
+        return best[:2] if best else None
+    
+    @staticmethod
+    def _branch_nodes(pattern: Dict) -> Set[int]:
+        """Индексы nodes - получателей веток IF"""
+        return {
+            connection['to'] for connection in pattern.get('connections', [])
+            if pattern['nodes'][connection['from']] == 'n8n-nodes-base.if'
+        }
+    
+    @staticmethod
+    def _is_known_word(word: str) -> bool:
+        """Слово понятно шаблону (триггер, сервис, условие или общее слово)"""
+        if word.isdigit():
+            return False
+        prefixes = KNOWN_PREFIXES + CONDITION_PREFIXES
+        for node_prefixes in list(SERVICE_PREFIXES.values()) + list(TRIGGER_PREFIXES.values()):
+            prefixes += node_prefixes
+        return word.startswith(prefixes)
+    
+    def _missing_slots(self, pattern_name: str, omitted_nodes: Set[int], slots: Dict) -> List[str]:
+        """Слоты, для которых подставлены значения-заглушки"""
+        nodes = [
+            node for index, node in enumerate(self.knowledge_base.workflow_patterns[pattern_name]['nodes'])
+            if index not in omitted_nodes
+        ]
+        needed = {
+            'n8n-nodes-base.slack': 'channel',
+            'n8n-nodes-base.gmail': 'email',
+            'n8n-nodes-base.googleSheets': 'sheet',
+            'n8n-nodes-base.httpRequest': 'url',
+            'n8n-nodes-base.schedule': 'interval_minutes'
+        }
+        return [needed[node] for node in nodes if node in needed and needed[node] not in slots]
+    
+    def _node_parameters(self, node_type: str, summary: str, slots: Dict, description: str) -> Dict:
+        """Параметры node из слотов (поверх example_config базы знаний)"""
+        if node_type == 'n8n-nodes-base.webhook':
+            # Свой путь для каждого описания: workflow из шаблона не конфликтуют за один webhook,
+            # а повторная генерация того же описания дает тот же путь
+            digest = hashlib.sha1(description.strip().encode('utf-8')).hexdigest()[:12]
+            return {"path": f"webhook-{digest}"}
+        
+        if node_type == 'n8n-nodes-base.schedule':
+            return {"rule": "interval", "interval": slots.get('interval_minutes', 60)}
+        
+        if node_type == 'n8n-nodes-base.httpRequest':
+            return {"url": slots['url']} if 'url' in slots else {}
+        
+        if node_type == 'n8n-nodes-base.slack':
+            return {
+                "operation": "postMessage",
+                "channel": slots.get('channel', '#general'),
+                "text": f"{summary}: {{{{ JSON.stringify($json) }}}}"
+            }
+        
+        if node_type == 'n8n-nodes-base.gmail':
+            return {
+                "operation": "send",
+                "to": slots.get('email', 'your_email@example.com'),
+                "subject": summary,
+                "message": "{{ JSON.stringify($json) }}"
+            }
+        
+        if node_type == 'n8n-nodes-base.googleSheets':
+            return {
+                "operation": "append",
+                "sheetId": slots.get('sheet', 'your_sheet_id'),
+                "range": "A:Z"
+            }
+        
+        if node_type == 'n8n-nodes-base.if' and 'condition' in slots:
+            condition = slots['condition']
+            return {
+                "conditions": {
+                    "number": [{
+                        "value1": f"={{{{ $json[\"{condition['field']}\"] }}}}",
+                        "operation": condition['operation'],
+                        "value2": condition['value']
+                    }]
+                }
+            }
+        
+        return {}
+    
+    def _build_workflow(self, description: str, match: Dict) -> Dict:
+        """Сборка workflow: nodes через generate_node_config, connections по паттерну"""
+        pattern = self.knowledge_base.workflow_patterns[match['pattern']]
+        
+        omitted = set(match['omitted_nodes'])
+        
+        nodes = {}
+        used_names = set()
+        
+        for index, node_type in enumerate(pattern['nodes']):
+            if index in omitted:
+                continue
+            
+            node = self.knowledge_base.generate_node_config(
+                node_type, self._node_parameters(node_type, pattern['description'], match['slots'], description)
+            )
+            
+            name = node['name']
+            suffix = 2
+            while name in used_names:
+                name = f"{node['name']} {suffix}"
+                suffix += 1
+            used_names.add(name)
+            
+            position = len(nodes)
+            node.update({"id": str(position + 1), "name": name, "position": [100 + position * 200, 200]})
+            nodes[index] = node
+        
+        pattern_connections = [
+            connection for connection in pattern.get('connections', [])
+            if connection['from'] not in omitted and connection['to'] not in omitted
+        ]
+        
+        connections = {}
+        for connection in pattern_connections:
+            source = nodes[connection['from']]
+            target = nodes[connection['to']]
+            # Ветка fallback у IF - второй выход (false); если основная ветка исключена,
+            # оставшийся получатель подключается к выходу true
+            has_main_branch = any(
+                other['from'] == connection['from'] and other.get('output') != 'fallback'
+                for other in pattern_connections
+            )
+            output_index = 1 if connection.get('output') == 'fallback' and has_main_branch else 0
+            
+            outputs = connections.setdefault(source['name'], {"main": []})['main']
+            while len(outputs) <= output_index:
+                outputs.append([])
+            outputs[output_index].append({"node": target['name'], "type": "main", "index": 0})
+            
+            if output_index:
+                target['position'] = [target['position'][0] - 200, 350]
+        
+        return {
+            "name": description.strip()[:60] or pattern['description'],
+            "nodes": list(nodes.values()),
+            "connections": connections,
+            "active": False,
+            "settings": {},
+            "staticData": {}
+        }
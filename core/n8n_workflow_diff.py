@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+🔀 N8N Workflow Diff
+Структурное сравнение сохраненного и желаемого workflow (nodes по id или имени,
+connections по ребрам) и тело обновления только с изменяемыми полями
+"""
+
+import os
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_bulk_transfer import IMPORT_FIELDS
+
+# Поля node, которые назначает n8n или меняет редактор: не считаются изменением и сохраняются
+NODE_MANAGED_FIELDS = ('id', 'position', 'webhookId')
+
+# Значения по умолчанию, которые n8n дописывает при сохранении
+NODE_DEFAULTS = {"typeVersion": 1, "parameters": {}}
+
+def connection_edges(connections: Optional[Dict]) -> Set[Tuple]:
+    """Ребра connections: (источник, тип выхода, номер выхода, приемник, тип входа, номер входа)"""
+    edges = set()
+    for source, outputs in (connections or {}).items():
+        for output_type, output_list in (outputs or {}).items():
+            for output_index, targets in enumerate(output_list or []):
+                for target in targets or []:
+                    edges.add((
+                        source, output_type, output_index,
+                        target.get('node'), target.get('type', output_type), target.get('index', 0)
+                    ))
+    return edges
+
+def match_nodes(current_nodes: List[Dict], desired_nodes: List[Dict]) -> List[Tuple[Dict, Optional[Dict]]]:
+    """
+    Пары (желаемый node, сохраненный node или None)
+    
+    Сначала по id (переименованный node остается тем же), для nodes без id
+    (сгенерированные workflow) - по имени.
+    """
+    by_id = {node['id']: node for node in current_nodes if node.get('id')}
+    by_name = {node.get('name'): node for node in current_nodes}
+    matched = set()
+    pairs = []
+    
+    for node in desired_nodes:
+        current = by_id.get(node.get('id')) if node.get('id') else None
+        if current is None:
+            current = by_name.get(node.get('name'))
+        if current is not None and id(current) in matched:
+            current = None
+        if current is not None:
+            matched.add(id(current))
+        pairs.append((node, current))
+    
+    return pairs
+
+def node_changed(current: Dict, desired: Dict) -> bool:
+    """Отличается ли node: сравниваются только поля, заданные в желаемом node"""
+    for key, value in desired.items():
+        if key in NODE_MANAGED_FIELDS:
+            continue
+        if current.get(key, NODE_DEFAULTS.get(key)) != value:
+            return True
+    return False
+
+def _settings_changed(current: Optional[Dict], desired: Optional[Dict]) -> bool:
+    """Отличаются ли settings (только ключи желаемых settings)"""
+    current = current or {}
+    return any(current.get(key) != value for key, value in (desired or {}).items())
+
+def diff_workflows(current: Dict, desired: Dict) -> Dict:
+    """
+    Структурная разница между сохраненным в n8n и желаемым workflow
+    
+    Поля, отсутствующие в desired (в том числе поля nodes и ключи settings),
+    остаются как есть: учетные данные и позиции, заданные в редакторе, не теряются.
+    
+    Args:
+        current: Workflow из n8n (GET /workflows/{id} или зеркало)
+        desired: Желаемый workflow (например, заново сгенерированный)
+    
+    Returns:
+        Dict с изменениями name, settings, nodes (added/removed/changed),
+        connections (added/removed ребра), active (новое значение или None)
+        и флагами content_changed/changed
+    """
+    diff = {
+        "name": 'name' in desired and desired['name'] != current.get('name'),
+        "settings": 'settings' in desired and _settings_changed(current.get('settings'), desired['settings']),
+        "nodes": {"added": [], "removed": [], "changed": []},
+        "connections": {"added": [], "removed": []},
+        "active": None
+    }
+    
+    if 'nodes' in desired:
+        current_nodes = current.get('nodes') or []
+        pairs = match_nodes(current_nodes, desired['nodes'])
+        matched = {id(node) for _, node in pairs if node is not None}
+        
+        for node, current_node in pairs:
+            if current_node is None:
+                diff['nodes']['added'].append(node.get('name'))
+            elif node_changed(current_node, node):
+                diff['nodes']['changed'].append(node.get('name'))
+        
+        diff['nodes']['removed'] = [node.get('name') for node in current_nodes if id(node) not in matched]
+    
+    if 'connections' in desired:
+        current_edges = connection_edges(current.get('connections'))
+        desired_edges = connection_edges(desired['connections'])
+        diff['connections']['added'] = sorted(desired_edges - current_edges, key=str)
+        diff['connections']['removed'] = sorted(current_edges - desired_edges, key=str)
+    
+    if 'active' in desired and bool(desired['active']) != bool(current.get('active')):
+        diff['active'] = bool(desired['active'])
+    
+    diff['content_changed'] = bool(
+        diff['name'] or diff['settings']
+        or any(diff['nodes'].values()) or any(diff['connections'].values())
+    )
+    diff['changed'] = diff['content_changed'] or diff['active'] is not None
+    
+    return diff
+
+def workflow_update_body(current: Dict, desired: Dict) -> Dict:
+    """
+    Тело PUT /workflows/{id}: сохраненный workflow с наложенными изменениями
+    
+    n8n не поддерживает PATCH, поэтому отправляются все обязательные поля, но только
+    те, что принимает API: без active (меняется отдельным endpoint), дат и тегов.
+    staticData отправляется только если задан в desired - иначе состояние триггеров
+    не перезаписывается.
+    """
+    nodes = []
+    for node, current_node in match_nodes(current.get('nodes') or [], desired.get('nodes', current.get('nodes') or [])):
+        if current_node is None:
+            nodes.append(node)
+        else:
+            changes = {key: value for key, value in node.items() if key not in NODE_MANAGED_FIELDS}
+            nodes.append({**current_node, **changes})
+    
+    body = {
+        "name": desired.get('name', current.get('name')),
+        "nodes": nodes,
+        "connections": desired.get('connections', current.get('connections') or {}),
+        "settings": {**(current.get('settings') or {}), **(desired.get('settings') or {})}
+    }
+    if 'staticData' in desired:
+        body['staticData'] = desired['staticData']
+    
+    return {key: body[key] for key in IMPORT_FIELDS if key in body}
+
+def describe_diff(diff: Dict) -> str:
+    """Краткое описание изменений для сообщений"""
+    parts = []
+    if diff['name']:
+        parts.append("имя")
+    if diff['settings']:
+        parts.append("settings")
+    for key, label in (("added", "+"), ("removed", "-"), ("changed", "~")):
+        if diff['nodes'][key]:
+            parts.append(f"{label}{len(diff['nodes'][key])} nodes")
+    if any(diff['connections'].values()):
+        parts.append(f"connections +{len(diff['connections']['added'])}/-{len(diff['connections']['removed'])}")
+    if diff['active'] is not None:
+        parts.append("активация" if diff['active'] else "деактивация")
+    return ", ".join(parts) or "без изменений"
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+🪞 N8N Workflow Mirror
+Локальная копия списка workflow n8n (SQLite) с инкрементальным обновлением по updatedAt:
+списки, фильтры, сортировка и подсчеты выполняются без запросов к n8n
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_response_cache import DEFAULT_CACHE_DIR
+
+def canonical_workflow(workflow: Dict) -> Dict:
+    """
+    Содержимое workflow без полей, которые n8n назначает сам
+    (id, позиции, активность, даты, webhookId, settings по умолчанию)
+    """
+    nodes = []
+    for node in workflow.get('nodes') or []:
+        if not isinstance(node, dict):
+            continue
+        nodes.append({
+            "name": node.get('name'),
+            "type": node.get('type'),
+            "typeVersion": node.get('typeVersion', 1),
+            "parameters": node.get('parameters') or {}
+        })
+    
+    return {
+        "name": workflow.get('name'),
+        "nodes": sorted(nodes, key=lambda node: str(node['name'])),
+        "connections": workflow.get('connections') or {}
+    }
+
+def workflow_content_hash(workflow: Dict) -> str:
+    """Стабильный хэш содержимого workflow (одинаков для сгенерированного и сохраненного в n8n)"""
+    content = json.dumps(canonical_workflow(workflow), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+# Разрешенные колонки сортировки (имя параметра -> колонка)
+ORDER_COLUMNS = {
+    "updated_at": "updated_at",
+    "created_at": "created_at",
+    "name": "name COLLATE NOCASE",
+    "active": "active"
+}
+
+def mirror_db_name(base_url: str) -> str:
+    """Имя файла зеркала экземпляра n8n (у каждого base_url - своя база)"""
+    digest = hashlib.sha256(base_url.rstrip('/').lower().encode('utf-8')).hexdigest()[:12]
+    return f"workflow_mirror_{digest}.sqlite"
+
+class N8NWorkflowMirror:
+    """Зеркало workflow одного экземпляра n8n для быстрых локальных запросов"""
+    
+    def __init__(self, base_url: str = "http://localhost:5678", db_path: str = None):
+        """
+        Инициализация зеркала
+        
+        Args:
+            base_url: Адрес n8n, список которого хранит зеркало
+            db_path: Путь к файлу SQLite (по умолчанию .cache/workflow_mirror_<хэш base_url>.sqlite)
+        
+        Raises:
+            ValueError: если файл db_path уже хранит зеркало другого экземпляра n8n
+        """
+        self.base_url = base_url.rstrip('/')
+        self.db_path = db_path or os.path.join(DEFAULT_CACHE_DIR, mirror_db_name(self.base_url))
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS workflows (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                active INTEGER NOT NULL DEFAULT 0,
+                is_archived INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT,
+                updated_at TEXT,
+                node_count INTEGER NOT NULL DEFAULT 0,
+                node_types TEXT NOT NULL DEFAULT '',
+                tags TEXT NOT NULL DEFAULT '',
+                content_hash TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_workflows_updated_at ON workflows(updated_at);
+            CREATE INDEX IF NOT EXISTS idx_workflows_content_hash ON workflows(content_hash);
+            CREATE INDEX IF NOT EXISTS idx_workflows_active ON workflows(active);
+            CREATE INDEX IF NOT EXISTS idx_workflows_name ON workflows(name COLLATE NOCASE);
+            
+            CREATE TABLE IF NOT EXISTS workflow_nodes (
+                workflow_id TEXT NOT NULL,
+                node_type TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_workflow_nodes_workflow ON workflow_nodes(workflow_id);
+            CREATE INDEX IF NOT EXISTS idx_workflow_nodes_type ON workflow_nodes(node_type);
+            
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        
+        # Синхронизация и prune с другим экземпляром удалили бы его workflow из этой базы
+        stored_base_url = self.get_meta('base_url')
+        if stored_base_url is None:
+            self._set_meta('base_url', self.base_url)
+        elif stored_base_url.lower() != self.base_url.lower():
+            self._conn.close()
+            raise ValueError(f"Зеркало {self.db_path} принадлежит другому n8n: {stored_base_url}")
+        self._conn.commit()
+    
+    def sync(self, workflows: Iterable[Dict], source: str = "unknown", prune: bool = True) -> Dict:
+        """
+        Инкрементальная синхронизация по полному списку workflow
+        
+        Перезаписываются только workflow с изменившимся updatedAt (без updatedAt -
+        с изменившимся хэшем содержимого), остальные пропускаются без разбора.
+        
+        Args:
+            workflows: Поток workflow (например, client.iter_workflows())
+            source: Откуда получен список (для метаданных)
+            prune: Удалять workflow, которых больше нет в n8n
+        
+        Returns:
+            Dict со статистикой синхронизации
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        
+        with self._lock:
+            existing = {
+                workflow_id: (updated_at, content_hash)
+                for workflow_id, updated_at, content_hash in self._conn.execute(
+                    "SELECT id, updated_at, content_hash FROM workflows"
+                )
+            }
+        
+        seen = set()
+        
+        for workflow in workflows:
+            workflow_id = str(workflow.get('id', ''))
+            if not workflow_id or workflow_id in seen:
+                continue
+            seen.add(workflow_id)
+            
+            previous = existing.get(workflow_id)
+            updated_at = workflow.get('updatedAt')
+            
+            if previous is not None and updated_at and previous[0] == updated_at:
+                stats["unchanged"] += 1
+                continue
+            
+            content_hash = workflow_content_hash(workflow)
+            if previous is not None and not updated_at and previous[1] == content_hash:
+                stats["unchanged"] += 1
+                continue
+            
+            with self._lock:
+                self._upsert(workflow_id, workflow, content_hash)
+            stats["added" if previous is None else "updated"] += 1
+        
+        with self._lock:
+            if prune:
+                for workflow_id in existing.keys() - seen:
+                    self._delete(workflow_id)
+                    stats["removed"] += 1
+            
+            self._set_meta('last_sync', datetime.now().isoformat())
+            self._set_meta('last_sync_time', str(time.time()))
+            self._set_meta('source', source)
+            self._conn.commit()
+        
+        return {
+            "status": "success",
+            "total": len(seen),
+            **stats
+        }
+    
+    def sync_from_client(self, client, max_age: Optional[float] = None, prune: bool = True) -> Dict:
+        """
+        Синхронизация с n8n через клиент с iter_workflows (N8NProductionClient, N8NAPIClient)
+        
+        Args:
+            client: Клиент n8n API
+            max_age: Не обращаться к n8n, если последняя синхронизация была не раньше max_age секунд назад
+            prune: Удалять workflow, которых больше нет в n8n
+        """
+        if client.base_url.rstrip('/').lower() != self.base_url.lower():
+            return {
+                "status": "error",
+                "message": f"Клиент подключен к {client.base_url}, а зеркало хранит {self.base_url}"
+            }
+        
+        if max_age is not None and self.age() is not None and self.age() < max_age:
+            return {
+                "status": "success",
+                "message": "Зеркало актуально",
+                "total": self.count(),
+                "added": 0, "updated": 0, "unchanged": self.count(), "removed": 0
+            }
+        
+        try:
+            # pinData в зеркале не нужен - не скачиваем его
+            workflows = client.iter_workflows(limit=250, filters={'excludePinnedData': True})
+            return self.sync(workflows, source=f"n8n:{client.base_url}", prune=prune)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Ошибка синхронизации: {str(e)}"
+            }
+    
+    def upsert(self, workflow: Dict) -> None:
+        """Запись одного workflow (после создания или изменения через API)"""
+        with self._lock:
+            self._upsert(str(workflow['id']), workflow, workflow_content_hash(workflow))
+            self._conn.commit()
+    
+    def remove(self, workflow_id: str) -> None:
+        """Удаление workflow из зеркала"""
+        with self._lock:
+            self._delete(str(workflow_id))
+            self._conn.commit()
+    
+    def _upsert(self, workflow_id: str, workflow: Dict, content_hash: str) -> None:
+        """Запись workflow и его node types (вызывается под блокировкой)"""
+        nodes = [node for node in workflow.get('nodes') or [] if isinstance(node, dict)]
+        node_types = sorted({node.get('type', '') for node in nodes if node.get('type')})
+        tags = [tag.get('name') if isinstance(tag, dict) else str(tag) for tag in workflow.get('tags') or []]
+        
+        self._conn.execute(
+            "INSERT OR REPLACE INTO workflows (id, name, active, is_archived, created_at, updated_at, "
+            "node_count, node_types, tags, content_hash, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                workflow_id,
+                workflow.get('name') or '',
+                int(bool(workflow.get('active'))),
+                int(bool(workflow.get('isArchived'))),
+                workflow.get('createdAt'),
+                workflow.get('updatedAt'),
+                len(nodes),
+                ",".join(node_types),
+                ",".join(tags),
+                content_hash,
+                json.dumps(workflow, ensure_ascii=False)
+            )
+        )
+        
+        self._conn.execute("DELETE FROM workflow_nodes WHERE workflow_id = ?", (workflow_id,))
+        self._conn.executemany(
+            "INSERT INTO workflow_nodes (workflow_id, node_type) VALUES (?, ?)",
+            [(workflow_id, node_type) for node_type in node_types]
+        )
+    
+    def _delete(self, workflow_id: str) -> None:
+        """Удаление workflow (вызывается под блокировкой)"""
+        self._conn.execute("DELETE FROM workflows WHERE id = ?", (workflow_id,))
+        self._conn.execute("DELETE FROM workflow_nodes WHERE workflow_id = ?", (workflow_id,))
+    
+    @staticmethod
+    def _where(active: Optional[bool] = None, archived: Optional[bool] = None,
+               search: Optional[str] = None, node_type: Optional[str] = None,
+               tag: Optional[str] = None) -> tuple:
+        """Условие WHERE и параметры для фильтров списка"""
+        conditions, params = [], []
+        
+        if active is not None:
+            conditions.append("active = ?")
+            params.append(int(active))
+        if archived is not None:
+            conditions.append("is_archived = ?")
+            params.append(int(archived))
+        if search:
+            conditions.append("lower(name) LIKE ?")
+            params.append(f"%{search.lower()}%")
+        if node_type:
+            conditions.append("id IN (SELECT workflow_id FROM workflow_nodes WHERE node_type = ?)")
+            params.append(node_type)
+        if tag:
+            conditions.append("(',' || tags || ',') LIKE ?")
+            params.append(f"%,{tag},%")
+        
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+    
+    def list(self, active: Optional[bool] = None, archived: Optional[bool] = None,
+             search: Optional[str] = None, node_type: Optional[str] = None, tag: Optional[str] = None,
+             order_by: str = "updated_at", descending: bool = True,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """
+        Список workflow из зеркала (без nodes - полное содержимое через get)
+        
+        Args:
+            active: Только активные (True) / неактивные (False)
+            archived: Только архивные (True) / без архивных (False)
+            search: Подстрока имени
+            node_type: Только workflow с этим node type
+            tag: Только workflow с этим тегом
+            order_by: updated_at, created_at, name или active
+            descending: Обратный порядок сортировки
+            limit: Максимум записей
+            offset: Пропустить записей
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Неизвестная сортировка: {order_by}")
+        
+        where, params = self._where(active, archived, search, node_type, tag)
+        query = (
+            "SELECT id, name, active, is_archived, created_at, updated_at, node_count, node_types, tags, content_hash "
+            f"FROM workflows{where} ORDER BY {ORDER_COLUMNS[order_by]} {'DESC' if descending else 'ASC'}"
+        )
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        
+        return [
+            {
+                "id": workflow_id,
+                "name": name,
+                "active": bool(active_flag),
+                "isArchived": bool(is_archived),
+                "createdAt": created_at,
+                "updatedAt": updated_at,
+                "nodeCount": node_count,
+                "nodeTypes": node_types.split(',') if node_types else [],
+                "tags": tags.split(',') if tags else [],
+                "contentHash": content_hash
+            }
+            for workflow_id, name, active_flag, is_archived, created_at, updated_at,
+            node_count, node_types, tags, content_hash in rows
+        ]
+    
+    def count(self, active: Optional[bool] = None, archived: Optional[bool] = None,
+              search: Optional[str] = None, node_type: Optional[str] = None, tag: Optional[str] = None) -> int:
+        """Количество workflow по тем же фильтрам, что и list"""
+        where, params = self._where(active, archived, search, node_type, tag)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM workflows{where}", params).fetchone()[0]
+    
+    def summary(self) -> Dict:
+        """Итоги в формате summarize_workflows: всего, активных, архивных, по тегам"""
+        with self._lock:
+            total, active, archived = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(active), 0), COALESCE(SUM(is_archived), 0) FROM workflows"
+            ).fetchone()
+            tag_rows = self._conn.execute("SELECT tags FROM workflows WHERE tags != ''").fetchall()
+        
+        tags = {}
+        for (tag_list,) in tag_rows:
+            for tag in tag_list.split(','):
+                tags[tag] = tags.get(tag, 0) + 1
+        
+        return {
+            "status": "success",
+            "total": total,
+            "active": active,
+            "inactive": total - active,
+            "archived": archived,
+            "tags": tags
+        }
+    
+    def get(self, workflow_id: str) -> Optional[Dict]:
+        """Полный workflow из зеркала"""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM workflows WHERE id = ?", (str(workflow_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def find_by_hash(self, content_hash: str) -> Optional[Dict]:
+        """Неархивный workflow с таким же хэшем содержимого (id, name, active) или None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, name, active FROM workflows WHERE content_hash = ? AND is_archived = 0 LIMIT 1",
+                (content_hash,)
+            ).fetchone()
+        return {"id": row[0], "name": row[1], "active": bool(row[2])} if row else None
+    
+    def age(self) -> Optional[float]:
+        """Секунд с последней синхронизации (None - зеркало еще не синхронизировалось)"""
+        last_sync_time = self.get_meta('last_sync_time')
+        return time.time() - float(last_sync_time) if last_sync_time else None
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        """Чтение метаданных зеркала"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _set_meta(self, key: str, value: Optional[str]) -> None:
+        """Запись метаданных (вызывается под блокировкой)"""
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def stats(self) -> Dict:
+        """Статистика зеркала"""
+        return {
+            "workflows": self.count(),
+            "last_sync": self.get_meta('last_sync'),
+            "source": self.get_meta('source'),
+            "base_url": self.base_url,
+            "path": self.db_path
+        }
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+🩹 N8N Workflow Repair
+Точечное исправление ошибок сгенерированного workflow: в модель отправляется
+только сломанный фрагмент (node, connections или строки JSON) с ошибками валидатора
+"""
+
+import os
+import sys
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from n8n_json_extractor import extract_json_object, scan_candidates, repair_json, JSONExtractionError
+from n8n_prompt_builder import estimate_tokens
+
+REPAIR_INSTRUCTIONS = (
+    "Ты исправляешь фрагмент n8n workflow. Верни ТОЛЬКО исправленный фрагмент "
+    "в блоке ```json``` без пояснений."
+)
+
+class N8NWorkflowRepairer:
+    """Цикл точечных исправлений с ограничением количества попыток"""
+    
+    def __init__(self, client, model: str, is_known_node_type: Callable[[str], bool],
+                 suggest_node_types: Callable[[Dict], List[str]], max_attempts: int = 3,
+                 max_tokens: int = 800, context_lines: int = 3, request_scheduler=None):
+        """
+        Инициализация
+        
+        Args:
+            client: Клиент Anthropic API
+            model: Модель для исправлений
+            is_known_node_type: Проверка существования node type
+            suggest_node_types: Подходящие существующие node types для node с ошибкой
+            max_attempts: Максимум обращений к модели на один workflow
+            max_tokens: Лимит токенов ответа одного исправления
+            context_lines: Сколько строк вокруг ошибки разбора отправлять в модель
+            request_scheduler: Планировщик лимитов и повторов (None - прямые вызовы)
+        """
+        self.client = client
+        self.model = model
+        self.is_known_node_type = is_known_node_type
+        self.suggest_node_types = suggest_node_types
+        self.max_attempts = max_attempts
+        self.max_tokens = max_tokens
+        self.context_lines = context_lines
+        self.request_scheduler = request_scheduler
+    
+    def parse(self, response_text: str, log: List[Dict]) -> Dict:
+        """
+        Извлечение JSON workflow с исправлением ошибок разбора через модель
+        
+        Args:
+            response_text: Ответ модели
+            log: Журнал исправлений (дополняется)
+        
+        Returns:
+            Dict как у extract_json_object
+        
+        Raises:
+            JSONExtractionError: если JSON не удалось получить за отведенные попытки
+        """
+        try:
+            return extract_json_object(response_text, required_keys=('nodes',))
+        except JSONExtractionError:
+            candidates = scan_candidates(response_text)
+            if not candidates:
+                raise
+        
+        # Чиним самый большой кандидат: локальное восстановление, затем фрагменты через модель
+        start, end, closers = max(candidates, key=lambda c: c[1] - c[0])
+        text, repairs = repair_json(response_text[start:end], closers)
+        
+        while self._attempts_left(log):
+            try:
+                value = json.loads(text)
+            except json.JSONDecodeError as e:
+                text = self._repair_text_fragment(text, e, log)
+                if text is None:
+                    break
+                continue
+            
+            if not isinstance(value, dict) or 'nodes' not in value:
+                break
+            
+            byte_start = len(response_text[:start].encode('utf-8'))
+            return {
+                "value": value,
+                "start": start,
+                "end": end,
+                "byte_start": byte_start,
+                "byte_end": byte_start + len(response_text[start:end].encode('utf-8')),
+                "repairs": repairs + ["model_patch"]
+            }
+        
+        raise JSONExtractionError("Не удалось исправить JSON workflow")
+    
+    def find_errors(self, workflow: Dict) -> List[Dict]:
+        """
+        Ошибки workflow, которые валидатор иначе исправил бы с потерей смысла
+        
+        Returns:
+            Список {"kind": "node"|"connections", "index", "errors"}
+        """
+        problems = []
+        nodes = workflow.get('nodes') if isinstance(workflow.get('nodes'), list) else []
+        
+        for index, node in enumerate(nodes):
+            if not isinstance(node, dict):
+                problems.append({"kind": "node", "index": index, "errors": ["node должен быть объектом"]})
+                continue
+            
+            node_type = node.get('type')
+            if not node_type:
+                problems.append({"kind": "node", "index": index, "errors": ["не указан type"]})
+            elif not self.is_known_node_type(node_type):
+                problems.append({"kind": "node", "index": index, "errors": [f"неизвестный node type {node_type}"]})
+        
+        node_names = {node.get('name') for node in nodes if isinstance(node, dict)}
+        connection_errors = []
+        connections = workflow.get('connections')
+        
+        if isinstance(connections, dict):
+            for source, outputs in connections.items():
+                if source not in node_names:
+                    connection_errors.append(f"источник {source} не является именем node")
+                for target in self._connection_targets(outputs):
+                    if target not in node_names:
+                        connection_errors.append(f"{source} ссылается на несуществующий node {target}")
+        elif connections is not None:
+            connection_errors.append("connections должен быть объектом")
+        
+        if connection_errors:
+            problems.append({"kind": "connections", "index": None, "errors": connection_errors})
+        
+        return problems
+    
+    def repair_workflow(self, workflow: Dict, log: List[Dict]) -> Dict:
+        """
+        Точечное исправление nodes и connections с ошибками
+        
+        Каждое исправление - отдельный короткий запрос с одним фрагментом.
+        Фрагменты, которые не удалось исправить, остаются как есть
+        (дальше их обработает обычная валидация).
+        """
+        for problem in self.find_errors(workflow):
+            if not self._attempts_left(log):
+                break
+            
+            if problem['kind'] == 'node':
+                self._repair_node(workflow, problem, log)
+            else:
+                self._repair_connections(workflow, problem, log)
+        
+        return workflow
+    
+    def _repair_node(self, workflow: Dict, problem: Dict, log: List[Dict]) -> None:
+        """Исправление одного node и слияние патча с workflow"""
+        index = problem['index']
+        node = workflow['nodes'][index]
+        original = node if isinstance(node, dict) else {}
+        allowed = self.suggest_node_types(original)
+        
+        prompt = (
+            f"NODE:\n```json\n{json.dumps(node, ensure_ascii=False)}\n```\n"
+            f"ОШИБКИ: {'; '.join(problem['errors'])}\n"
+            f"ДОПУСТИМЫЕ ТИПЫ: {', '.join(allowed)}\n"
+            "Верни исправленный node целиком (тот же name, если возможно)."
+        )
+        
+        patch = self._request_patch(prompt, "node", original.get('name', str(index)), log, required_keys=('type',))
+        if patch is None or not self.is_known_node_type(patch.get('type', '')):
+            return
+        
+        merged = dict(original)
+        merged.update(patch)
+        workflow['nodes'][index] = merged
+        
+        old_name, new_name = original.get('name'), merged.get('name')
+        if old_name and new_name and old_name != new_name:
+            self._rename_in_connections(workflow, old_name, new_name)
+    
+    def _repair_connections(self, workflow: Dict, problem: Dict, log: List[Dict]) -> None:
+        """Исправление connections по списку имен nodes"""
+        node_names = [node.get('name') for node in workflow.get('nodes', []) if isinstance(node, dict)]
+        
+        prompt = (
+            f"CONNECTIONS:\n```json\n{json.dumps(workflow.get('connections'), ensure_ascii=False)}\n```\n"
+            f"ОШИБКИ: {'; '.join(problem['errors'])}\n"
+            f"ИМЕНА NODES: {', '.join(node_names)}\n"
+            "Верни исправленный объект connections целиком (ключи и node - имена nodes)."
+        )
+        
+        patch = self._request_patch(prompt, "connections", "connections", log, required_keys=())
+        if patch is not None:
+            workflow['connections'] = patch
+    
+    def _repair_text_fragment(self, text: str, error: json.JSONDecodeError, log: List[Dict]) -> Optional[str]:
+        """Исправление строк JSON вокруг ошибки разбора (возвращает текст с патчем)"""
+        lines = text.splitlines(keepends=True)
+        first = max(error.lineno - 1 - self.context_lines, 0)
+        last = min(error.lineno + self.context_lines, len(lines))
+        
+        start = sum(len(line) for line in lines[:first])
+        end = start + sum(len(line) for line in lines[first:last])
+        
+        # Длинные строки (JSON в одну строку) ограничиваем окном вокруг позиции ошибки
+        window = 80 * (2 * self.context_lines + 1)
+        if end - start > 2 * window:
+            start, end = max(error.pos - window, 0), min(error.pos + window, len(text))
+        
+        fragment = text[start:end]
+        prompt = (
+            f"ФРАГМЕНТ JSON (часть большого документа):\n```\n{fragment}\n```\n"
+            f"ОШИБКА РАЗБОРА: {error.msg} (позиция {error.pos - start} во фрагменте)\n"
+            "Верни исправленный фрагмент ровно этого же участка: без добавления или удаления "
+            "окружающего текста, в блоке ```json```."
+        )
+        
+        patch_text = self._request_text(prompt, "json", f"{start}:{end}", log)
+        if patch_text is None:
+            return None
+        
+        if fragment.endswith('\n') and not patch_text.endswith('\n'):
+            patch_text += '\n'
+        
+        return text[:start] + patch_text + text[end:]
+    
+    def _request_patch(self, prompt: str, kind: str, target: str, log: List[Dict],
+                       required_keys: Tuple[str, ...]) -> Optional[Dict]:
+        """Запрос исправленного JSON объекта"""
+        patch_text = self._request_text(prompt, kind, target, log)
+        if patch_text is None:
+            return None
+        
+        try:
+            patch = extract_json_object(patch_text, required_keys=required_keys)['value']
+        except JSONExtractionError:
+            log[-1]['status'] = 'invalid_patch'
+            return None
+        
+        if required_keys and not all(key in patch for key in required_keys):
+            log[-1]['status'] = 'invalid_patch'
+            return None
+        
+        return patch
+    
+    def _request_text(self, prompt: str, kind: str, target: str, log: List[Dict]) -> Optional[str]:
+        """Короткий запрос к модели; каждый вызов записывается в журнал"""
+        entry = {"kind": kind, "target": target, "status": "success"}
+        log.append(entry)
+        
+        request = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "system": REPAIR_INSTRUCTIONS,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        
+        try:
+            if self.request_scheduler is not None:
+                response = self.request_scheduler.call(
+                    self.client.messages.create, estimated_tokens=estimate_tokens(prompt) + self.max_tokens, **request
+                )
+            else:
+                response = self.client.messages.create(**request)
+        except Exception as e:
+            entry['status'] = 'error'
+            entry['message'] = str(e)
+            return None
+        
+        usage = getattr(response, 'usage', None)
+        entry['input_tokens'] = getattr(usage, 'input_tokens', None)
+        entry['output_tokens'] = getattr(usage, 'output_tokens', None)
+        
+        return self._strip_fence(response.content[0].text)
+    
+    def _attempts_left(self, log: List[Dict]) -> bool:
+        """Остались ли попытки обращения к модели"""
+        return len(log) < self.max_attempts
+    
+    @staticmethod
+    def _strip_fence(text: str) -> str:
+        """Содержимое блока ``` (или весь текст, если блока нет)"""
+        fence_start = text.find('```')
+        if fence_start == -1:
+            return text.strip()
+        
+        content_start = text.find('\n', fence_start)
+        fence_end = text.find('```', content_start + 1) if content_start != -1 else -1
+        if content_start == -1 or fence_end == -1:
+            return text[fence_start + 3:].strip()
+        
+        return text[content_start + 1:fence_end].rstrip('\n')
+    
+    @staticmethod
+    def _connection_targets(outputs: Any) -> List[str]:
+        """Имена целевых nodes из описания выходов node"""
+        targets = []
+        if not isinstance(outputs, dict):
+            return targets
+        
+        for branches in outputs.values():
+            for branch in branches if isinstance(branches, list) else []:
+                for connection in branch if isinstance(branch, list) else []:
+                    if isinstance(connection, dict) and 'node' in connection:
+                        targets.append(connection['node'])
+        
+        return targets
+    
+    @staticmethod
+    def _rename_in_connections(workflow: Dict, old_name: str, new_name: str) -> None:
+        """Переименование node в connections после патча"""
+        connections = workflow.get('connections')
+        if not isinstance(connections, dict):
+            return
+        
+        if old_name in connections:
+            connections[new_name] = connections.pop(old_name)
+        
+        for outputs in connections.values():
+            for branches in (outputs.values() if isinstance(outputs, dict) else []):
+                for branch in branches if isinstance(branches, list) else []:
+                    for connection in branch if isinstance(branch, list) else []:
+                        if isinstance(connection, dict) and connection.get('node') == old_name:
+                            connection['node'] = new_name
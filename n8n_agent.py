@@ -6,6 +6,7 @@
 
 import sys
 import os
+import json
 import argparse
 from datetime import datetime
 
@@ -13,6 +14,10 @@ from datetime import datetime
 sys.path.append(os.path.join(os.path.dirname(__file__), 'core'))
 
 from core.n8n_main_service import N8NMainService
+from core.n8n_node_catalog import N8NNodeCatalog
+from core.n8n_enhanced_api_client import N8NAPIClient
+from core.n8n_production_client import N8NProductionClient
+from core.n8n_workflow_mirror import N8NWorkflowMirror
 
 class N8NAgentCLI:
     """CLI интерфейс для N8N-Agent"""
@@ -21,7 +26,7 @@ class N8NAgentCLI:
         self.service = None
     
     def create_workflow(self, description: str, complexity: str = "Средняя", 
-                       activate: bool = False, use_mock: bool = None) -> None:
+                       activate: bool = False, use_mock: bool = None, stream: bool = False) -> None:
         """Создание workflow через CLI"""
         
         print("🚀 N8N-AGENT v1.0 - AI WORKFLOW CREATOR")
@@ -47,11 +52,153 @@ class N8NAgentCLI:
         print(f"🧠 Режим: {'Mock Claude' if use_mock else 'Real Claude'}")
         
         # Создаем workflow
-        result = self.service.create_workflow_from_description(description, params)
+        result = self.service.create_workflow_from_description(description, params, stream=stream)
         
         # Выводим результат
         self._display_result(result)
     
+    def create_workflows_batch(self, batch_file: str, complexity: str = "Средняя",
+                               activate: bool = False, use_mock: bool = None,
+                               concurrency: int = 5) -> None:
+        """Пакетное создание workflow из файла (по описанию на строку или JSONL)"""
+        
+        print("🚀 N8N-AGENT v1.0 - ПАКЕТНОЕ СОЗДАНИЕ WORKFLOW")
+        print("=" * 60)
+        
+        if use_mock is None:
+            claude_api_key = os.getenv('CLAUDE_API_KEY')
+            use_mock = not claude_api_key or claude_api_key == 'your_claude_api_key_here'
+        
+        descriptions = []
+        with open(batch_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                descriptions.append(json.loads(line) if line.startswith('{') else line)
+        
+        print(f"\n📄 Файл: {batch_file}")
+        print(f"📋 Описаний: {len(descriptions)}")
+        print(f"⚡ Параллельность: {concurrency}")
+        
+        self.service = N8NMainService(use_mock_claude=use_mock)
+        
+        started = datetime.now()
+        results = self.service.run_workflows_batch(
+            descriptions,
+            params={"complexity": complexity, "auto_activate": activate},
+            max_concurrency=concurrency
+        )
+        elapsed = (datetime.now() - started).total_seconds()
+        
+        succeeded = [r for r in results if r['status'] == 'success']
+        duplicates = [r for r in succeeded if r.get('duplicate')]
+        
+        print(f"\n📊 РЕЗУЛЬТАТ ПАКЕТА:")
+        print("=" * 40)
+        print(f"✅ Создано: {len(succeeded) - len(duplicates)}/{len(results)}")
+        if duplicates:
+            print(f"♻️ Уже существовали в n8n (не созданы повторно): {len(duplicates)}")
+        print(f"⏱️ Время: {elapsed:.1f} сек")
+        
+        for result in results:
+            if result['status'] != 'success':
+                print(f"❌ #{result['index'] + 1} ({result.get('stage', 'unknown')}): {result['message']}")
+    
+    def sync_node_catalog(self, dump_file: str = None) -> None:
+        """Синхронизация локального каталога node types с n8n или дампом"""
+        
+        print("🗂️ N8N-AGENT v1.0 - СИНХРОНИЗАЦИЯ КАТАЛОГА NODES")
+        print("=" * 60)
+        
+        catalog = N8NNodeCatalog()
+        
+        if dump_file:
+            print(f"\n📄 Источник: {dump_file}")
+            result = catalog.sync_from_file(dump_file)
+        else:
+            client = N8NAPIClient()
+            print(f"\n🔗 Источник: {client.base_url}")
+            
+            email = os.getenv('N8N_AUTH_USER')
+            password = os.getenv('N8N_AUTH_PASSWORD')
+            if email and password:
+                client.authenticate_with_email(email, password)
+            
+            result = catalog.sync_from_client(client)
+        
+        if result['status'] != 'success':
+            print(f"❌ ОШИБКА: {result['message']}")
+            return
+        
+        if result.get('message'):
+            print(f"ℹ️ {result['message']}")
+        
+        print(f"✅ Node types: {result['total']}")
+        print(f"➕ Добавлено: {result['added']}")
+        print(f"🔄 Обновлено: {result['updated']}")
+        print(f"⏸️ Без изменений: {result['unchanged']}")
+        print(f"➖ Удалено: {result['removed']}")
+        print(f"💾 Каталог: {catalog.db_path}")
+    
+    def list_workflows(self, search: str = None, active_only: bool = False,
+                       node_type: str = None, refresh: bool = True) -> None:
+        """Список workflow из локального зеркала (с инкрементальным обновлением из n8n)"""
+        
+        client = N8NProductionClient(os.getenv('N8N_API_KEY') or "your_n8n_api_key_here")
+        mirror = N8NWorkflowMirror(client.base_url)
+        
+        if refresh:
+            sync_result = mirror.sync_from_client(client)
+            if sync_result['status'] == 'success':
+                print(f"🔄 Зеркало обновлено: +{sync_result['added']} ~{sync_result['updated']} "
+                      f"-{sync_result['removed']} (без изменений: {sync_result['unchanged']})")
+            else:
+                print(f"⚠️ {sync_result['message']} - показан сохраненный список "
+                      f"(синхронизация: {mirror.get_meta('last_sync') or 'никогда'})")
+        
+        workflows = mirror.list(
+            active=True if active_only else None, search=search, node_type=node_type, order_by='updated_at'
+        )
+        
+        print(f"\n📋 WORKFLOW ({len(workflows)} из {mirror.count()})")
+        print("=" * 60)
+        
+        for workflow in workflows:
+            status = "🟢" if workflow['active'] else "⚪"
+            updated = (workflow['updatedAt'] or '')[:16].replace('T', ' ')
+            print(f"{status} {workflow['id']:>18}  {workflow['name'][:40]:<40}  "
+                  f"{workflow['nodeCount']:>3} nodes  {updated}")
+    
+    def transfer_workflows(self, import_path: str = None, export_path: str = None,
+                           concurrency: int = 5, checkpoint: str = None) -> None:
+        """Пакетный импорт/экспорт workflow между n8n и JSONL файлом или каталогом"""
+        
+        client = N8NProductionClient(os.getenv('N8N_API_KEY') or "your_n8n_api_key_here")
+        processed = 0
+        
+        def show_progress(key, _):
+            nonlocal processed
+            processed += 1
+            if processed % 100 == 0:
+                print(f"   ... {processed}")
+        
+        if import_path:
+            print(f"📥 Импорт workflow из {import_path} (параллельно: {concurrency})")
+            result = client.bulk_create(import_path, checkpoint_path=checkpoint,
+                                        max_concurrency=concurrency, on_result=show_progress)
+        else:
+            print(f"📤 Экспорт workflow в {export_path}")
+            result = client.bulk_export(export_path, checkpoint_path=checkpoint, on_result=show_progress)
+        
+        print(f"\n{'✅' if result['status'] == 'success' else '⚠️'} {result['message']}")
+        print(f"⏱️ {result['seconds']} сек, {result['workflows_per_second']} workflow/сек")
+        
+        for failure in result['failed'][:10]:
+            print(f"❌ [{failure['stage']}] {failure['key'] or ''} {failure['message']}")
+        if result['failed']:
+            print("🔁 Повторный запуск продолжит с необработанных элементов")
+    
     def _display_result(self, result: dict) -> None:
         """Отображение результата создания workflow"""
         
@@ -61,7 +208,10 @@ class N8NAgentCLI:
         if result['status'] == 'success':
             workflow = result['workflow']
             
-            print(f"✅ УСПЕХ! Workflow создан")
+            if result.get('duplicate'):
+                print(f"♻️ Workflow с таким содержимым уже существует - дубликат не создан")
+            else:
+                print(f"✅ УСПЕХ! Workflow создан")
             print(f"📋 Название: {workflow['name']}")
             print(f"🆔 ID: {workflow['id']}")
             print(f"🔗 URL: {workflow['url']}")
@@ -132,9 +282,28 @@ def main():
   # Создать со сложностью и активацией
   python3 n8n_agent.py "Каждый час синхронизировать данные" --complexity Сложная --activate
   
+  # Потоковая генерация с выводом nodes по мере ответа
+  python3 n8n_agent.py "При получении webhook отправить в Slack" --stream
+  
   # Показать примеры
   python3 n8n_agent.py --examples
   
+  # Синхронизировать каталог node types с n8n (или из дампа)
+  python3 n8n_agent.py --sync-nodes
+  python3 n8n_agent.py --sync-nodes --from-file node-types.json
+  
+  # Список workflow из локального зеркала (обновляется по updatedAt)
+  python3 n8n_agent.py --list
+  python3 n8n_agent.py --list --search slack --active-only
+  python3 n8n_agent.py --list --no-refresh
+  
+  # Пакетное создание (по описанию на строку или JSONL)
+  python3 n8n_agent.py --batch descriptions.txt --concurrency 10
+  
+  # Экспорт всех workflow и импорт в другой экземпляр n8n (с продолжением после сбоя)
+  python3 n8n_agent.py --export backup.jsonl
+  python3 n8n_agent.py --import backup.jsonl --concurrency 10
+  
   # Использовать реальный Claude (если есть API ключ)
   export CLAUDE_API_KEY=your_api_key
   python3 n8n_agent.py "Обработать заказы и отправить в CRM"
@@ -166,12 +335,93 @@ def main():
         help='Принудительно использовать Mock Claude (без API)'
     )
     
+    parser.add_argument(
+        '--stream', '-s',
+        action='store_true',
+        help='Потоковая генерация: показывать nodes по мере ответа Claude'
+    )
+    
     parser.add_argument(
         '--examples', '-e',
         action='store_true',
         help='Показать примеры описаний'
     )
     
+    parser.add_argument(
+        '--sync-nodes',
+        action='store_true',
+        help='Синхронизировать локальный каталог node types с n8n'
+    )
+    
+    parser.add_argument(
+        '--from-file',
+        metavar='FILE',
+        help='Дамп /rest/node-types для --sync-nodes вместо запроса к n8n'
+    )
+    
+    parser.add_argument(
+        '--batch', '-b',
+        metavar='FILE',
+        help='Пакетное создание workflow из файла (описание на строку или JSONL)'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=5,
+        help='Параллельность пакетного создания (по умолчанию: 5)'
+    )
+    
+    parser.add_argument(
+        '--list', '-l',
+        action='store_true',
+        help='Показать workflow из локального зеркала n8n'
+    )
+    
+    parser.add_argument(
+        '--search',
+        metavar='TEXT',
+        help='Фильтр --list по имени workflow'
+    )
+    
+    parser.add_argument(
+        '--node-type',
+        metavar='TYPE',
+        help='Фильтр --list по node type (например, n8n-nodes-base.slack)'
+    )
+    
+    parser.add_argument(
+        '--active-only',
+        action='store_true',
+        help='Только активные workflow в --list'
+    )
+    
+    parser.add_argument(
+        '--no-refresh',
+        action='store_true',
+        help='Не обновлять зеркало из n8n перед --list'
+    )
+    
+    parser.add_argument(
+        '--import',
+        dest='import_path',
+        metavar='PATH',
+        help='Пакетный импорт готовых workflow из JSONL файла или каталога *.json'
+    )
+    
+    parser.add_argument(
+        '--export',
+        dest='export_path',
+        metavar='PATH',
+        help='Пакетный экспорт workflow в JSONL файл (*.jsonl) или каталог'
+    )
+    
+    parser.add_argument(
+        '--checkpoint',
+        metavar='FILE',
+        help='Файл контрольной точки для --import/--export (по умолчанию: PATH.import.checkpoint или PATH.export.checkpoint)'
+    )
+    
     args = parser.parse_args()
     
     cli = N8NAgentCLI()
@@ -180,6 +430,38 @@ def main():
         cli.list_examples()
         return
     
+    if args.sync_nodes:
+        cli.sync_node_catalog(dump_file=args.from_file)
+        return
+    
+    if args.list:
+        cli.list_workflows(
+            search=args.search,
+            active_only=args.active_only,
+            node_type=args.node_type,
+            refresh=not args.no_refresh
+        )
+        return
+    
+    if args.import_path or args.export_path:
+        cli.transfer_workflows(
+            import_path=args.import_path,
+            export_path=args.export_path,
+            concurrency=args.concurrency,
+            checkpoint=args.checkpoint
+        )
+        return
+    
+    if args.batch:
+        cli.create_workflows_batch(
+            batch_file=args.batch,
+            complexity=args.complexity,
+            activate=args.activate,
+            use_mock=args.mock or None,
+            concurrency=args.concurrency
+        )
+        return
+    
     if not args.description:
         print("❌ Ошибка: Требуется описание workflow")
         print("💡 Используйте --examples для просмотра примеров")
@@ -190,7 +472,8 @@ def main():
         description=args.description,
         complexity=args.complexity,
         activate=args.activate,
-        use_mock=args.mock
+        use_mock=args.mock,
+        stream=args.stream
     )
 
 if __name__ == "__main__":
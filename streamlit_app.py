@@ -18,7 +18,8 @@ sys.path.append(str(Path(__file__).parent / 'core'))
 try:
     from n8n_claude_service_mock import N8NClaudeServiceMock
     from n8n_production_client import N8NProductionClient
-    from n8n_knowledge_base import N8NKnowledgeBase
+    from n8n_workflow_mirror import N8NWorkflowMirror
+    from n8n_knowledge_base import get_shared_knowledge_base, reload_shared_knowledge_base
 except ImportError as e:
     st.error(f"Ошибка импорта модулей: {e}")
     st.stop()
@@ -55,18 +56,22 @@ def check_n8n_status():
     except:
         return False
 
+# Локальное зеркало workflow (одно на процесс)
+@st.cache_resource
+def get_workflow_mirror():
+    """Зеркало workflow n8n в SQLite"""
+    return N8NWorkflowMirror()
+
+def refresh_workflow_mirror(api_key):
+    """Инкрементальное обновление зеркала из n8n (по updatedAt, не чаще раза в 30 секунд)"""
+    mirror = get_workflow_mirror()
+    mirror.sync_from_client(N8NProductionClient(api_key), max_age=30)
+    return mirror
+
 # Функция получения workflow
-@st.cache_data(ttl=30)
-def get_workflows(api_key):
-    """Получение списка workflow из n8n"""
-    try:
-        headers = {'X-N8N-API-KEY': api_key}
-        response = requests.get('http://localhost:5678/api/v1/workflows', headers=headers)
-        if response.status_code == 200:
-            return response.json().get('data', [])
-    except:
-        pass
-    return []
+def get_workflows(api_key, **filters):
+    """Список workflow из локального зеркала (фильтры и сортировка выполняются локально)"""
+    return refresh_workflow_mirror(api_key).list(**filters)
 
 def main():
     """Главная функция приложения"""
@@ -117,11 +122,11 @@ def main():
         
         # Статистика
         if n8n_api_key and n8n_status:
-            workflows = get_workflows(n8n_api_key)
-            st.subheader("📊 Статистика")
-            st.metric("Всего workflow", len(workflows))
-            active_count = sum(1 for w in workflows if w.get('active'))
-            st.metric("Активных", active_count)
+            summary = refresh_workflow_mirror(n8n_api_key).summary()
+            if summary['total']:
+                st.subheader("📊 Статистика")
+                st.metric("Всего workflow", summary['total'])
+                st.metric("Активных", summary['active'])
     
     # Основной интерфейс
     if not n8n_status:
@@ -261,25 +266,26 @@ def main():
         st.header("📋 Мои Workflow")
         
         if n8n_api_key:
-            workflows = get_workflows(n8n_api_key)
+            # Фильтры
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                show_active_only = st.checkbox("Только активные")
+            with col2:
+                show_archived = st.checkbox("Показать архивированные")
+            with col3:
+                sort_by = st.selectbox("Сортировка", ["Дата создания", "Название", "Статус"])
             
-            if workflows:
-                # Фильтры
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    show_active_only = st.checkbox("Только активные")
-                with col2:
-                    show_archived = st.checkbox("Показать архивированные")
-                with col3:
-                    sort_by = st.selectbox("Сортировка", ["Дата создания", "Название", "Статус"])
-                
-                # Фильтрация
-                filtered_workflows = workflows
-                if show_active_only:
-                    filtered_workflows = [w for w in filtered_workflows if w.get('active')]
-                if not show_archived:
-                    filtered_workflows = [w for w in filtered_workflows if not w.get('isArchived')]
-                
+            # Фильтрация и сортировка - запросом к локальному зеркалу
+            order_by = {"Дата создания": "created_at", "Название": "name", "Статус": "active"}[sort_by]
+            filtered_workflows = get_workflows(
+                n8n_api_key,
+                active=True if show_active_only else None,
+                archived=None if show_archived else False,
+                order_by=order_by,
+                descending=order_by != "name"
+            )
+            
+            if filtered_workflows:
                 # Отображение workflow
                 for workflow in filtered_workflows:
                     with st.expander(f"🔧 {workflow['name']} ({'✅ Активен' if workflow.get('active') else '⏸️ Неактивен'})"):
@@ -287,9 +293,9 @@ def main():
                         
                         with col1:
                             st.markdown(f"**ID:** {workflow['id']}")
-                            st.markdown(f"**Создан:** {workflow['createdAt'][:10]}")
-                            st.markdown(f"**Nodes:** {len(workflow.get('nodes', []))}")
-                            st.markdown(f"**Триггеров:** {workflow.get('triggerCount', 0)}")
+                            st.markdown(f"**Создан:** {(workflow['createdAt'] or '')[:10]}")
+                            st.markdown(f"**Nodes:** {workflow['nodeCount']}")
+                            st.markdown(f"**Теги:** {', '.join(workflow['tags']) or '-'}")
                         
                         with col2:
                             if st.button(f"🔗 Открыть", key=f"open_{workflow['id']}"):
@@ -297,14 +303,24 @@ def main():
                             
                             if workflow.get('active'):
                                 if st.button(f"⏸️ Деактивировать", key=f"deactivate_{workflow['id']}"):
-                                    st.info("Функция деактивации будет добавлена")
+                                    result = N8NProductionClient(n8n_api_key).deactivate_workflow(workflow['id'])
+                                    if result['status'] == 'success':
+                                        get_workflow_mirror().upsert(result['workflow'])
+                                        st.success(result['message'])
+                                    else:
+                                        st.error(result['message'])
                             else:
                                 if st.button(f"▶️ Активировать", key=f"activate_{workflow['id']}"):
-                                    st.info("Функция активации будет добавлена")
+                                    result = N8NProductionClient(n8n_api_key).activate_workflow(workflow['id'])
+                                    if result['status'] == 'success':
+                                        get_workflow_mirror().upsert(result['workflow'])
+                                        st.success(result['message'])
+                                    else:
+                                        st.error(result['message'])
                         
                         # Показ nodes
                         if st.checkbox(f"Показать структуру", key=f"show_{workflow['id']}"):
-                            st.json(workflow.get('nodes', []))
+                            st.json((get_workflow_mirror().get(workflow['id']) or {}).get('nodes', []))
             else:
                 st.info("📋 Пока нет созданных workflow")
     
@@ -312,8 +328,11 @@ def main():
     with tab3:
         st.header("📚 База знаний N8N")
         
+        if st.button("🔄 Перезагрузить базу знаний"):
+            reload_shared_knowledge_base()
+        
         try:
-            kb = N8NKnowledgeBase()
+            kb = get_shared_knowledge_base()
             
             # Статистика базы знаний
             col1, col2, col3 = st.columns(3)
@@ -408,7 +427,7 @@ def main():
             "N8N URL": "http://localhost:5678",
             "API Key": "✅ Настроен" if n8n_api_key else "❌ Не настроен",
             "Claude Mode": "🧠 Real API" if (use_real_claude and claude_api_key) else "🎭 Mock",
-            "Workflows": len(get_workflows(n8n_api_key)) if n8n_api_key else 0
+            "Workflows": get_workflow_mirror().count() if n8n_api_key else 0
         }
         
         st.json(info_data)
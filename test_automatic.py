@@ -5,7 +5,8 @@
 
 import sys
 import os
-sys.path.append('/Users/hdv_1987/Desktop/Projects/N8N-Agent/core')
+import threading
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'core'))
 
 from n8n_main_service import N8NMainService
 
@@ -49,6 +50,822 @@ def test_automatic():
         
         return False
 
+def test_similarity_cache():
+    """Повторное использование workflow для перефразированного описания"""
+    import tempfile
+    from n8n_similarity_cache import N8NSimilarityCache
+    
+    print("🧪 ТЕСТИРОВАНИЕ КЭША ПОХОЖИХ ОПИСАНИЙ")
+    
+    cache = N8NSimilarityCache(cache_dir=tempfile.mkdtemp())
+    groups = {"webhook", "communication"}
+    workflow = {"name": "Webhook to Slack", "nodes": [], "connections": {}}
+    cache.add("При получении webhook отправить уведомление в Slack", {}, "kb", workflow, groups)
+    
+    # Перефразированное описание с теми же nodes находится
+    similar = cache.lookup("отправить в Slack при webhook", {}, "kb", groups)
+    assert similar is not None and similar['workflow'] == workflow
+    print(f"✅ Похожее описание найдено (близость {similar['similarity']})")
+    
+    # Другие группы nodes или другой сервис - не тот workflow
+    assert cache.lookup("отправить в Slack при webhook", {}, "kb", {"webhook", "google"}) is None
+    assert cache.lookup("отправить в Telegram при webhook", {}, "kb", groups) is None
+    print("✅ Описания с другими nodes не совпадают")
+
+class FakeClock:
+    """Фиктивные часы: sleep и ожидание бюджета сдвигают время вместо реального сна"""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps = []
+    
+    def monotonic(self) -> float:
+        return self.now
+    
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeClockCondition(threading.Condition):
+    """Condition, ожидание которой проходит по фиктивным часам"""
+    
+    def __init__(self, clock: FakeClock):
+        super().__init__()
+        self.clock = clock
+    
+    def wait(self, timeout=None):
+        self.clock.sleep(timeout)
+        return True
+
+def make_scheduler(monkeypatch, **kwargs):
+    """Планировщик на фиктивных часах"""
+    import n8n_request_scheduler
+    
+    clock = FakeClock()
+    monkeypatch.setattr(n8n_request_scheduler, 'time', clock)
+    scheduler = n8n_request_scheduler.N8NRequestScheduler(**kwargs)
+    scheduler._condition = FakeClockCondition(clock)
+    return scheduler, clock
+
+def api_status_error(status_code: int, headers: dict = None):
+    """Ошибка API Claude с заданным кодом и заголовками"""
+    import anthropic
+    import httpx2
+    
+    request = httpx2.Request('POST', 'https://api.anthropic.com/v1/messages')
+    response = httpx2.Response(status_code, headers=headers or {}, request=request)
+    return anthropic.APIStatusError(f"Ошибка {status_code}", response=response, body=None)
+
+def test_scheduler_token_bucket(monkeypatch):
+    """Ожидание бюджета RPM/TPM по token bucket"""
+    print("🧪 ТЕСТИРОВАНИЕ БЮДЖЕТОВ ПЛАНИРОВЩИКА")
+    
+    # RPM: полный запас расходуется без ожидания, следующий запрос ждет пополнения
+    scheduler, clock = make_scheduler(monkeypatch, requests_per_minute=60, tokens_per_minute=None)
+    for _ in range(60):
+        scheduler.acquire()
+    assert clock.sleeps == []
+    scheduler.acquire()
+    assert clock.sleeps == [1.0]
+    print("✅ RPM: 61-й запрос ждет 1 сек")
+    
+    # TPM: ждем, пока накопится недостающее количество токенов
+    scheduler, clock = make_scheduler(monkeypatch, requests_per_minute=None, tokens_per_minute=6000)
+    scheduler.acquire(5000)
+    scheduler.acquire(3000)
+    assert clock.sleeps == [20.0]
+    
+    # Запрос больше минутного лимита ждет полного бюджета, а не бесконечно
+    scheduler.acquire(100000)
+    assert clock.sleeps == [20.0, 60.0]
+    assert scheduler.stats()['tokens_used'] == 108000
+    print("✅ TPM: ожидание недостающих токенов")
+
+def test_scheduler_retry_delay(monkeypatch):
+    """Повторяются только временные ошибки, retry-after и 429 учитываются"""
+    import anthropic
+    import httpx2
+    
+    print("🧪 ТЕСТИРОВАНИЕ ПОВТОРОВ ПЛАНИРОВЩИКА")
+    
+    scheduler, clock = make_scheduler(monkeypatch, requests_per_minute=None, tokens_per_minute=None,
+                                      max_retries=3, base_delay=1.0, max_delay=30.0)
+    
+    # 400 не повторяется
+    assert scheduler._retry_delay(api_status_error(400), 0) is None
+    
+    # 429 с retry-after-ms: задержка из заголовка и общая пауза для всех потоков
+    assert scheduler._retry_delay(api_status_error(429, {'retry-after-ms': '1500'}), 0) == 1.5
+    assert scheduler.stats()['rate_limited'] == 1
+    scheduler.acquire()
+    assert clock.sleeps == [1.5]
+    
+    # retry-after в секундах ограничен max_delay
+    assert scheduler._retry_delay(api_status_error(503, {'retry-after': '120'}), 0) == 30.0
+    
+    # Без заголовка - full jitter до экспоненциальной границы
+    connection_error = anthropic.APIConnectionError(request=httpx2.Request('POST', 'https://api.anthropic.com'))
+    assert 0 <= scheduler._retry_delay(connection_error, 2) <= 4.0
+    
+    # Повторы исчерпаны, посторонние исключения не повторяются
+    assert scheduler._retry_delay(api_status_error(503), 3) is None
+    assert scheduler._retry_delay(ValueError("bug"), 0) is None
+    print("✅ Задержки повторов рассчитываются верно")
+    
+    # call: временная ошибка повторяется, ошибка запроса - сразу наружу
+    errors = [api_status_error(529), api_status_error(429, {'retry-after': '2'})]
+    
+    def flaky():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+    
+    assert scheduler.call(flaky) == "ok"
+    assert scheduler.stats()['retries'] == 2
+    
+    calls = []
+    
+    def bad_request():
+        calls.append(1)
+        raise api_status_error(400)
+    
+    try:
+        scheduler.call(bad_request)
+        assert False, "400 должен быть проброшен"
+    except anthropic.APIStatusError as e:
+        assert e.status_code == 400
+    assert len(calls) == 1 and scheduler.stats()['failed'] == 1
+    print("✅ call повторяет только временные ошибки")
+
+def test_scheduler_record_usage(monkeypatch):
+    """Уточнение бюджета TPM по фактическому расходу"""
+    from types import SimpleNamespace
+    
+    print("🧪 ТЕСТИРОВАНИЕ УЧЕТА ТОКЕНОВ")
+    
+    scheduler, clock = make_scheduler(monkeypatch, requests_per_minute=None, tokens_per_minute=6000)
+    scheduler.acquire(1000)
+    assert scheduler.stats()['token_allowance'] == 5000
+    
+    # Возврат переоцененных токенов
+    scheduler.record_usage(1000, 400)
+    assert scheduler.stats()['token_allowance'] == 5600
+    
+    # Доплата недооцененных
+    scheduler.record_usage(1000, 2500)
+    assert scheduler.stats()['token_allowance'] == 4100
+    assert scheduler.stats()['tokens_used'] == 1000 - 600 + 1500
+    
+    # Возврат не поднимает запас выше минутного лимита
+    scheduler.record_usage(10000, 0)
+    assert scheduler.stats()['token_allowance'] == 6000
+    
+    # call уточняет бюджет по usage ответа
+    scheduler, clock = make_scheduler(monkeypatch, requests_per_minute=None, tokens_per_minute=6000)
+    usage = SimpleNamespace(input_tokens=300, output_tokens=200)
+    scheduler.call(lambda: SimpleNamespace(usage=usage), estimated_tokens=2000)
+    assert scheduler.stats()['token_allowance'] == 5500
+    assert scheduler.stats()['tokens_used'] == 500
+    print("✅ Бюджет TPM уточняется по usage")
+
+def run_single_flight(flight, key, func, callers: int):
+    """Одновременный вызов do из нескольких потоков, func не завершается, пока все не подключились"""
+    import time
+    
+    release = threading.Event()
+    outcomes = [None] * callers
+    
+    def gated():
+        release.wait(5)
+        return func()
+    
+    def caller(index):
+        try:
+            outcomes[index] = flight.do(key, gated)
+        except Exception as e:
+            outcomes[index] = e
+    
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    
+    deadline = time.monotonic() + 5
+    while flight.stats()['waiting'] < callers - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+def test_single_flight():
+    """Одинаковые одновременные запросы выполняются один раз"""
+    from n8n_single_flight import N8NSingleFlight
+    
+    print("🧪 ТЕСТИРОВАНИЕ ОБЪЕДИНЕНИЯ ЗАПРОСОВ")
+    
+    flight = N8NSingleFlight()
+    calls = []
+    
+    def generate():
+        calls.append(1)
+        return {"workflow": {"nodes": [{"name": "Webhook"}]}}
+    
+    outcomes = run_single_flight(flight, "key", generate, callers=8)
+    assert len(calls) == 1
+    assert flight.stats() == {"executed": 1, "coalesced": 7, "in_flight": 0, "waiting": 0}
+    
+    leaders = [result for result, shared in outcomes if not shared]
+    waiters = [result for result, shared in outcomes if shared]
+    assert len(leaders) == 1 and len(waiters) == 7
+    print("✅ 8 одновременных вызовов - один запуск func")
+    
+    # Ожидающие получают независимые копии: их изменения не трогают результат ведущего
+    leader = leaders[0]
+    for result in waiters:
+        assert result == leader and result is not leader
+        assert result['workflow']['nodes'] is not leader['workflow']['nodes']
+        result['workflow']['nodes'].append({"name": "Slack"})
+    assert leader == {"workflow": {"nodes": [{"name": "Webhook"}]}}
+    print("✅ Ожидающие получают глубокие копии")
+    
+    # Исключение ведущего получают все ожидающие
+    def fail():
+        raise RuntimeError("Claude недоступен")
+    
+    outcomes = run_single_flight(flight, "key", fail, callers=5)
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert flight.stats()['in_flight'] == 0
+    
+    # После завершения ключ снова выполняется
+    assert flight.do("key", lambda: 1) == (1, False)
+    print("✅ Ошибка доходит до всех ожидающих")
+
+def test_transfer_checkpoint_resume():
+    """Продолжение пакетного переноса после сбоя"""
+    import json
+    import tempfile
+    from n8n_bulk_transfer import N8NTransferCheckpoint, N8NWorkflowSink, iter_workflow_source
+    
+    print("🧪 ТЕСТИРОВАНИЕ КОНТРОЛЬНЫХ ТОЧЕК ПЕРЕНОСА")
+    
+    directory = tempfile.mkdtemp()
+    
+    # Оборванная последняя строка журнала пропускается
+    checkpoint_path = os.path.join(directory, 'export.checkpoint')
+    with open(checkpoint_path, 'w', encoding='utf-8') as f:
+        f.write('{"key": "1", "offset": 10}\n{"key": "2", "offset": 25}\n{"key": "3", "off')
+    checkpoint = N8NTransferCheckpoint(checkpoint_path)
+    assert checkpoint.done == {"1", "2"} and checkpoint.offset == 25
+    checkpoint.mark("3", offset=40)
+    checkpoint.close()
+    assert N8NTransferCheckpoint(checkpoint_path).done == {"1", "2", "3"}
+    print("✅ Оборванная строка журнала игнорируется")
+    
+    # JSONL обрезается до размера на последней контрольной точке
+    export_path = os.path.join(directory, 'export.jsonl')
+    sink = N8NWorkflowSink(export_path)
+    first = sink.write({"id": "1", "name": "Первый"})
+    sink.write({"id": "2", "name": "Второй (не попал в контрольную точку)"})
+    sink.close()
+    with open(export_path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "3", "na')
+    
+    sink = N8NWorkflowSink(export_path, resume_offset=first)
+    sink.write({"id": "2", "name": "Второй"})
+    sink.close()
+    with open(export_path, 'r', encoding='utf-8') as f:
+        exported = [json.loads(line) for line in f]
+    assert [workflow['id'] for workflow in exported] == ["1", "2"]
+    assert exported[1]['name'] == "Второй"
+    print("✅ Незафиксированный хвост JSONL отбрасывается")
+    
+    # Ключи источника не зависят от порядка строк, повторы различаются
+    workflows = [
+        {"id": "a1", "name": "С id", "nodes": []},
+        {"name": "Без id", "nodes": [], "connections": {}},
+        {"name": "Другой", "nodes": [], "connections": {}},
+        {"name": "Без id", "nodes": [], "connections": {}}
+    ]
+    
+    def source_keys(items):
+        path = os.path.join(directory, 'source.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items))
+        return [key for key, _ in iter_workflow_source(path)]
+    
+    keys = source_keys(workflows)
+    assert keys[0] == "id:a1"
+    assert keys[3] == keys[1] + "#2"
+    assert len(set(keys)) == 4
+    
+    reordered = source_keys([workflows[2], workflows[1], workflows[0], workflows[3]])
+    assert set(reordered) == set(keys)
+    assert reordered[2] == "id:a1" and reordered[0] == keys[2]
+    print("✅ Ключи источника стабильны при перестановке строк")
+
+class FakeN8NSession:
+    """Запись запросов к n8n вместо сети (ответ - тело запроса как сохраненный workflow)"""
+    
+    def __init__(self, statuses=None):
+        self.requests = []
+        # (метод, окончание URL) -> код ответа (остальные запросы - 200)
+        self.statuses = statuses or {}
+    
+    def _respond(self, method, url, json=None, **kwargs):
+        from types import SimpleNamespace
+        
+        self.requests.append((method, url, json))
+        status = next((code for (m, suffix), code in self.statuses.items() if m == method and url.endswith(suffix)), 200)
+        body = dict(json or {}, id=url.rstrip('/').split('/')[-1])
+        return SimpleNamespace(status_code=status, json=lambda: body, text="")
+    
+    def request(self, method, url, **kwargs):
+        return self._respond(method, url, **kwargs)
+    
+    def get(self, url, **kwargs):
+        return self._respond('GET', url, **kwargs)
+    
+    def put(self, url, **kwargs):
+        return self._respond('PUT', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self._respond('POST', url, **kwargs)
+
+def saved_workflow():
+    """Workflow в том виде, в каком его возвращает n8n"""
+    return {
+        "id": "wf1",
+        "name": "Webhook to Slack",
+        "active": False,
+        "createdAt": "2024-01-01T00:00:00.000Z",
+        "updatedAt": "2024-01-02T00:00:00.000Z",
+        "tags": [{"id": "t1", "name": "agent"}],
+        "nodes": [
+            {"id": "n1", "name": "Webhook", "type": "n8n-nodes-base.webhook", "typeVersion": 1,
+             "position": [250, 300], "webhookId": "hook-1", "parameters": {"path": "orders"}},
+            {"id": "n2", "name": "Slack", "type": "n8n-nodes-base.slack", "typeVersion": 1,
+             "position": [450, 300], "parameters": {"channel": "#general"}, "credentials": {"slackApi": {"id": "c1"}}}
+        ],
+        "connections": {"Webhook": {"main": [[{"node": "Slack", "type": "main", "index": 0}]]}},
+        "settings": {"executionOrder": "v1"}
+    }
+
+def test_workflow_diff():
+    """Структурное сравнение workflow"""
+    from n8n_workflow_diff import diff_workflows, match_nodes
+    
+    print("🧪 ТЕСТИРОВАНИЕ СРАВНЕНИЯ WORKFLOW")
+    
+    current = saved_workflow()
+    
+    # Сначала по id (переименование), затем по имени (сгенерированные nodes без id)
+    desired_nodes = [
+        {"id": "n1", "name": "Заказ", "type": "n8n-nodes-base.webhook", "parameters": {"path": "orders"}},
+        {"name": "Slack", "type": "n8n-nodes-base.slack", "parameters": {"channel": "#general"}},
+        {"name": "Gmail", "type": "n8n-nodes-base.gmail", "parameters": {}}
+    ]
+    pairs = match_nodes(current['nodes'], desired_nodes)
+    assert [current_node and current_node['id'] for _, current_node in pairs] == ["n1", "n2", None]
+    print("✅ Nodes сопоставляются по id, затем по имени")
+    
+    # Переименованный node - изменение, а не удаление и добавление
+    desired = {"nodes": desired_nodes[:2], "connections": {"Заказ": {"main": [[{"node": "Slack", "type": "main", "index": 0}]]}}}
+    diff = diff_workflows(current, desired)
+    assert diff['nodes'] == {"added": [], "removed": [], "changed": ["Заказ"]}
+    print("✅ Переименованный node считается измененным")
+    
+    # Ребра connections: добавленное и удаленное
+    desired = {
+        "nodes": current['nodes'] + [{"name": "Gmail", "type": "n8n-nodes-base.gmail"}],
+        "connections": {"Webhook": {"main": [[{"node": "Gmail", "type": "main", "index": 0}]]}}
+    }
+    diff = diff_workflows(current, desired)
+    assert diff['nodes']['added'] == ["Gmail"] and not diff['nodes']['changed']
+    assert diff['connections']['added'] == [("Webhook", "main", 0, "Gmail", "main", 0)]
+    assert diff['connections']['removed'] == [("Webhook", "main", 0, "Slack", "main", 0)]
+    assert diff['content_changed'] and diff['active'] is None
+    print("✅ Ребра connections сравниваются")
+
+def test_update_workflow_diff():
+    """update_workflow: без изменений нет PUT, тело PUT только с полями IMPORT_FIELDS"""
+    from n8n_bulk_transfer import IMPORT_FIELDS
+    from n8n_production_client import N8NProductionClient
+    
+    print("🧪 ТЕСТИРОВАНИЕ ОБНОВЛЕНИЯ WORKFLOW")
+    
+    client = N8NProductionClient("test-key", "http://n8n.test")
+    client.session = FakeN8NSession()
+    
+    # Повторно сгенерированный workflow без позиций и id nodes - изменений нет
+    current = saved_workflow()
+    regenerated = {
+        "name": "Webhook to Slack",
+        "nodes": [
+            {"name": "Webhook", "type": "n8n-nodes-base.webhook", "parameters": {"path": "orders"}},
+            {"name": "Slack", "type": "n8n-nodes-base.slack", "typeVersion": 1, "parameters": {"channel": "#general"}}
+        ],
+        "connections": current['connections'],
+        "settings": {"executionOrder": "v1"}
+    }
+    result = client.update_workflow("wf1", regenerated, current=current)
+    assert result['status'] == 'success' and result['changed'] is False
+    assert client.session.requests == []
+    print("✅ Без изменений PUT не отправляется")
+    
+    # Изменение параметра: один PUT, в теле только принимаемые API поля
+    regenerated['nodes'][1]['parameters'] = {"channel": "#orders"}
+    result = client.update_workflow("wf1", regenerated, current=current)
+    assert result['changed'] is True and result['diff']['nodes']['changed'] == ["Slack"]
+    
+    assert [(method, url) for method, url, _ in client.session.requests] == [
+        ('PUT', "http://n8n.test/api/v1/workflows/wf1")
+    ]
+    body = client.session.requests[0][2]
+    assert set(body) <= set(IMPORT_FIELDS)
+    assert 'staticData' not in body
+    
+    # Поля, назначенные n8n и редактором, сохраняются
+    webhook, slack = body['nodes']
+    assert webhook['id'] == "n1" and webhook['position'] == [250, 300] and webhook['webhookId'] == "hook-1"
+    assert slack['credentials'] == {"slackApi": {"id": "c1"}} and slack['parameters'] == {"channel": "#orders"}
+    print("✅ Тело PUT ограничено IMPORT_FIELDS и сохраняет поля редактора")
+
+def test_json_extractor():
+    """Извлечение workflow из ответа модели"""
+    import json
+    from n8n_json_extractor import JSONExtractionError, extract_json_object, scan_object
+    
+    print("🧪 ТЕСТИРОВАНИЕ ИЗВЛЕЧЕНИЯ JSON")
+    
+    workflow = {"name": "Заказы", "nodes": [{"name": "Webhook", "parameters": {"path": "{id}"}}], "connections": {}}
+    workflow_json = json.dumps(workflow, ensure_ascii=False)
+    
+    # Без code fence и внутри него - один и тот же объект
+    for text in (workflow_json, f"Вот workflow:\n```json\n{workflow_json}\n```\nГотово."):
+        result = extract_json_object(text)
+        assert result['value'] == workflow and result['repairs'] == []
+        assert text[result['start']:result['end']] == workflow_json
+    print("✅ JSON находится с code fence и без него")
+    
+    # Фигурные скобки в тексте перед JSON (в том числе незакрытые)
+    for prose in ("Замените {placeholder} на свое значение. ", "Шаблон { см. ниже: ", '{"hint": 1} и затем '):
+        assert extract_json_object(prose + workflow_json)['value'] == workflow
+    assert scan_object("{ см. ниже", 0) is None
+    print("✅ Скобки в тексте не мешают найти workflow")
+    
+    # Обертка без nodes: берется вложенный workflow
+    wrapped = f'{{"workflow": {workflow_json}, "comment": "ok"}}'
+    result = extract_json_object(wrapped)
+    assert result['value'] == workflow and wrapped[result['start']:result['end']] == workflow_json
+    
+    # Комментарии и висячие запятые
+    text = '{\n  // workflow\n  "name": "Заказы", /* nodes */ "nodes": [{"name": "Webhook",},],\n}'
+    result = extract_json_object(text)
+    assert result['value'] == {"name": "Заказы", "nodes": [{"name": "Webhook"}]}
+    assert result['repairs'] == ["comments", "trailing_commas"]
+    print("✅ Комментарии и висячие запятые исправляются")
+    
+    # Оборванный ответ дополняется закрывающими скобками
+    truncated = '```json\n{"name": "Заказы", "nodes": [{"name": "Webhook", "parameters": {"text": "Привет, '
+    assert scan_object(truncated, truncated.index('{'))[1] == '"}}]}'
+    result = extract_json_object(truncated)
+    assert result['repairs'] == ["truncated"]
+    assert result['value']['nodes'][0]['parameters'] == {"text": "Привет, "}
+    print("✅ Оборванный объект закрывается")
+    
+    # Смещения в байтах UTF-8 с кириллицей перед JSON
+    text = f"Ваш процесс «Заказы»: {workflow_json} — конец"
+    result = extract_json_object(text)
+    encoded = text.encode('utf-8')
+    assert result['byte_start'] == len("Ваш процесс «Заказы»: ".encode('utf-8'))
+    assert encoded[result['byte_start']:result['byte_end']].decode('utf-8') == workflow_json
+    print("✅ Смещения в байтах учитывают кириллицу")
+    
+    try:
+        extract_json_object("JSON не будет")
+        assert False, "ожидалась JSONExtractionError"
+    except JSONExtractionError:
+        pass
+
+def stream_nodes(text: str, chunk_size: int):
+    """Nodes, отданные потоковым разбором ответа N8NFakeAnthropicClient"""
+    from n8n_claude_service_mock import N8NFakeAnthropicClient
+    from n8n_stream_parser import IncrementalWorkflowParser
+    
+    client = N8NFakeAnthropicClient(responses=[text], chunk_size=chunk_size)
+    parser = IncrementalWorkflowParser()
+    nodes = []
+    
+    with client.messages.stream(model="test", max_tokens=4000, messages=[{"role": "user", "content": "test"}]) as stream:
+        for chunk in stream.text_stream:
+            nodes.extend(parser.feed(chunk))
+    
+    return nodes, parser
+
+def test_stream_parser_chunk_boundaries():
+    """Потоковый разбор не зависит от границ фрагментов (в том числе внутри строк и escape)"""
+    import json
+    
+    print("🧪 ТЕСТИРОВАНИЕ ПОТОКОВОГО РАЗБОРА")
+    
+    workflow = {
+        "name": "Ответ \"клиенту\"",
+        "nodes": [
+            {"name": "Webhook", "type": "n8n-nodes-base.webhook", "parameters": {"path": "orders/{id}"}},
+            {"name": "Code", "type": "n8n-nodes-base.code",
+             "parameters": {"jsCode": "return [{json: {text: \"}]\\\\\"\"}}];\n"}},
+            {"name": "Slack", "type": "n8n-nodes-base.slack", "parameters": {"text": "Привет, \\ {мир} ]"}}
+        ],
+        "connections": {}
+    }
+    text = (
+        "Замените {placeholder} и { см. ниже } на свои значения.\n"
+        f"```json\n{json.dumps(workflow, ensure_ascii=False, indent=2)}\n```\nГотово {{"
+    )
+    workflow_text = json.dumps(workflow, ensure_ascii=False, indent=2)
+    
+    for chunk_size in list(range(1, 17)) + [len(text)]:
+        nodes, parser = stream_nodes(text, chunk_size)
+        assert nodes == workflow['nodes'], chunk_size
+        assert parser.complete and parser.nodes_seen == 3
+        assert parser.text[parser.json_start:parser.json_end] == workflow_text
+    print("✅ Nodes одинаковы при любых границах фрагментов")
+    
+    # Объект без "nodes" перед workflow отбрасывается без возврата назад
+    nodes, parser = stream_nodes('Пример: {"hint": "{"} ' + workflow_text, 5)
+    assert nodes == workflow['nodes'] and parser.complete
+    
+    # Текст без JSON прерывает поток, несовпадение скобок внутри workflow - тоже
+    from n8n_stream_parser import IncrementalWorkflowParser, StreamStructureError
+    
+    for broken in ("Без JSON. " * 300, '{"nodes": [{"name": "A"}}'):
+        try:
+            IncrementalWorkflowParser().feed(broken)
+            assert False, "ожидалась StreamStructureError"
+        except StreamStructureError:
+            pass
+    print("✅ Неисправимая структура прерывает поток")
+
+def test_stream_workflow_with_fake_client():
+    """stream_workflow отдает провалидированные nodes по мере получения"""
+    from n8n_claude_service import N8NClaudeService
+    from n8n_claude_service_mock import N8NFakeAnthropicClient
+    from n8n_request_scheduler import N8NRequestScheduler
+    
+    print("🧪 ТЕСТИРОВАНИЕ ПОТОКОВОЙ ГЕНЕРАЦИИ")
+    
+    client = N8NFakeAnthropicClient(chunk_size=7)
+    service = N8NClaudeService(use_cache=False, client=client, max_repair_attempts=0,
+                               request_scheduler=N8NRequestScheduler(None, None))
+    
+    events = list(service.stream_workflow("При получении webhook отправить уведомление в Slack"))
+    node_events = [event for event in events if event['event'] == 'node']
+    result = events[-1]['result']
+    
+    assert events[-1]['event'] == 'result' and result['status'] == 'success'
+    assert [event['index'] for event in node_events] == list(range(len(result['workflow']['nodes'])))
+    assert [event['node']['name'] for event in node_events] == [node['name'] for node in result['workflow']['nodes']]
+    print(f"✅ {len(node_events)} nodes получены до конца ответа")
+
+def test_keyword_routing_matches_baseline():
+    """Выбор паттерна, категорий nodes и mock workflow совпадает с исходными эвристиками"""
+    from types import SimpleNamespace
+    from n8n_claude_service import N8NClaudeService
+    from n8n_claude_service_mock import N8NClaudeServiceMock
+    from n8n_knowledge_base import get_shared_knowledge_base
+    
+    print("🧪 ТЕСТИРОВАНИЕ ВЫБОРА ПО КЛЮЧЕВЫМ СЛОВАМ")
+    
+    knowledge_base = get_shared_knowledge_base()
+    pattern_names = {id(pattern): name for name, pattern in knowledge_base.workflow_patterns.items()}
+    mock = N8NClaudeServiceMock()
+    
+    # (описание, паттерн, категории nodes, mock workflow) - результаты исходных эвристик
+    cases = [
+        ("При получении webhook отправить уведомление в Slack с информацией о событии",
+         "webhook_to_action", ["webhook", "communication"], "Webhook to Slack Notification"),
+        ("Каждый час получать данные из API и сохранять в Google Sheets",
+         "webhook_to_action", ["webhook", "schedule", "http", "google"], "Scheduled API to Google Sheets"),
+        ("Получить данные из API", None, ["http"], "Simple Webhook Workflow"),
+        ("Получить список заказов и изменить статус", None, ["http", "processing"], "Simple Webhook Workflow"),
+        ("Каждый час отправлять email с отчетом", "scheduled_data_sync", ["schedule", "google"], "Simple Webhook Workflow"),
+        ("Каждый день записывать данные, таблица обновляется автоматически", "scheduled_data_sync", ["schedule", "http", "google"],
+         "Simple Webhook Workflow"),
+        ("Принимать заявки и отправлять сообщение", "webhook_to_action", ["webhook", "communication"],
+         "Simple Webhook Workflow"),
+        ("Если пришел webhook с заказом, отправить сообщение в Slack", "conditional_notification",
+         ["webhook", "communication"], "Webhook to Slack Notification"),
+        ("Регулярно выгружать данные", "scheduled_data_sync", ["http"], "Simple Webhook Workflow"),
+        ("Данные из API отправлять в несколько разных мест", "api_to_multiple_destinations", ["http"],
+         "Simple Webhook Workflow")
+    ]
+    
+    # _analyze_required_nodes использует только базу знаний сервиса
+    service = SimpleNamespace(knowledge_base=knowledge_base)
+    
+    for description, pattern, categories, mock_name in cases:
+        suggested = knowledge_base.suggest_workflow_pattern(description)
+        assert (pattern_names[id(suggested)] if suggested else None) == pattern, description
+        assert N8NClaudeService._analyze_required_nodes(service, description) == categories, description
+        assert mock._create_mock_workflow(description, {})['name'] == mock_name, description
+    print(f"✅ {len(cases)} описаний маршрутизируются как раньше")
+
+def test_update_workflow_sync_and_async():
+    """Синхронный и асинхронный клиенты выполняют одни и те же шаги обновления и активации"""
+    import asyncio
+    import json
+    import httpx2
+    from n8n_async_client import AsyncN8NProductionClient
+    from n8n_production_client import N8NProductionClient
+    
+    print("🧪 ТЕСТИРОВАНИЕ ОБЩИХ ШАГОВ ОБНОВЛЕНИЯ")
+    
+    # Сервер без activate/deactivate endpoints: POST отвечает 404, статус меняется через GET и PUT
+    current = dict(saved_workflow(), active=True)
+    desired = {"nodes": current['nodes'][:1], "connections": {}, "active": False}
+    expected = [
+        ('POST', "/api/v1/workflows/wf1/deactivate"),
+        ('GET', "/api/v1/workflows/wf1"),
+        ('PUT', "/api/v1/workflows/wf1"),
+        ('PUT', "/api/v1/workflows/wf1"),
+        # Повторная активация - сразу GET и PUT, без POST
+        ('GET', "/api/v1/workflows/wf1"),
+        ('PUT', "/api/v1/workflows/wf1")
+    ]
+    
+    client = N8NProductionClient("test-key", "http://n8n.test")
+    client.session = FakeN8NSession(statuses={('POST', "/deactivate"): 404, ('POST', "/activate"): 404})
+    result = client.update_workflow("wf1", desired, current=current)
+    assert result['status'] == 'success' and result['changed'] is True
+    assert client.activate_workflow("wf1")['status'] == 'success'
+    assert [(method, url[len("http://n8n.test"):]) for method, url, _ in client.session.requests] == expected
+    assert client.supports_activation_endpoints is False
+    print("✅ Синхронный клиент: после 404 от deactivate статус меняется через GET и PUT")
+    
+    requests = []
+    
+    def handler(request):
+        requests.append((request.method, request.url.path))
+        if request.method == 'POST':
+            return httpx2.Response(404, text="not found")
+        body = json.loads(request.content) if request.content else saved_workflow()
+        return httpx2.Response(200, json=dict(body, id="wf1"))
+    
+    async def run():
+        async_client = AsyncN8NProductionClient("test-key", "http://n8n.test")
+        async_client._client = httpx2.AsyncClient(base_url="http://n8n.test", transport=httpx2.MockTransport(handler))
+        async_client._semaphore = asyncio.Semaphore(async_client.max_concurrency)
+        async with async_client:
+            result = await async_client.update_workflow("wf1", desired, current=dict(saved_workflow(), active=True))
+            activation_result = await async_client.activate_workflow("wf1")
+            return result, activation_result, async_client
+    
+    result, activation_result, async_client = asyncio.run(run())
+    assert result['status'] == 'success' and result['changed'] is True
+    assert activation_result['status'] == 'success' and activation_result['workflow']['active'] is True
+    assert requests == expected
+    assert async_client.supports_activation_endpoints is False
+    print("✅ Асинхронный клиент отправляет те же запросы")
+
+def test_node_catalog_versions():
+    """Каталог node types: наибольшая версия по числу, дамп сбрасывает ETag"""
+    import json
+    import tempfile
+    from types import SimpleNamespace
+    from n8n_node_catalog import N8NNodeCatalog
+    
+    print("🧪 ТЕСТИРОВАНИЕ КАТАЛОГА NODE TYPES")
+    
+    directory = tempfile.mkdtemp()
+    catalog = N8NNodeCatalog(os.path.join(directory, 'catalog.sqlite'))
+    
+    # Версии "10" и "2": при сравнении строк "10" < "2", выбрать нужно 10
+    node_types = [
+        {"name": "n8n-nodes-base.httpRequest", "version": 10, "displayName": "HTTP Request",
+         "properties": [{"displayName": "URL v10"}]},
+        {"name": "n8n-nodes-base.httpRequest", "version": 2, "displayName": "HTTP Request",
+         "properties": [{"displayName": "URL v2"}]},
+        {"name": "n8n-nodes-base.set", "version": [1, 2], "displayName": "Set", "properties": []}
+    ]
+    catalog.sync(node_types, source="test")
+    
+    documents = {document['name']: document for document in catalog.iter_documents()}
+    assert documents["n8n-nodes-base.httpRequest"]['parameters'] == ["URL v10"]
+    assert catalog.get_node_type("n8n-nodes-base.httpRequest")['version'] == 10
+    print("✅ Для индекса и get_node_type берется наибольшая версия")
+    
+    # После дампа сохраненный ETag не передается - каталог сервера скачивается заново
+    requested_etags = []
+    
+    def get_node_types(etag=None):
+        requested_etags.append(etag)
+        if etag == "v1":
+            return {"status": "not_modified"}
+        return {"status": "success", "node_types": node_types, "etag": "v1"}
+    
+    client = SimpleNamespace(base_url="http://n8n.test", get_node_types=get_node_types)
+    assert catalog.sync_from_client(client)['status'] == 'success'
+    assert catalog.get_meta('etag') == "v1"
+    
+    dump_path = os.path.join(directory, 'node_types.json')
+    with open(dump_path, 'w', encoding='utf-8') as f:
+        json.dump(node_types[:1], f)
+    assert catalog.sync_from_file(dump_path)['removed'] == 2
+    assert catalog.get_meta('etag') is None
+    
+    result = catalog.sync_from_client(client)
+    assert requested_etags == [None, None]
+    assert result['added'] == 2 and catalog.count() == 2
+    print("✅ sync_from_file сбрасывает ETag")
+
+def test_prompt_builder_metrics():
+    """Метрики промпта считаются по отправленным секциям"""
+    from types import SimpleNamespace
+    from n8n_prompt_builder import N8NPromptBuilder
+    
+    print("🧪 ТЕСТИРОВАНИЕ МЕТРИК ПРОМПТА")
+    
+    knowledge_base = SimpleNamespace(
+        nodes={"n8n-nodes-base.webhook": {"use_cases": []}},
+        workflow_patterns={},
+        get_node_info=lambda node_type: {"parameters": {}} if node_type == "n8n-nodes-base.webhook" else None
+    )
+    node_retriever = SimpleNamespace(get_summary=lambda node_type: None)
+    context = {"available_nodes": ["n8n-nodes-base.webhook", "n8n-nodes-base.airtable"], "complexity": "Простая"}
+    description = "Получать заказы через webhook и записывать их в Airtable"
+    
+    # Бюджета хватает: в промпте список nodes и схема airtable
+    metrics = N8NPromptBuilder(knowledge_base, node_retriever, max_input_tokens=600).build(description, context)['metrics']
+    assert metrics['nodes_included'] == 2 and metrics['nodes_dropped'] == []
+    assert metrics['over_budget'] is False
+    print("✅ Все nodes в промпте, бюджет не превышен")
+    
+    # Бюджета хватает только на описание: список nodes и схема не отправлены
+    builder = N8NPromptBuilder(knowledge_base, node_retriever, max_input_tokens=40)
+    result = builder.build(description, context)
+    metrics = result['metrics']
+    assert "РЕЛЕВАНТНЫЕ NODES" not in result['prompt'] and "ДОПОЛНИТЕЛЬНЫЕ NODES" not in result['prompt']
+    assert "relevant_nodes" in metrics['sections_dropped'] and metrics['nodes_dropped'] == ["n8n-nodes-base.airtable"]
+    assert metrics['nodes_included'] == 0
+    assert metrics['request_tokens'] <= metrics['budget'] and metrics['over_budget'] is True
+    print("✅ Сокращение обязательных секций отмечается как over_budget")
+
+def test_model_router():
+    """Выбор маршрута по метке сложности и оценке nodes, повтор обрезанного ответа"""
+    import json
+    from types import SimpleNamespace
+    from n8n_claude_service import N8NClaudeService
+    from n8n_claude_service_mock import N8NFakeAnthropicClient
+    from n8n_model_router import N8NModelRouter
+    from n8n_request_scheduler import N8NRequestScheduler
+    
+    print("🧪 ТЕСТИРОВАНИЕ МАРШРУТИЗАЦИИ МОДЕЛЕЙ")
+    
+    router = N8NModelRouter(SimpleNamespace(match_keyword_groups=lambda description: []))
+    # Оценка по шагам: 2, 4 и 9 nodes
+    short = "Получить данные"
+    medium = "Получить заказ, проверить, сохранить, отправить письмо"
+    long = ", ".join(["шаг"] * 9)
+    
+    # (описание, метка сложности, маршрут)
+    cases = [
+        (short, None, "fast"), (medium, None, "standard"), (long, None, "complex"),
+        # "Простая" отправляет в быструю модель только описания до standard_max_nodes
+        (medium, "Простая", "fast"), (long, "Простая", "complex"),
+        # "Сложная" не отправляет короткое описание в complex
+        (short, "Сложная", "standard"), (medium, "Сложная", "complex")
+    ]
+    for description, complexity, expected in cases:
+        route = router.route(description, {"complexity": complexity})
+        assert route['name'] == expected, (description, complexity, route)
+        limits = router.routes[expected]
+        assert limits['min_tokens'] <= route['max_tokens'] <= limits['max_tokens']
+    print("✅ Метка сложности сдвигает выбор только в пределах оценки")
+    
+    # "Простая" с 4 nodes идет в fast с лимитом 1800 токенов, а workflow из 9 nodes длиннее
+    assert router.route(medium, {"complexity": "Простая"})['max_tokens'] == 1800
+    assert router.escalate(router.route(medium), SimpleNamespace(stop_reason="max_tokens")) is None
+    
+    nodes = [
+        {"id": str(i), "name": f"Code {i}", "type": "n8n-nodes-base.code", "typeVersion": 1,
+         "position": [100 + 200 * i, 300], "parameters": {"jsCode": "return items;" + " " * 1000}}
+        for i in range(9)
+    ]
+    text = json.dumps({"name": "Long", "nodes": nodes, "connections": {}, "settings": {}})
+    client = N8NFakeAnthropicClient(responses=[text, text])
+    service = N8NClaudeService(use_cache=False, client=client, max_repair_attempts=0,
+                               request_scheduler=N8NRequestScheduler(None, None), model_router=router)
+    
+    result = service.generate_workflow(medium, {"complexity": "Простая"})
+    assert [request['max_tokens'] for request in client.requests] == [1800, 4000]
+    assert result['status'] == 'success' and len(result['workflow']['nodes']) == 9
+    assert result['route']['name'] == "standard" and result['route']['escalated_from'] == "fast"
+    
+    stats = router.stats()
+    assert stats['fast']['truncated'] == 1 and stats['standard']['success'] == 1
+    print("✅ Обрезанный ответ быстрой модели повторяется один раз на стандартной")
+
 if __name__ == "__main__":
     success = test_automatic()
     if success: